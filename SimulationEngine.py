@@ -5,12 +5,33 @@ E-MAIL: imsara256@gmail.com
 # Imports
 import pygame
 import sys
+import os
 import math
+import time
+import numpy as np
 
 # self defined
-from config import screen, COLORS # IMPORT params
+from config import get_screen, COLORS, HEADLESS, width, height # IMPORT params
 from background import Axes, Floor # IMPORT Axes class
 from text import print_angles, print_zoom
+from render import FaceQueue
+from physics import PhysicsWorld
+from instancing import InstancedMesh
+from scene import SceneGraph
+from raster import ZBufferQueue
+from parallel import ParallelTransformer
+from transforms import rotation_matrix, rotate_vertices, spheres_in_frustum, NEAR_PLANE
+from profiler import FrameProfiler
+from recorder import FrameRecorder, DROP
+
+# drawing backends: faces sorted and drawn one by one with pygame, or filled into a z-buffer with numpy
+PAINTER, ZBUFFER = 'painter', 'zbuffer'
+
+# folder the F9 key records PNG sequences into, one timestamped folder per recording
+RECORD_DIR = 'recordings'
+
+# physics steps per second of simulated time, the gravity and velocities of the balls are per step
+PHYSICS_RATE = 60
 
 class Engine:
     '''
@@ -21,10 +42,25 @@ class Engine:
         __init__: Class initialiser
         _add_balls: Shape manager for spheres
         _add_shapes: Shape manager for other shapes
+        add_instances: Adds many copies of a shape sharing one mesh
+        set_backend: Switches between the painter and z-buffer backends
         _handle_events: Handle mouse, keyboards and other events
+        _parallel_transform: Transforms the vertices of many shapes together in worker processes
+        _update_static_layer: Redraws the cached layer of static shapes when it is out of date
+        _blit_static_layer: Draws the static shapes from the cached layer
+        _step_physics: Advances the balls in fixed time steps
+        _draw_balls: Draws the spheres depth sorted with the static shapes
+        _draw_background: Draws or restores everything behind the balls
+        _composite_balls: Redraws the regions where balls and static shapes overlap
+        render_frame: Draws one frame
+        iter_frames: Renders frames offscreen as fast as possible
+        render_headless: Renders a batch of frames to arrays or PNG files
+        start_recording: Starts copying finished frames to a background encoder
+        stop_recording: Finishes the recording
         runEngine: Simulation loop
     '''
-    def __init__(self, angle_x=0, angle_y=0, angle_z=0, viewer_distance=60):
+    def __init__(self, angle_x=0, angle_y=0, angle_z=0, viewer_distance=60, headless=HEADLESS, profile=False, profile_csv=None, backend=PAINTER,
+                 transform_workers=0, record=None):
         '''
         Class initialiser - initialise pygame and other essential variables 
                             as well as background classes
@@ -33,6 +69,16 @@ class Engine:
         :param angle_y: Intital angle about the y-axis
         :param angle_z: Initial angle about the z-axis
         :param viewer_distance: Zoom setting
+        :param headless: render into an offscreen surface instead of the window (default=ENGINE_HEADLESS)
+        :param profile: time each stage and object of every frame and show the overlay (toggle with F3)
+        :param profile_csv: file to stream the per-frame timings to (default=None for no file)
+        :param backend: PAINTER to sort faces and draw them with pygame, ZBUFFER to fill them into a
+                        depth buffer with numpy (toggle with z)
+        :param transform_workers: worker processes that rotate and project the vertices of all shapes
+                                  together, 0 to transform each shape on its own in this process and
+                                  None for one per core
+        :param record: folder for a PNG sequence or a .gif file to record the session into
+                       (default=None to record only when F9 is pressed)
         '''
         pygame.init() # initiliase pygame
         self.clock = pygame.time.Clock() # set pygame clock
@@ -47,8 +93,46 @@ class Engine:
         self.ground = Floor(side_length=50) # floor object
 
         # list for storing objects
-        self.balls = []
-        self.shapes = []
+        self.balls = [] # dynamic objects, redrawn every frame
+        self.world = PhysicsWorld() # physics state of all balls, stepped together
+        self.ball_rows = [] # row of each ball in the world arrays
+        self.shapes = [] # static objects, drawn through the static layer
+        self.scene = SceneGraph() # static objects with parented transforms, also drawn through the static layer
+
+        # cached layer holding the static shapes and axes
+        self.headless = headless
+        self.surface = pygame.Surface((width, height)) if headless else get_screen() # surface the engine draws on, the window is only opened here
+        self.static_layer = None
+        self.static_camera = None # camera state the static layer was drawn for
+        self.static_queue = FaceQueue() # faces in the static layer, kept for depth sorting with the balls
+        self.scratch = None
+        self.static_color = self.static_depth = None # static layer of the z-buffer backend
+        self.frame_color = self.frame_depth = None # buffers of the frame being drawn by the z-buffer backend
+        self.static_version = 0 # bumped every time the static layer is redrawn
+
+        # frame without the balls, regions of it are restored under the balls while the camera is still
+        self.background = None
+        self.background_key = None # static layer version, backend and size the background was drawn with
+        self.moving_rects = [] # screen rects of the balls and the overlay in the last frame
+        self.dirty_rects = None # rects of the screen the last frame changed, None when all of it changed
+        self.set_backend(backend)
+
+        # fixed timestep physics, independent of the frame rate
+        self.physics_dt = 1 / PHYSICS_RATE # simulated seconds per physics step
+        self.max_substeps = 5 # most physics steps per frame, extra time is dropped so a slow frame cannot snowball
+        self.accumulator = 0.0 # simulated time not yet covered by a physics step
+
+        # optional transform stage spread over several processes
+        self.transformer = None if transform_workers == 0 else ParallelTransformer((width, height), NEAR_PLANE, transform_workers)
+
+        # per-stage frame timings
+        self.profiler = FrameProfiler(enabled=profile, csv_path=profile_csv)
+
+        # frames are encoded in another process while recording
+        self.recorder = None
+        self.recording_stats = None # counts of the last finished recording
+        if record is not None:
+            self.start_recording(record)
 
     def _add_balls(self, shape):
         '''
@@ -56,7 +140,9 @@ class Engine:
 
         :param shape: Accepts Sphere class object
         '''
+        shape.attach(self.world) # the ball's state now lives in the engine's world
         self.balls.append(shape)
+        self.ball_rows.append(shape.index)
     
     def _add_shapes(self, shape):
         '''
@@ -65,6 +151,207 @@ class Engine:
         :param shape: Accepts other defined shape classes
         '''
         self.shapes.append(shape)
+        self.static_camera = None # the static layer has to be redrawn with the new shape
+
+    def add_instances(self, prototype, positions, scales=1, orientations=None, colors=None):
+        '''
+        Adds many copies of a static shape. The copies share the prototype's mesh and are
+        transformed together, which is much cheaper than adding each one as its own shape
+
+        :param prototype: Cube, Cylinder or Torus to copy, the copies turn and scale about its center
+        :param positions: (N, 3) offsets of the copies from the prototype, a copy at [0,0,0] with
+                          no scale or rotation matches the prototype
+        :param scales: one scale for all copies or (N,) scale of each copy (default=1)
+        :param orientations: (N, 3) angles about the x, y & z axes of each copy (default=None for no rotation)
+        :param colors: (N, 3) face color of each copy (default=None for the prototype's face color)
+        :return: the InstancedMesh holding the copies
+        '''
+        instances = InstancedMesh(prototype, positions, scales, orientations, colors)
+        self._add_shapes(instances)
+        return instances
+
+    def set_backend(self, backend):
+        '''
+        Switches how the shapes are drawn
+
+        :param backend: PAINTER or ZBUFFER
+        '''
+        if backend not in (PAINTER, ZBUFFER):
+            raise ValueError(f'unknown backend {backend!r}, use {PAINTER!r} or {ZBUFFER!r}')
+        self.backend = backend
+        self.static_queue = FaceQueue() if backend == PAINTER else ZBufferQueue()
+        self.static_camera = None # the static layer has to be redrawn with the new backend
+
+    def _new_queue(self):
+        '''
+        :return: empty queue for the current backend
+        '''
+        return FaceQueue() if self.backend == PAINTER else ZBufferQueue()
+
+    def _parallel_transform(self, objects, camera):
+        '''
+        Culls the objects and rotates and projects the vertices of the visible ones together
+        in the transform stage's worker processes
+
+        :param objects: shapes to transform
+        :param camera: (angle_x, angle_y, angle_z, viewer_distance)
+        :return: dict from the index of every object with a prepare method to its (camera_vertices,
+                 projected), or None when it is out of view. Other objects transform themselves
+        '''
+        prepared = {i: shape.prepare(*camera) for i, shape in enumerate(objects) if hasattr(shape, 'prepare')}
+        visible = [i for i, vertices in prepared.items() if vertices is not None]
+        if not visible:
+            return prepared # everything is out of view
+        results = self.transformer.transform([prepared[i] for i in visible], rotation_matrix(*camera[:3]), 256, camera[3])
+        return {**prepared, **dict(zip(visible, results))}
+
+    def _update_static_layer(self):
+        '''
+        Rasterizes the static shapes, the scene graph and the axes. They rarely move in world
+        space so they are kept in a layer that is only redrawn when the camera changes. Scene
+        nodes that move are drawn with the balls instead, so the layer is only redrawn when
+        a node starts or stops moving
+        '''
+        camera = (self.angle_x, self.angle_y, self.angle_z, self.viewer_distance)
+        with self.profiler.stage('scene_update'):
+            if self.scene.tick(): # nodes were added, removed, started or stopped moving
+                self.static_camera = None
+        if self.static_layer is None or self.static_layer.get_size() != self.surface.get_size():
+            # per-pixel alpha, so no face color can turn transparent the way a color key would
+            self.static_layer = pygame.Surface(self.surface.get_size(), pygame.SRCALPHA)
+            self.scratch = pygame.Surface(self.surface.get_size()) # for redrawing regions around the balls
+            self.static_camera = None
+
+        if camera != self.static_camera:
+            with self.profiler.stage('static_transform'):
+                self.static_queue.clear()
+                transformed = {} if self.transformer is None else self._parallel_transform(self.shapes, camera)
+                for i, shape in enumerate(self.shapes):
+                    with self.profiler.measure_object(shape, i):
+                        if i not in transformed:
+                            shape.submit(self.static_queue, *camera)
+                        elif transformed[i] is not None: # culled shapes are None
+                            shape.submit(self.static_queue, *camera, transformed=transformed[i])
+                self.scene.submit(self.static_queue, *camera)
+                self.ax.submit(self.static_queue, *camera)
+            with self.profiler.stage('static_fill'):
+                if self.backend == PAINTER:
+                    self.static_layer.fill((0, 0, 0, 0)) # transparent where no static shape is drawn
+                    self.static_queue.draw(self.static_layer)
+                else:
+                    # color and depth of the static shapes, depth 0 where there are none
+                    size = self.surface.get_size()
+                    self.static_color = np.zeros(size + (3,), dtype=np.uint8)
+                    self.static_depth = np.zeros(size)
+                    self.static_queue.rasterize(self.static_color, self.static_depth)
+            self.static_camera = camera
+            self.static_version += 1
+
+    def _blit_static_layer(self):
+        '''
+        Draws the static shapes from the cached layer
+        '''
+        with self.profiler.stage('static_blit'):
+            if self.backend == PAINTER:
+                self.surface.blit(self.static_layer, (0, 0))
+            else:
+                # start the frame's buffers from the static layer, the balls are depth tested against it
+                self.frame_color = pygame.surfarray.array3d(self.surface)
+                covered = self.static_depth > 0
+                self.frame_color[covered] = self.static_color[covered]
+                self.frame_depth = self.static_depth.copy()
+
+    def _step_physics(self, frame_time):
+        '''
+        Advances the balls by as many fixed physics steps as fit in the elapsed time, then
+        places each ball between its last two steps for drawing. The simulation therefore
+        runs at the same speed whatever the frame rate
+
+        :param frame_time: seconds of simulated time since the last frame
+        '''
+        self.accumulator += frame_time
+        steps = 0
+        while self.accumulator >= self.physics_dt and steps < self.max_substeps:
+            self.world.step() # all balls in one vectorized step
+            self.accumulator -= self.physics_dt
+            steps += 1
+        if steps == self.max_substeps:
+            self.accumulator = min(self.accumulator, self.physics_dt) # too far behind, drop the rest
+
+        self.world.interpolate(self.accumulator / self.physics_dt)
+
+    def _draw_balls(self):
+        '''
+        Draws the spheres and the moving scene nodes over the static layer, sorted by depth.
+        Where one overlaps a static shape, the region around it is redrawn with the faces of
+        both sorted together, so it can pass behind the static shapes. The z-buffer backend
+        instead depth tests every pixel of them against the static layer
+
+        :return: screen rects of the spheres and nodes drawn by the painter backend
+        '''
+        camera = (self.angle_x, self.angle_y, self.angle_z, self.viewer_distance)
+        queue = self._new_queue()
+        ball_ranges = [] # records of each ball in the queue
+        with self.profiler.stage('balls_transform'):
+            # test all balls against the view frustum at once and only submit the visible ones
+            rows = np.asarray(self.ball_rows, dtype=int)
+            world = self.world
+            centers = np.where(world.interpolated[rows, None], world.draw_positions[rows], world.positions[rows])
+            centers = rotate_vertices(centers, rotation_matrix(*camera[:3]))
+            in_view = np.flatnonzero(spheres_in_frustum(centers, self.world.radii[rows], 256, self.viewer_distance))
+            balls = [self.balls[i] for i in in_view]
+            transformed = {} if self.transformer is None else self._parallel_transform(balls, camera)
+            for k, (i, ball) in enumerate(zip(in_view, balls)):
+                with self.profiler.measure_object(ball, i):
+                    start = len(queue)
+                    if k not in transformed:
+                        ball.submit(queue, *camera)
+                    elif transformed[k] is not None:
+                        ball.submit(queue, *camera, transformed=transformed[k])
+                    ball_ranges.append((start, len(queue)))
+            ball_ranges.extend(self.scene.submit_moving(queue, *camera)) # composited the same way as the balls
+
+        if self.backend == ZBUFFER:
+            with self.profiler.stage('balls_fill'):
+                queue.rasterize(self.frame_color, self.frame_depth)
+            with self.profiler.stage('composite'):
+                pygame.surfarray.blit_array(self.surface, self.frame_color) # whole frame in one blit
+                self.static_queue.draw_overlay(self.surface)
+                queue.draw_overlay(self.surface)
+            return []
+
+        with self.profiler.stage('balls_fill'):
+            queue.draw(self.surface)
+
+        with self.profiler.stage('composite'):
+            self._composite_balls(queue, ball_ranges)
+        rects = (queue.bounds(range(start, end)) for start, end in ball_ranges)
+        return [rect.inflate(2, 2) for rect in rects if rect is not None] # a pixel spare on each side
+
+    def _composite_balls(self, queue, ball_ranges):
+        '''
+        Redraws the regions where balls overlap static shapes with the faces of both
+        sorted together
+
+        :param queue: FaceQueue holding the faces of all balls
+        :param ball_ranges: (start, end) record indices of each ball in the queue
+        '''
+        for start, end in ball_ranges:
+            rect = queue.bounds(range(start, end))
+            if rect is None:
+                continue
+            static_hits = self.static_queue.overlapping(rect)
+            if len(static_hits) == 0:
+                continue # nothing static around this ball
+
+            # redraw everything touching the ball's rect in depth order and copy back only the rect.
+            # A scratch surface is used instead of a clip rect because pygame shifts clipped wide lines
+            region = FaceQueue()
+            region.extend(self.static_queue, static_hits)
+            region.extend(queue, queue.overlapping(rect))
+            self.scratch.blit(self.surface, rect, rect)
+            region.draw(self.scratch)
+            self.surface.blit(self.scratch, rect, rect)
 
     def _handle_events(self):
         '''
@@ -99,6 +386,11 @@ class Engine:
             if event.type == pygame.KEYDOWN and event.key == pygame.K_F11:
                 # Toggle fullscreen mode
                 pygame.display.toggle_fullscreen()
+                self.background_key = None # present the whole screen again
+
+            # the window was uncovered, present the whole screen again
+            if event.type == pygame.WINDOWEXPOSED:
+                self.background_key = None
             
             # Isometric screen format
             if event.type == pygame.KEYDOWN and event.key == pygame.K_i:
@@ -112,34 +404,184 @@ class Engine:
                 self.angle_x = 0
                 self.angle_y = 0
                 self.angle_z = 0
+
+            # switch between the painter and z-buffer backends
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_z:
+                self.set_backend(ZBUFFER if self.backend == PAINTER else PAINTER)
+
+            # toggle the profiler overlay
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.profiler.enabled = self.profiler.overlay = not (self.profiler.enabled and self.profiler.overlay)
+
+            # start or stop recording
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F9:
+                if self.recorder is None:
+                    self.start_recording()
+                else:
+                    self.stop_recording() # counts are kept in recording_stats
     
-    def runEngine(self):
+    def render_frame(self, frame_time=None):
         '''
-        Runs the main simulation loop. Uses shape managers for drawing.
+        Advances the physics and draws one frame onto the engine surface
+
+        :param frame_time: seconds since the last frame (default=one physics step)
         '''
-        while self.run:
-            screen.fill(COLORS['GREY']) # screen background
-            print_zoom(self.viewer_distance)
-            print_angles(self.angle_x, self.angle_y, self.angle_z)
-            # event loop for pygame events
-            self._handle_events()
-            # Draw ground
-            self.ground.draw_floor(self.angle_x, self.angle_y, self.angle_z, self.viewer_distance)
-            
-            # deploy sphere
-            for ball in self.balls:
-                ball.update_ball_position(self.angle_x, self.angle_y, self.angle_z, self.viewer_distance)
+        with self.profiler.stage('physics'):
+            self._step_physics(self.physics_dt if frame_time is None else frame_time)
+
+        # screen background, ground, static shapes and axes, or just the regions the balls left
+        previous = self._draw_background()
+
+        # deploy sphere, sorted by depth with the static shapes
+        moving = self._draw_balls()
+
+        # frame timings from the profiler, if it is on
+        overlay = self.profiler.draw_overlay(self.surface)
+        if overlay is not None:
+            moving.append(overlay)
+
+        # only the regions covered by the balls and overlay in this frame or the last one changed
+        self.dirty_rects = None if previous is None else previous + moving
+        self.moving_rects = moving
+
+    def _draw_background(self):
+        '''
+        Draws everything behind the balls. While the camera and the static shapes stay still
+        the painter backend keeps this background and only restores it where the balls and
+        the overlay were in the last frame, so the cost follows how much of the screen changed
+
+        :return: rects restored from the background, None when the whole background was drawn
+        '''
+        self._update_static_layer()
+        key = (self.static_version, self.backend, self.surface.get_size())
+        if key == self.background_key:
+            with self.profiler.stage('restore'):
+                for rect in self.moving_rects:
+                    self.surface.blit(self.background, rect, rect)
+            return self.moving_rects
+
+        with self.profiler.stage('hud'):
+            self.surface.fill(COLORS['GREY']) # screen background
+            print_zoom(self.viewer_distance, self.surface)
+            print_angles(self.angle_x, self.angle_y, self.angle_z, self.surface)
+        # Draw ground
+        with self.profiler.stage('floor'):
+            self.ground.draw_floor(self.angle_x, self.angle_y, self.angle_z, self.viewer_distance, self.surface)
+
+        # static shapes and axes from the cached layer
+        self._blit_static_layer()
 
-            # deploy other shapes
-            for shape in self.shapes:
-                shape.draw_shape(self.angle_x, self.angle_y, self.angle_z, self.viewer_distance)
+        self.background_key = None
+        if self.backend == PAINTER: # the z-buffer backend redraws the whole frame from its buffers anyway
+            with self.profiler.stage('background'):
+                if self.background is None or self.background.get_size() != self.surface.get_size():
+                    self.background = pygame.Surface(self.surface.get_size())
+                self.background.blit(self.surface, (0, 0))
+            self.background_key = key
+        return None
 
-            # draw axes
-            self.ax.draw_axes(self.angle_x, self.angle_y, self.angle_z, self.viewer_distance)
+    def iter_frames(self, frames=None):
+        '''
+        Renders frames offscreen with no frame rate cap and no event handling. Every frame
+        advances the simulation by one physics step, however long it took to render
+
+        :param frames: number of frames to render, None to keep going until the caller stops
+        :return: generator of (height, width, 3) uint8 numpy arrays, one per frame
+        '''
+        count = 0
+        try:
+            while frames is None or count < frames:
+                self.profiler.begin_frame()
+                self.render_frame()
+                self.profiler.end_frame()
+                yield pygame.surfarray.array3d(self.surface).transpose(1, 0, 2) # surfarray is indexed [x][y]
+                count += 1
+        finally:
+            self.profiler.flush() # also when the caller stops early or rendering fails
+
+    def render_headless(self, frames, output_dir=None):
+        '''
+        Renders a fixed number of frames offscreen as fast as possible
+
+        :param frames: number of frames to render
+        :param output_dir: folder to write frame_00000.png, frame_00001.png, ... into. When
+                           None the frames are returned as numpy arrays instead
+        :return: list of (height, width, 3) arrays, or list of the written file paths
+        '''
+        if output_dir is None:
+            return list(self.iter_frames(frames))
+
+        os.makedirs(output_dir, exist_ok=True)
+        paths = []
+        try:
+            for i in range(frames):
+                self.profiler.begin_frame()
+                self.render_frame()
+                self.profiler.end_frame()
+                path = os.path.join(output_dir, f'frame_{i:05d}.png')
+                pygame.image.save(self.surface, path)
+                paths.append(path)
+        finally:
+            self.profiler.flush()
+        return paths
+
+    def start_recording(self, path=None, every=1, when_full=DROP):
+        '''
+        Starts recording the frames runEngine presents. Each frame is copied into a ring
+        buffer and encoded in another process, frames are dropped while the encoder is behind
+        unless when_full is WAIT
+
+        :param path: folder for a PNG sequence or a .gif file (default=None for a new folder in RECORD_DIR)
+        :param every: record every nth frame
+        :param when_full: DROP or WAIT, see FrameRecorder
+        :return: the FrameRecorder
+        '''
+        self.stop_recording()
+        if path is None:
+            path = os.path.join(RECORD_DIR, time.strftime('%Y%m%d_%H%M%S'))
+        self.recorder = FrameRecorder(path, self.surface.get_size(), every=every, when_full=when_full)
+        return self.recorder
+
+    def stop_recording(self):
+        '''
+        Waits for the recorded frames to be written and stops the encoder
 
-            pygame.display.flip() # Update the screen
-            self.clock.tick(60) # set refresh rate
+        :return: dict of FrameRecorder.stats, None when not recording
+        '''
+        if self.recorder is None:
+            return None
+        self.recording_stats = self.recorder.close()
+        self.recorder = None
+        return self.recording_stats
 
+    def runEngine(self):
+        '''
+        Runs the main simulation loop. Uses shape managers for drawing.
+        '''
+        frame_time = self.physics_dt
+        try:
+            while self.run:
+                self.profiler.begin_frame()
+                # event loop for pygame events
+                with self.profiler.stage('events'):
+                    self._handle_events()
+
+                self.render_frame(frame_time)
+
+                with self.profiler.stage('present'):
+                    if self.dirty_rects is None:
+                        pygame.display.flip() # Update the screen
+                    else:
+                        pygame.display.update(self.dirty_rects) # only the regions that changed
+                if self.recorder is not None:
+                    with self.profiler.stage('record'):
+                        self.recorder.capture(self.surface) # a copy, the encoding happens in another process
+                self.profiler.end_frame()
+                frame_time = self.clock.tick(60) / 1000 # set refresh rate, physics follows the real elapsed time
+        finally:
+            self.profiler.close() # keep the CSV rows even when the loop fails
+        self.stop_recording()
+        if self.transformer is not None:
+            self.transformer.close() # stop the workers and free the shared memory
         pygame.quit() # close the window
         sys.exit
-
@@ -1,6 +1,9 @@
+import numpy as np
 import pygame
-from transforms import project_3d_to_2d, rotation_matrix, apply_rotation
-from config import COLORS, screen, width, height
+from transforms import rotation_matrix, rotate_vertices, project_vertices, NEAR_PLANE
+from render import FaceQueue, submit_lines, clip_polygon_near
+from geometry import Geometry
+from config import COLORS, get_screen, width, height
 
 class Axes:
     '''
@@ -10,7 +13,8 @@ class Axes:
         __init__:
         _generate_axis_vertices:
         _generate_axis_edges:
-        _draw_axes:
+        submit:
+        draw_axes:
     '''
     def __init__(self, center = [0,0,0], side_length=10):
         '''
@@ -20,7 +24,7 @@ class Axes:
         :param center: default => x, y, z = [0, 0, 0]
         :param side_length: default => 10
         '''
-        self.vertices = self._generate_axis_vertices(center, side_length)
+        self.geometry = Geometry(self._generate_axis_vertices(center, side_length), self._generate_axis_edges())
     
     def _generate_axis_vertices(self, center, side_length):
         '''
@@ -50,33 +54,47 @@ class Axes:
         '''
         return [(0,1),(2,3),(4,5)]
     
-    def draw_axes(self, angle_x, angle_y, angle_z, viewer_distance):
+    def submit(self, queue, angle_x, angle_y, angle_z, viewer_distance):
         '''
-        function to draw the axes from the generated axes vertices and edges,
-        after rotations and projections
+        Submits the axes lines, sorted by their depth, and the center point of the screen,
+        which is always drawn on top, to a face queue
 
-        :param axes_vertices: list of axes vertices in 3D i.e [[1,2,3],[4,5,6],....]
+        :param queue: FaceQueue to submit to
         :param angle_x: angle change about x axis
         :param angle_y: angle change about y axis
         :param angle_z: angle change about z axis
         :param viewer_distance: set the zoom level based on the scrollwheel input
         '''
         fov = 256
-        final_vertices = []
         r_matrix = rotation_matrix(angle_x, angle_y, angle_z) # find the rotation matrix for the given angle
-        for vertex in self.vertices:
-            aug_vertex = apply_rotation(vertex, r_matrix)
-            proj_vertex = project_3d_to_2d(aug_vertex, fov, viewer_distance)
-            final_vertices.append(proj_vertex)
+        camera_vertices = rotate_vertices(self.geometry.vertices, r_matrix)
+        projected = project_vertices(camera_vertices, fov, viewer_distance)
 
-        # Draw the edges of the axes
-        edges = self._generate_axis_edges()
+        # Submit the edges of the axes
+        edges = self.geometry.edges
         colors = [COLORS['RED'],COLORS['GREEN'],COLORS['BLUE']]
+        depths = camera_vertices[edges, 2].mean(axis=1)
         for i, edge in enumerate(edges):
-            pygame.draw.line(screen, colors[i], final_vertices[edge[0]], final_vertices[edge[1]], 2)
+            submit_lines(queue, camera_vertices, projected, edges[i:i+1], depths[i:i+1], colors[i], 2, fov, viewer_distance)
         
-        # Draw center of sim
-        pygame.draw.circle(screen, COLORS['RED'], (width/2,height/2), 4) # center point of the screen
+        # Submit center of sim
+        queue.add_circle((width/2,height/2), 4, COLORS['RED']) # center point of the screen
+
+    def draw_axes(self, angle_x, angle_y, angle_z, viewer_distance, surface=None):
+        '''
+        function to draw the axes from the generated axes vertices and edges,
+        after rotations and projections
+
+        :param angle_x: angle change about x axis
+        :param angle_y: angle change about y axis
+        :param angle_z: angle change about z axis
+        :param viewer_distance: set the zoom level based on the scrollwheel input
+        :param surface: surface to draw on (default=screen)
+        '''
+        surface = get_screen() if surface is None else surface # draw to the window by default
+        queue = FaceQueue()
+        self.submit(queue, angle_x, angle_y, angle_z, viewer_distance)
+        queue.draw(surface)
 
 class Floor:
     '''
@@ -87,6 +105,7 @@ class Floor:
         _generta_floor_vertices: Create the floor vertices based on  side lenght etc..
         _generate_floor_edges: Create list of edges based on vertices
         _generate_floor_face: Create the floor face based on vertices
+        _rasterize_floor: Redraw the persistent floor layer for a new camera state
         draw_floor: Draw the floor based on the definitions on the screen
     '''
     def __init__(self, center=[0,0,0], side_length=30):
@@ -96,7 +115,13 @@ class Floor:
         :param center: Default --> x, y, z = [0, 0, 0]
         :param side_length: Default --> 30
         '''
-        self.vertices = self._generate_floor_vertices(center,side_length)
+        self.geometry = Geometry(self._generate_floor_vertices(center,side_length), self._generate_floor_edges(),
+                                 [self._generate_floor_face()])
+
+        # persistent floor layer, only redrawn when the camera changes
+        self.layer = None # surface covering the bounding rect of the floor
+        self.layer_rect = None # position of the layer on the screen
+        self.layer_camera = None # camera state the layer was drawn for
 
     def _generate_floor_vertices(self,center,side_length):
         '''
@@ -131,30 +156,66 @@ class Floor:
         '''
         return [(0,1,2,3)]
     
-    def draw_floor(self, angle_x, angle_y, angle_z, viewer_distance):
+    def _rasterize_floor(self, angle_x, angle_y, angle_z, viewer_distance, surface=None):
         '''
-        Draws the floor on the screen and performs any necessary transforms
-        and projection when camera is moved
+        Draws the floor into a surface the size of its on-screen bounding rect
 
         :param angle_x: Angle change about the x-axis
         :param angle_y: Angle change about the y-axis
         :param angle_z: Angle change about the z-axis
         :param viewer_distance: Zoom setting for the camera
+        :param surface: surface the layer is clipped to (default=screen)
         '''
+        surface = get_screen() if surface is None else surface
         alpha = 128
         fov=256
-        final_vertices = []
         r_matrix = rotation_matrix(angle_x,angle_y,angle_z)
-        floor_surface = pygame.Surface((width, height), pygame.SRCALPHA)
-        for vertex in self.vertices:
-            aug_vertex = apply_rotation(vertex, r_matrix)
-            proj_vertex = project_3d_to_2d(aug_vertex, fov, viewer_distance)
-            final_vertices.append(proj_vertex)
-
-        faces = self._generate_floor_face()
+        self.layer_camera = (angle_x, angle_y, angle_z, viewer_distance)
+
+        # only the part of the floor in front of the near plane is drawn
+        faces = self.geometry.faces[0]
+        camera_vertices = rotate_vertices(self.geometry.vertices, r_matrix)
+        polygons = [clip_polygon_near(camera_vertices[face], NEAR_PLANE - viewer_distance) for face in faces]
+        polygons = [project_vertices(polygon, fov, viewer_distance) for polygon in polygons if len(polygon) >= 3]
+        if not polygons:
+            self.layer, self.layer_rect = None, None # floor is behind the viewer
+            return
+
+        # bounding rect of the floor clipped to the screen
+        projected = np.concatenate(polygons)
+        (min_x, min_y), (max_x, max_y) = projected.min(axis=0), projected.max(axis=0)
+        rect = pygame.Rect(min_x, min_y, max_x - min_x + 1, max_y - min_y + 1).clip(surface.get_rect())
+        if rect.width == 0 or rect.height == 0:
+            self.layer, self.layer_rect = None, None # floor is off screen
+            return
+
+        # reuse the layer surface when the rect size has not changed
+        if self.layer is None or self.layer.get_size() != rect.size:
+            self.layer = pygame.Surface(rect.size, pygame.SRCALPHA)
+        else:
+            self.layer.fill((0, 0, 0, 0))
+        self.layer_rect = rect
+
+        # draw the faces in layer coordinates
         face_color = COLORS['P_BLUE']
-        for face in faces:
-            polygon_points = [final_vertices[i] for i in face]
-            pygame.draw.polygon(floor_surface, (face_color[0], face_color[1], face_color[2], alpha), polygon_points)
-        
-        screen.blit(floor_surface, (0, 0))
\ No newline at end of file
+        for polygon in polygons:
+            polygon_points = (polygon - rect.topleft).tolist()
+            pygame.draw.polygon(self.layer, (face_color[0], face_color[1], face_color[2], alpha), polygon_points)
+
+    def draw_floor(self, angle_x, angle_y, angle_z, viewer_distance, surface=None):
+        '''
+        Draws the floor on the screen and performs any necessary transforms
+        and projection when camera is moved
+
+        :param angle_x: Angle change about the x-axis
+        :param angle_y: Angle change about the y-axis
+        :param angle_z: Angle change about the z-axis
+        :param viewer_distance: Zoom setting for the camera
+        :param surface: surface to draw on (default=screen)
+        '''
+        surface = get_screen() if surface is None else surface # draw to the window by default
+        if self.layer_camera != (angle_x, angle_y, angle_z, viewer_distance):
+            self._rasterize_floor(angle_x, angle_y, angle_z, viewer_distance, surface)
+
+        if self.layer is not None:
+            surface.blit(self.layer, self.layer_rect)
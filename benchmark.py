@@ -0,0 +1,299 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+
+Rendering benchmarks. Builds synthetic scenes from the shape classes, renders them
+headless and reports frame latency percentiles and throughput as the number of
+objects and the tessellation grow.
+
+    python benchmark.py                                   # full suite, writes benchmarks/results.json
+    python benchmark.py --quick --filter sphere           # small run of the sphere scenes
+    python benchmark.py --baseline benchmarks/base.json   # compare with a stored run
+    python benchmark.py --filter collisions               # physics steps of thousands of colliding balls
+    python benchmark.py --backend zbuffer                 # same scenes drawn with the z-buffer backend
+    python benchmark.py --workers 8                       # vertices transformed by 8 worker processes
+    python benchmark.py --memory                          # bytes per vertex of the shape geometry
+'''
+# module imports
+import os
+os.environ.setdefault('ENGINE_HEADLESS', '1') # must be set before config is imported
+
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+
+import numpy as np
+import pygame
+
+# file imports
+from SimulationEngine import Engine
+from shapes import Sphere, Torus, Cube, Cylinder
+from background import Axes, Floor
+from geometry import memory_report
+
+def grid_positions(count, spacing=8, height=10):
+    '''
+    Spreads objects over a square grid above the floor, centered on the origin
+
+    :param count: number of positions
+    :param spacing: distance between neighbouring objects
+    :param height: height of the grid above the floor
+    :return: list of [x, y, z] positions
+    '''
+    side = math.ceil(math.sqrt(count))
+    offset = (side - 1) * spacing / 2
+    return [[(i % side) * spacing - offset, height, (i // side) * spacing - offset] for i in range(count)]
+
+def sphere_scene(count, segments):
+    '''
+    :return: function adding count bouncing spheres with segments x segments faces to an engine
+    '''
+    def build(engine):
+        for position in grid_positions(count):
+            engine._add_balls(Sphere(center=position, radius=2, segments_lat=segments, segments_lon=segments))
+    return build
+
+def torus_scene(count, segments):
+    '''
+    :return: function adding count tori with segments x segments/2 edges to an engine
+    '''
+    def build(engine):
+        for position in grid_positions(count):
+            engine._add_shapes(Torus(center=position, R=2, r=1, segments_u=segments, segments_v=max(3, segments // 2)))
+    return build
+
+def cube_scene(count):
+    '''
+    :return: function adding count cubes to an engine
+    '''
+    def build(engine):
+        for position in grid_positions(count):
+            engine._add_shapes(Cube(center=position, side_length=3))
+    return build
+
+def mixed_scene(count):
+    '''
+    :return: function adding count of each shape class to an engine
+    '''
+    def build(engine):
+        for i, position in enumerate(grid_positions(4 * count)):
+            kind = i % 4
+            if kind == 0:
+                engine._add_balls(Sphere(center=position, radius=2, segments_lat=20, segments_lon=20))
+            elif kind == 1:
+                engine._add_shapes(Torus(center=position, R=2, r=1))
+            elif kind == 2:
+                engine._add_shapes(Cube(center=position, side_length=3))
+            else:
+                engine._add_shapes(Cylinder(center=position, radius=1.5, height=3))
+    return build
+
+def bouncing_scene(count, radius=1, seed=0):
+    '''
+    :return: function adding count small spheres dropped at random into a box just wide
+             enough for them to pile up and collide with each other
+    '''
+    def build(engine):
+        rng = np.random.default_rng(seed)
+        side = 2.5 * radius * math.ceil(count ** (1 / 3))
+        for position in rng.uniform(0, side, (count, 3)) - [side / 2, -2 * radius, side / 2]:
+            engine._add_balls(Sphere(center=position, radius=radius, segments_lat=4, segments_lon=4))
+    return build
+
+def scenarios(quick=False):
+    '''
+    Lists the benchmark scenes. Each family is run over a range of object counts and
+    tessellations so the results form scaling curves
+
+    :param quick: use fewer and smaller scenes
+    :return: dict of scene name -> build function
+    '''
+    counts = [1, 4, 16] if quick else [1, 4, 16, 64]
+    segments = [10, 30] if quick else [10, 20, 30, 40]
+
+    scenes = {'empty': lambda engine: None}
+    for count in counts:
+        scenes[f'cubes/n={count}'] = cube_scene(count)
+        scenes[f'mixed/n={count}'] = mixed_scene(count)
+        for seg in segments:
+            scenes[f'spheres/n={count}/seg={seg}'] = sphere_scene(count, seg)
+            scenes[f'tori/n={count}/seg={seg}'] = torus_scene(count, seg)
+    return scenes
+
+def memory_shapes():
+    '''
+    Lists the shapes whose geometry size is reported, at the default and a dense tessellation
+
+    :return: dict of shape name -> shape
+    '''
+    return {'sphere/seg=30': Sphere(),
+            'sphere/seg=120': Sphere(segments_lat=120, segments_lon=120),
+            'torus/seg=30': Torus(),
+            'torus/seg=120': Torus(segments_u=120, segments_v=60),
+            'cylinder/seg=20': Cylinder(),
+            'cylinder/seg=120': Cylinder(segments=120),
+            'cube': Cube(),
+            'axes': Axes(),
+            'floor': Floor()}
+
+def physics_scenarios(quick=False):
+    '''
+    Lists the physics benchmark scenes, thousands of colliding balls
+
+    :param quick: use fewer and smaller scenes
+    :return: dict of scene name -> build function
+    '''
+    counts = [500, 2000] if quick else [500, 1000, 2000, 4000, 8000]
+    return {f'collisions/n={count}': bouncing_scene(count) for count in counts}
+
+def run_scene(build, frames=60, warmup=5, orbit=True, backend='painter', transform_workers=0):
+    '''
+    Renders a scene headless and times every frame
+
+    :param build: function adding the objects to an engine
+    :param frames: number of timed frames
+    :param warmup: number of untimed frames rendered first
+    :param orbit: rotate the camera every frame so no cached layer can be reused
+    :param backend: drawing backend of the engine, 'painter' or 'zbuffer'
+    :param transform_workers: worker processes of the engine's transform stage, 0 for none
+    :return: dict of latency statistics in milliseconds and throughput in frames per second
+    '''
+    engine = Engine(angle_x=math.radians(-20), angle_y=math.radians(30), viewer_distance=80, headless=True, backend=backend,
+                    transform_workers=transform_workers)
+    build(engine)
+
+    times = []
+    for i in range(warmup + frames):
+        if orbit:
+            engine.angle_y += 0.01
+        start = time.perf_counter()
+        engine.render_frame()
+        if i >= warmup:
+            times.append((time.perf_counter() - start) * 1000)
+    if engine.transformer is not None:
+        engine.transformer.close()
+
+    times = np.array(times)
+    return {'frames': frames,
+            'mean_ms': float(times.mean()),
+            'p50_ms': float(np.percentile(times, 50)),
+            'p90_ms': float(np.percentile(times, 90)),
+            'p99_ms': float(np.percentile(times, 99)),
+            'max_ms': float(times.max()),
+            'fps': float(1000 / times.mean())}
+
+def run_physics(build, steps=60, warmup=5):
+    '''
+    Times the physics steps of a scene on their own, without drawing
+
+    :param build: function adding the balls to an engine
+    :param steps: number of timed physics steps
+    :param warmup: number of untimed steps run first
+    :return: dict of step time statistics in milliseconds, steps per second and time per ball
+    '''
+    engine = Engine(headless=True)
+    build(engine)
+
+    times = []
+    for i in range(warmup + steps):
+        start = time.perf_counter()
+        engine.world.step()
+        if i >= warmup:
+            times.append((time.perf_counter() - start) * 1000)
+
+    times = np.array(times)
+    return {'frames': steps,
+            'mean_ms': float(times.mean()),
+            'p50_ms': float(np.percentile(times, 50)),
+            'p90_ms': float(np.percentile(times, 90)),
+            'p99_ms': float(np.percentile(times, 99)),
+            'max_ms': float(times.max()),
+            'fps': float(1000 / times.mean()),
+            'us_per_ball': float(times.mean() * 1000 / len(engine.balls))}
+
+def compare(results, baseline, tolerance):
+    '''
+    Compares the median frame time of every scene with a stored baseline
+
+    :param results: results dict from this run
+    :param baseline: results dict from the baseline run
+    :param tolerance: allowed slowdown as a fraction, ex: 0.1 for 10%
+    :return: list of (scene, baseline p50, new p50, ratio) for the scenes that got slower
+    '''
+    regressions = []
+    for name, stats in results['results'].items():
+        old = baseline['results'].get(name)
+        if old is None:
+            continue
+        ratio = stats['p50_ms'] / old['p50_ms']
+        print(f'{name:32s} {old["p50_ms"]:9.2f} -> {stats["p50_ms"]:9.2f} ms  x{ratio:.2f}')
+        if ratio > 1 + tolerance:
+            regressions.append((name, old['p50_ms'], stats['p50_ms'], ratio))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Headless rendering benchmarks')
+    parser.add_argument('--frames', type=int, default=60, help='timed frames per scene')
+    parser.add_argument('--warmup', type=int, default=5, help='untimed frames per scene')
+    parser.add_argument('--quick', action='store_true', help='fewer and smaller scenes')
+    parser.add_argument('--filter', default='', help='only run scenes whose name contains this')
+    parser.add_argument('--static-camera', action='store_true', help='keep the camera still so cached layers are reused')
+    parser.add_argument('--backend', choices=('painter', 'zbuffer'), default='painter', help='drawing backend to benchmark')
+    parser.add_argument('--workers', type=int, default=0, help='transform stage worker processes, 0 for none')
+    parser.add_argument('--memory', action='store_true', help='only report the bytes per vertex of the shape geometry')
+    parser.add_argument('--output', default=os.path.join('benchmarks', 'results.json'),
+                        help='file to write the results to (default=benchmarks/results.json, ignored by git)')
+    parser.add_argument('--baseline', help='results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='allowed slowdown before a scene counts as a regression')
+    args = parser.parse_args(argv)
+
+    if args.memory:
+        # every level of detail of each shape, as python lists, as float64/int64 arrays and as compact geometry
+        print(f'{"shape":20s} {"vertices":>9s} {"lists":>9s} {"float64":>9s} {"compact":>9s}   bytes per vertex')
+        for row in memory_report(memory_shapes()):
+            print(f'{row["name"]:20s} {row["vertices"]:9d} {row["list"]:9.1f} {row["float64"]:9.1f} {row["compact"]:9.1f}')
+        return 0
+
+    results = {'meta': {'python': platform.python_version(),
+                        'numpy': np.__version__,
+                        'pygame': pygame.version.ver,
+                        'platform': platform.platform(),
+                        'frames': args.frames,
+                        'orbit': not args.static_camera,
+                        'backend': args.backend,
+                        'workers': args.workers},
+               'results': {}}
+
+    for name, build in scenarios(args.quick).items():
+        if args.filter not in name:
+            continue
+        stats = run_scene(build, args.frames, args.warmup, not args.static_camera, args.backend, args.workers)
+        results['results'][name] = stats
+        print(f'{name:32s} p50 {stats["p50_ms"]:8.2f} ms  p99 {stats["p99_ms"]:8.2f} ms  {stats["fps"]:8.1f} fps')
+
+    for name, build in physics_scenarios(args.quick).items():
+        if args.filter not in name:
+            continue
+        stats = run_physics(build, args.frames, args.warmup)
+        results['results'][name] = stats
+        print(f'{name:32s} p50 {stats["p50_ms"]:8.2f} ms  p99 {stats["p99_ms"]:8.2f} ms  {stats["us_per_ball"]:8.2f} us/ball')
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f'results written to {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f'{len(regressions)} scene(s) slower than the baseline by more than {args.tolerance:.0%}')
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
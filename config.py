@@ -3,14 +3,45 @@ AUTHOR: Imsara Samarasinghe
 EMAIL: imsara256@gmail.com
 '''
 # module imports
+import os
 import pygame
 
 # Screen dimensions
 width, height = 800, 600
 
-# create PyGame window
-screen = pygame.display.set_mode((width, height))
-pygame.display.set_caption("3D Engine")
+# run without a window when ENGINE_HEADLESS=1, e.g. on machines with no display
+HEADLESS = os.environ.get('ENGINE_HEADLESS', '0') == '1'
+
+if HEADLESS:
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy') # pygame.init() must not look for a display
+
+_screen = None # window, or its offscreen stand-in, made on first use
+
+def get_screen():
+    '''
+    Surface shapes draw on when no other is given. The window is only opened the first
+    time this is called, so importing the engine or running Engine(headless=True) never
+    opens one. With ENGINE_HEADLESS=1 it is an offscreen surface instead
+
+    :return: the window surface
+    '''
+    global _screen
+    if _screen is None:
+        if HEADLESS:
+            _screen = pygame.Surface((width, height)) # offscreen surface instead of a window
+        else:
+            # create PyGame window
+            _screen = pygame.display.set_mode((width, height))
+            pygame.display.set_caption("3D Engine")
+    return _screen
+
+def __getattr__(name):
+    '''
+    Keeps config.screen working for scripts that draw on it, it opens the window when used
+    '''
+    if name == 'screen':
+        return get_screen()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 # colors
 COLORS = {'WHITE':(255, 255, 255),
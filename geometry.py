@@ -0,0 +1,114 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import sys
+import numpy as np
+
+def _compact(values, dtype, columns):
+    '''
+    Stores an array as a read-only contiguous array of a small type. Arrays that already
+    have that type, including memory maps, are used as they are without copying
+
+    :param values: array-like or None
+    :param dtype: np.float32 or np.int32
+    :param columns: number of columns
+    :return: (N, columns) array or None
+    '''
+    if values is None:
+        return None
+    values = np.ascontiguousarray(values, dtype=dtype).reshape(-1, columns)
+    values.setflags(write=False) # geometry is shared between shapes, it must never change in place
+    return values
+
+class Geometry:
+    '''
+    Compact mesh buffers of a shape. Positions and normals are float32 and indices int32,
+    each in one contiguous read-only array, and __slots__ keeps the container itself to a
+    few pointers. Transforms still run in double precision, only the stored copy is small
+
+    Attributes:
+        vertices: (N, 3) float32 array of vertices
+        edges: (E, 2) int32 array of vertex indices, None without edges
+        faces: tuple of (F, K) int32 face arrays, one per face size, empty for wireframes
+        normals: tuple of (F, 3) float32 outward normals, one per face array
+        edge_faces: (E, 2) int32 array of the faces either side of each edge, None without faces
+        strips: EdgeStrips the edges are drawn in, None to draw them one by one
+        arrays: The buffers as a list
+        nbytes: Bytes held by the buffers
+    '''
+    __slots__ = ('vertices', 'edges', 'faces', 'normals', 'edge_faces', 'strips')
+
+    def __init__(self, vertices, edges=None, faces=(), normals=(), edge_faces=None, strips=None):
+        '''
+        Class initialiser
+
+        :param vertices: (N, 3) array-like of vertices
+        :param edges: (E, 2) array-like of vertex indices
+        :param faces: sequence of (F, K) face arrays
+        :param normals: sequence of (F, 3) normal arrays, one per face array
+        :param edge_faces: (E, 2) array-like from edge_face_adjacency
+        :param strips: EdgeStrips of the edges
+        '''
+        self.vertices = _compact(vertices, np.float32, 3)
+        self.edges = _compact(edges, np.int32, 2)
+        self.faces = tuple(_compact(group, np.int32, np.shape(group)[1]) for group in faces)
+        self.normals = tuple(_compact(group, np.float32, 3) for group in normals)
+        self.edge_faces = _compact(edge_faces, np.int32, 2)
+        self.strips = strips
+
+    def arrays(self):
+        '''
+        :return: list of the vertex, index and normal arrays
+        '''
+        return [array for array in (self.vertices, self.edges, *self.faces, *self.normals, self.edge_faces) if array is not None]
+
+    def nbytes(self):
+        '''
+        :return: bytes held by the buffers
+        '''
+        return sum(array.nbytes for array in self.arrays())
+
+def shape_geometries(shape):
+    '''
+    Every Geometry a shape holds, one per level of detail
+
+    :param shape: shape, axes or floor object
+    :return: list of Geometry objects
+    '''
+    for name in ('levels', 'meshes'):
+        if getattr(shape, name, None) is not None:
+            return list(getattr(shape, name))
+    return [shape.geometry]
+
+def _list_bytes(value):
+    '''
+    Bytes taken by nested python lists of numbers, counting every list and number object
+
+    :param value: list, tuple, int or float
+    :return: size in bytes
+    '''
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_list_bytes(item) for item in value)
+    return sys.getsizeof(value)
+
+def memory_report(shapes):
+    '''
+    Bytes per vertex of the mesh buffers of some shapes as nested python lists, as float64
+    and int64 numpy arrays and as compact Geometry
+
+    :param shapes: dict of name -> shape
+    :return: list of dicts with 'name', 'vertices', 'list', 'float64' and 'compact' bytes per vertex
+    '''
+    rows = []
+    for name, shape in shapes.items():
+        geometries = shape_geometries(shape)
+        arrays = [array for geometry in geometries for array in geometry.arrays()]
+        vertices = sum(len(geometry.vertices) for geometry in geometries)
+        rows.append({'name': name,
+                     'vertices': vertices,
+                     'list': sum(_list_bytes(array.tolist()) for array in arrays) / vertices,
+                     'float64': sum(array.size * 8 for array in arrays) / vertices, # default numpy float and int size
+                     'compact': sum(array.nbytes for array in arrays) / vertices})
+    return rows
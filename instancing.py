@@ -0,0 +1,154 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import numpy as np
+
+# file imports
+from transforms import rotation_matrix, rotation_matrices, project_vertices, spheres_in_frustum
+from render import FaceQueue, submit_solid, submit_lines, submit_strips
+from geometry import Geometry
+from config import get_screen
+
+def _prototype_geometry(shape):
+    '''
+    Takes the full resolution geometry of a shape to share between instances
+
+    :param shape: Cube, Cylinder, Torus or Mesh object
+    :return: the shape's Geometry, in the shape's own coordinates
+    '''
+    levels = getattr(shape, 'levels', None)
+    geometry = levels[0] if levels is not None else getattr(shape, 'geometry', None)
+    if not isinstance(geometry, Geometry) or not hasattr(shape, 'bound_center'):
+        raise TypeError(f'{type(shape).__name__} cannot be instanced, use a Cube, Cylinder, Torus or Mesh')
+    return geometry # shared, not copied
+
+class InstancedMesh:
+    '''
+    Many copies of one shape, each with its own position, scale, orientation and color.
+    The shape's geometry is stored once and all the visible instances are transformed
+    together in a few batched array operations. Each copy is scaled and rotated about a
+    pivot point of the shape, then moved by its position
+
+    Attributes:
+        __init__: Class initialiser
+        submit: Submit the visible faces and edges of all instances to a face queue
+        draw_shape: Draw all instances
+    '''
+    def __init__(self, prototype, positions, scales=1, orientations=None, colors=None, pivot=None):
+        '''
+        Class initialiser
+
+        :param prototype: Cube, Cylinder, Torus or Mesh whose geometry every instance shares
+        :param positions: (N, 3) offsets of the instances from the prototype, an instance at [0,0,0]
+                          has its pivot where the prototype's is
+        :param scales: one scale for all instances or (N,) scale of each instance (default=1)
+        :param orientations: (N, 3) angles about the x, y & z axes of each instance (default=None for no rotation)
+        :param colors: (N, 3) face color of each instance (default=None for the prototype's face color)
+        :param pivot: point of the prototype the instances are scaled and rotated about
+                      (default=None for the center of its bounding sphere)
+        '''
+        self.geometry = _prototype_geometry(prototype)
+        self.bound_center, self.bound_radius = np.asarray(prototype.bound_center, dtype=float), prototype.bound_radius
+        self.pivot = self.bound_center if pivot is None else np.asarray(pivot, dtype=float)
+        self.edge_color = prototype.edge_color
+        self.face_color = getattr(prototype, 'face_color', None)
+        self.lighting = getattr(prototype, 'lighting', None) # shared with the prototype
+
+        # per-instance transforms
+        self.positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        count = self.count = len(self.positions) # instances in use, the arrays can hold more
+        self.scales = np.broadcast_to(np.asarray(scales, dtype=float), (count,)).copy()
+        self.orientations = rotation_matrices(np.zeros((count, 3)) if orientations is None else orientations)
+        self.colors = None if colors is None else np.broadcast_to(np.asarray(colors, dtype=np.int32), (count, 3)).copy()
+
+    def __len__(self):
+        return self.count
+
+    def submit(self, queue, angle_x, angle_y, angle_z, viewer_distance, rows=None):
+        '''
+        Submits the instances to a face queue. Instances outside the view are dropped first,
+        then the rest are moved into camera space together and submitted as one mesh
+
+        :param queue: FaceQueue to submit to
+        :param angle_x: angle about x axis
+        :param angle_y: angle about y axis
+        :param angle_z: angle about z axis
+        :param viewer_distance: zoom setting
+        :param rows: indices of the instances to submit (default=None for all of them)
+        '''
+        fov = 256
+        rows = np.arange(self.count) if rows is None else np.asarray(rows, dtype=int)
+        r_matrix = np.asarray(rotation_matrix(angle_x, angle_y, angle_z))
+        positions = self.positions[rows] @ r_matrix.T
+        # bounding sphere of each instance, the shape's bounding center turned and scaled about the pivot
+        scales = self.scales[rows]
+        offsets = np.einsum('nij,j->ni', self.orientations[rows], self.bound_center - self.pivot) * scales[:, None]
+        centers = (offsets + self.pivot) @ r_matrix.T + positions
+        visible = np.flatnonzero(spheres_in_frustum(centers, scales * self.bound_radius, fov, viewer_distance))
+        if len(visible) == 0:
+            return
+        in_view, positions = rows[visible], positions[visible]
+        geometry = self.geometry
+        count, size = len(in_view), len(geometry.vertices)
+
+        # camera rotation times the orientation of each instance, and its scaled version for the vertices
+        rotations = np.einsum('ij,njk->nik', r_matrix, self.orientations[in_view])
+        transforms = rotations * self.scales[in_view, None, None]
+        # turning and scaling about the pivot instead of the origin moves each instance by (R - T) pivot,
+        # R being the camera rotation and T the instance's transform. Applied per instance so the shared
+        # vertices are never copied, it is exactly 0 for an instance that is neither scaled nor rotated
+        shifts = np.einsum('nij,j->ni', r_matrix - transforms, self.pivot)
+        camera_vertices = np.einsum('vk,nik->nvi', geometry.vertices, transforms) + (positions + shifts)[:, None, :]
+        camera_vertices = camera_vertices.reshape(-1, 3)
+        projected = project_vertices(camera_vertices, fov, viewer_distance)
+
+        # the index buffers of every instance, offset to its own vertices
+        offsets = np.arange(count) * size
+        edges = None if geometry.edges is None else (geometry.edges[None] + offsets[:, None, None]).reshape(-1, 2)
+        strips = None if geometry.strips is None else geometry.strips.tile(count, len(geometry.edges), size)
+
+        if not geometry.faces: # wireframe, each edge is sorted by the depth of its middle
+            depths = camera_vertices[edges, 2].mean(axis=1)
+            if strips is None:
+                submit_lines(queue, camera_vertices, projected, edges, depths, self.edge_color, 2, fov, viewer_distance)
+            else:
+                submit_strips(queue, camera_vertices, projected, edges, strips, depths, self.edge_color, 2, fov, viewer_distance)
+            return
+
+        face_groups, normal_groups, face_colors = [], [], []
+        for faces, normals in zip(geometry.faces, geometry.normals):
+            face_groups.append((faces[None] + offsets[:, None, None]).reshape(-1, faces.shape[1]))
+            normal_groups.append(np.einsum('fk,nik->nfi', normals, rotations).reshape(-1, 3)) # already in camera space
+            if self.colors is not None:
+                face_colors.append(np.repeat(self.colors[in_view], len(faces), axis=0))
+
+        edge_faces = None
+        if geometry.edge_faces is not None:
+            # renumber the faces next to each edge, faces are numbered group by group across all instances
+            group_sizes = np.array([len(faces) for faces in geometry.faces])
+            group_starts = np.concatenate(([0], np.cumsum(group_sizes)[:-1]))
+            group = np.searchsorted(np.cumsum(group_sizes), geometry.edge_faces, side='right') # group of each local face
+            local = geometry.edge_faces - group_starts[group]
+            numbers = (group_starts[group] * count)[None] + np.arange(count)[:, None, None] * group_sizes[group][None] + local[None]
+            edge_faces = np.where(geometry.edge_faces[None] < 0, -1, numbers).reshape(-1, 2)
+
+        submit_solid(queue, camera_vertices, projected, face_groups, normal_groups, np.eye(3), fov, viewer_distance,
+                     self.face_color, edges, edge_faces, self.edge_color, face_colors=face_colors or None, strips=strips,
+                     lighting=self.lighting, light_matrix=r_matrix)
+
+    def draw_shape(self, angle_x, angle_y, angle_z, viewer_distance, surface=None):
+        '''
+        Draws all instances
+
+        :param angle_x: angle about x axis
+        :param angle_y: angle about y axis
+        :param angle_z: angle about z axis
+        :param viewer_distance: zoom setting
+        :param surface: surface to draw on (default=screen)
+        '''
+        surface = get_screen() if surface is None else surface # draw to the window by default
+        queue = FaceQueue()
+        self.submit(queue, angle_x, angle_y, angle_z, viewer_distance)
+        queue.draw(surface)
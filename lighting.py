@@ -0,0 +1,103 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import numpy as np
+
+# file imports
+from config import COLORS
+
+class Light:
+    '''
+    Directional light
+
+    Attributes:
+        __init__: Class initialiser
+    '''
+    def __init__(self, direction=(-50, 50, 50), intensity=1.0, color=COLORS['WHITE'], camera_space=True):
+        '''
+        Class initialiser
+
+        :param direction: direction the light travels in, faces turned against it are lit
+                          (default=(-50, 50, 50), the light the spheres have always used)
+        :param intensity: brightness multiplier
+        :param color: color of the light
+        :param camera_space: keep the light fixed to the camera (default=True), False to fix it in the world
+        '''
+        direction = np.asarray(direction, dtype=float)
+        self.direction = direction / np.linalg.norm(direction)
+        self.intensity = float(intensity)
+        self.color = tuple(color)
+        self.camera_space = camera_space
+
+class Lighting:
+    '''
+    Lighting stage shared by every shaded shape. Each face gets the ambient brightness
+    plus the diffuse brightness from every light, worked out for all faces of a shape in
+    one matrix product. The light directions are put into camera space once per camera
+    state and reused by all shapes drawn with it
+
+    Attributes:
+        __init__: Class initialiser
+        add_light: Add a light source
+        directions: Light directions in camera space for a camera state
+        shade: Colors of faces from their camera-space normals
+    '''
+    def __init__(self, lights=None, ambient=0.0):
+        '''
+        Class initialiser
+
+        :param lights: sequence of Light objects (default=None for one default Light)
+        :param ambient: brightness of faces no light reaches, between 0 and 1
+        '''
+        self.lights = [Light()] if lights is None else list(lights)
+        self.ambient = float(ambient)
+        self._key = None # camera and lights the cached directions are for
+        self._directions = self._tints = None
+
+    def add_light(self, light):
+        '''
+        Adds a light source
+
+        :param light: Light object
+        :return: the light
+        '''
+        self.lights.append(light)
+        return light
+
+    def directions(self, r_matrix):
+        '''
+        Unit directions of all lights in camera space. World lights are rotated with the
+        camera, so they are only recomputed when the camera or the lights change
+
+        :param r_matrix: rotation matrix of the camera
+        :return: (L, 3) array of directions
+        '''
+        r_matrix = np.asarray(r_matrix, dtype=float)
+        key = (r_matrix.tobytes(), tuple((light.direction.tobytes(), light.camera_space, light.intensity, light.color) for light in self.lights))
+        if key != self._key:
+            directions = np.array([light.direction for light in self.lights]).reshape(-1, 3)
+            world = np.array([not light.camera_space for light in self.lights], dtype=bool)
+            directions[world] = directions[world] @ r_matrix.T
+            # color and intensity of each light as a per-channel brightness
+            self._tints = np.array([np.asarray(light.color) * light.intensity / 255 for light in self.lights]).reshape(-1, 3)
+            self._directions, self._key = directions, key
+        return self._directions
+
+    def shade(self, camera_normals, colors, r_matrix):
+        '''
+        Shades faces by how directly they face each light
+
+        :param camera_normals: (F, 3) array of unit outward normals in camera space
+        :param colors: base color of all faces or (F, 3) array of the base color of each face
+        :param r_matrix: rotation matrix of the camera
+        :return: (F, 3) int32 array of shaded colors
+        '''
+        # (F, L) diffuse term of every face and light, faces turned towards a light have normals against its direction
+        diffuse = np.maximum(-(camera_normals @ self.directions(r_matrix).T), 0)
+        brightness = self.ambient + diffuse @ self._tints # (F, 3) per channel
+        return np.clip(np.asarray(colors, dtype=float) * brightness, 0, 255).astype(np.int32)
+
+# lighting used by shapes that are not given their own
+default_lighting = Lighting()
@@ -0,0 +1,65 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import math
+
+# screen pixels each segment of a silhouette should cover before a finer mesh is used
+PIXELS_PER_SEGMENT = 4
+
+# fraction the screen radius has to drop below a level's limit before a coarser level is used
+LOD_HYSTERESIS = 0.2
+
+def lod_segments(segments, minimum, count=4):
+    '''
+    Segment counts of the levels of detail of a tessellated shape, halving each level
+
+    :param segments: segments of the full resolution mesh
+    :param minimum: fewest segments the shape can be built with
+    :param count: most levels to make
+    :return: list of segment counts, finest first
+    '''
+    levels = [segments]
+    while len(levels) < count and levels[-1] // 2 >= minimum:
+        levels.append(levels[-1] // 2)
+    return levels
+
+class LevelOfDetail:
+    '''
+    Picks one of several precomputed meshes from the radius the shape covers on screen.
+    A level is good enough while its segments each span at most PIXELS_PER_SEGMENT pixels
+    around the silhouette. Finer levels are switched to as soon as they are needed, coarser
+    ones only once the shape is clearly smaller, so the mesh does not pop back and forth
+    when the shape sits at the edge between two levels
+
+    Attributes:
+        __init__: Class initialiser
+        select: Level to draw at for a screen radius
+    '''
+    def __init__(self, segments, hysteresis=LOD_HYSTERESIS):
+        '''
+        Class initialiser
+
+        :param segments: segments around the silhouette of each level, finest first
+        :param hysteresis: fraction below a level's limit the radius must drop to switch down to it
+        '''
+        # largest screen radius in pixels each level is good for, the finest level is always good
+        self.limits = [math.inf] + [s * PIXELS_PER_SEGMENT / (2 * math.pi) for s in segments[1:]]
+        self.hysteresis = hysteresis
+        self.level = 0 # level used last, start at full resolution
+
+    def select(self, screen_radius):
+        '''
+        :param screen_radius: radius of the shape on screen in pixels
+        :return: index of the level to draw, 0 for full resolution
+        '''
+        # coarsest level good enough for this size
+        wanted = max(k for k, limit in enumerate(self.limits) if limit >= screen_radius)
+        if wanted < self.level:
+            self.level = wanted # too coarse, refine straight away
+        else:
+            # only drop to a coarser level once the shape is well inside its limit
+            margin = 1 - self.hysteresis
+            self.level = max(self.level, max(k for k, limit in enumerate(self.limits) if limit * margin >= screen_radius))
+        return self.level
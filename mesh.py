@@ -0,0 +1,293 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import os
+import json
+import shutil
+import hashlib
+from array import array
+import numpy as np
+
+# file imports
+from transforms import rotation_matrix, rotate_vertices, project_vertices, bounding_sphere, sphere_in_frustum
+from render import FaceQueue, submit_solid
+from geometry import Geometry
+from lighting import Light, Lighting
+from config import get_screen, COLORS
+
+# folder the parsed meshes are cached in, ENGINE_MESH_CACHE overrides it
+MESH_CACHE_DIR = os.environ.get('ENGINE_MESH_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'engine_meshes'))
+
+# bump when the cached arrays change, so old caches are parsed again
+MESH_CACHE_VERSION = 2
+
+# brightness of faces turned side on to the viewer, faces looking straight at it are full brightness
+MESH_AMBIENT = 0.35
+
+# light shining from the viewer into the screen, used by meshes that are not given a lighting of their own
+MESH_LIGHTING = Lighting([Light((0, 0, 1), 1 - MESH_AMBIENT)], ambient=MESH_AMBIENT)
+
+# one triangle of a binary STL file
+STL_TRIANGLE = np.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')])
+
+def load_obj(path):
+    '''
+    Streams a Wavefront OBJ file into vertex and index buffers. Only the positions and the
+    faces are read, polygons are split into triangle fans
+
+    :param path: path of the .obj file
+    :return vertices, faces: (N, 3) float array and (F, 3) int32 array of triangles
+    '''
+    vertices, faces = array('d'), array('i') # flat buffers, no python object per number
+    count = 0 # vertices read so far, for relative indices
+    with open(path, 'rb') as file:
+        for line in file:
+            if line.startswith(b'v '):
+                x, y, z = line.split()[1:4]
+                vertices.extend((float(x), float(y), float(z)))
+                count += 1
+            elif line.startswith(b'f '):
+                # 'v', 'v/vt', 'v//vn' or 'v/vt/vn', 1-based or negative from the end
+                refs = [int(token.split(b'/', 1)[0]) for token in line.split()[1:]]
+                refs = [ref - 1 if ref > 0 else count + ref for ref in refs]
+                for k in range(1, len(refs) - 1):
+                    faces.extend((refs[0], refs[k], refs[k + 1]))
+    vertices = np.frombuffer(vertices, dtype=float).reshape(-1, 3)
+    faces = np.frombuffer(faces, dtype=np.int32).reshape(-1, 3)
+    if len(faces) and (faces.min() < 0 or faces.max() >= len(vertices)):
+        raise ValueError(f'{path} has faces using vertices that do not exist')
+    return vertices, faces
+
+def load_stl(path):
+    '''
+    Reads a binary STL file. The triangles are memory mapped and corners shared between
+    triangles are merged into one vertex
+
+    :param path: path of the .stl file
+    :return vertices, faces: (N, 3) float array and (F, 3) int32 array of triangles
+    '''
+    size = os.path.getsize(path)
+    with open(path, 'rb') as file:
+        file.seek(80) # skip the header
+        count = int(np.frombuffer(file.read(4), dtype='<u4')[0]) if size >= 84 else -1
+    if size != 84 + count * STL_TRIANGLE.itemsize:
+        raise ValueError(f'{path} is not a binary STL file, ASCII STL is not supported')
+    if count == 0:
+        return np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int32)
+
+    triangles = np.memmap(path, dtype=STL_TRIANGLE, mode='r', offset=84, shape=(count,))
+    corners = triangles['vertices'].reshape(-1, 3) + np.float32(0) # also turns -0.0 into 0.0
+
+    # sort the corners by their bits and number the runs of equal ones, much faster than np.unique(axis=0)
+    bits = corners.view(np.uint32)
+    order = np.lexsort(bits.T[::-1])
+    ordered = bits[order]
+    new = np.ones(len(ordered), dtype=bool)
+    new[1:] = (ordered[1:] != ordered[:-1]).any(axis=1)
+    faces = np.empty(len(corners), dtype=np.int32)
+    faces[order] = np.cumsum(new) - 1
+    return corners[order[new]].astype(float), faces.reshape(-1, 3)
+
+def triangle_normals(vertices, faces):
+    '''
+    Unit normals of triangles wound counter-clockwise when seen from outside, as in OBJ and STL files
+
+    :param vertices: (N, 3) array of vertices
+    :param faces: (F, 3) array of vertex indices
+    :return: (F, 3) array of unit normals, zero for degenerate triangles
+    '''
+    corners = vertices[faces]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    lengths = np.linalg.norm(normals, axis=1)
+    nonzero = lengths != 0
+    normals[nonzero] /= lengths[nonzero, None]
+    return normals
+
+def triangle_edges(faces):
+    '''
+    Finds the edges of a triangle mesh and the faces either side of each one, without a python loop per face
+
+    :param faces: (F, 3) array of vertex indices
+    :return edges, edge_faces: (E, 2) int32 array of vertex indices and (E, 2) int32 array of the
+                               first two faces using each edge, -1 where there is only one
+    '''
+    sides = np.sort(np.stack((faces, np.roll(faces, -1, axis=1)), axis=2).reshape(-1, 2), axis=1).astype(np.int64)
+    owners = np.repeat(np.arange(len(faces), dtype=np.int32), 3)
+    size = int(sides.max()) + 1 if len(sides) else 1
+    keys, inverse = np.unique(sides[:, 0] * size + sides[:, 1], return_inverse=True) # one integer per edge
+    edges = np.stack((keys // size, keys % size), axis=1)
+
+    # order the sides by edge so the faces of each edge are next to each other
+    order = np.argsort(inverse, kind='stable')
+    starts = np.searchsorted(inverse[order], np.arange(len(edges)))
+    counts = np.diff(np.append(starts, len(order)))
+    edge_faces = np.full((len(edges), 2), -1, dtype=np.int32)
+    edge_faces[:, 0] = owners[order[starts]]
+    shared = counts > 1
+    edge_faces[shared, 1] = owners[order[starts[shared] + 1]]
+    return edges.astype(np.int32), edge_faces
+
+def _cache_path(path, cache_dir):
+    '''
+    :param path: path of the mesh file
+    :param cache_dir: folder holding the caches
+    :return: folder the parsed mesh is cached in, it changes whenever the file does
+    '''
+    stat = os.stat(path)
+    key = f'{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{MESH_CACHE_VERSION}'
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f'{stem}-{hashlib.sha1(key.encode()).hexdigest()[:16]}')
+
+def _save_arrays(folder, arrays):
+    '''
+    Writes arrays into a cache folder, through a temporary folder so a half written cache is never read
+
+    :param folder: cache folder of the mesh
+    :param arrays: dict of name -> array
+    '''
+    temporary = f'{folder}.tmp{os.getpid()}'
+    os.makedirs(temporary, exist_ok=True)
+    for name, values in arrays.items():
+        np.save(os.path.join(temporary, name + '.npy'), values)
+    if not os.path.isdir(folder):
+        os.replace(temporary, folder)
+        return
+    for name in arrays: # the folder already exists, add the new arrays to it
+        os.replace(os.path.join(temporary, name + '.npy'), os.path.join(folder, name + '.npy'))
+    shutil.rmtree(temporary, ignore_errors=True)
+
+def load_mesh(path, cache_dir=None, edges=False):
+    '''
+    Loads an OBJ or binary STL file through the disk cache. The first load parses the file
+    and saves the arrays as .npy files, later loads memory map them, so they are read from
+    disk as they are used instead of being parsed again
+
+    :param path: path of the .obj or .stl file
+    :param cache_dir: folder for the caches (default=None for MESH_CACHE_DIR)
+    :param edges: also load the edges and the faces either side of them
+    :return: dict with 'vertices', 'faces' and 'normals' arrays, and 'edges' and 'edge_faces' if asked for
+    '''
+    folder = _cache_path(path, MESH_CACHE_DIR if cache_dir is None else cache_dir)
+    names = ['vertices', 'faces', 'normals'] + (['edges', 'edge_faces'] if edges else [])
+
+    def cached(name):
+        file = os.path.join(folder, name + '.npy')
+        return np.load(file, mmap_mode='r') if os.path.exists(file) else None
+    arrays = {name: cached(name) for name in names}
+    if all(values is not None for values in arrays.values()):
+        return arrays
+
+    missing = {}
+    if arrays['vertices'] is None or arrays['faces'] is None or arrays['normals'] is None:
+        extension = os.path.splitext(path)[1].lower()
+        if extension == '.obj':
+            vertices, faces = load_obj(path)
+        elif extension == '.stl':
+            vertices, faces = load_stl(path)
+        else:
+            raise ValueError(f'cannot load {extension!r} files, use .obj or .stl')
+        # stored as compact float32 so Geometry can use the memory maps without copying
+        missing.update(vertices=vertices.astype(np.float32), faces=faces, normals=triangle_normals(vertices, faces).astype(np.float32))
+    if edges and (arrays['edges'] is None or arrays['edge_faces'] is None):
+        missing['edges'], missing['edge_faces'] = triangle_edges(missing.get('faces', arrays['faces']))
+
+    _save_arrays(folder, missing)
+    with open(os.path.join(folder, 'source.json'), 'w') as file:
+        json.dump({'path': os.path.abspath(path), 'version': MESH_CACHE_VERSION}, file)
+    return {name: cached(name) for name in names}
+
+class Mesh:
+    '''
+    Triangle mesh loaded from an OBJ or binary STL file. The parsed arrays come from a
+    memory mapped disk cache so large models load without being parsed again. Faces are
+    shaded by how directly they face the viewer unless the mesh is given its own lighting
+
+    attributes:
+        __init__: Loads the mesh and places it
+        prepare: Culls the mesh
+        submit: Submits the visible faces and edges of the mesh to a face queue
+        draw_shape: Draws the mesh
+    '''
+    def __init__(self, path, center=None, scale=1, edge_color=None, face_color=COLORS['GREY'], cache_dir=None, lighting=None):
+        '''
+        Initialise the class
+
+        :param path: path of the .obj or .stl file
+        :param center: where to put the middle of the mesh's bounding box (default=None to keep the file's coordinates)
+        :param scale: size multiplier applied about the middle of the bounding box
+        :param edge_color: color of the triangle edges (default=None to draw no edges)
+        :param face_color: color of the faces
+        :param cache_dir: folder for the parsed mesh caches (default=None for MESH_CACHE_DIR)
+        :param lighting: Lighting the faces are shaded with (default=None for MESH_LIGHTING)
+        '''
+        arrays = load_mesh(path, cache_dir, edges=edge_color is not None)
+        vertices = arrays['vertices']
+        if center is not None or scale != 1:
+            # only a moved or scaled mesh is copied into memory, otherwise the memory map is used as it is
+            middle = (vertices.min(axis=0).astype(float) + vertices.max(axis=0)) / 2
+            vertices = (vertices - middle) * scale + (middle if center is None else np.asarray(center, dtype=float))
+        normals = arrays['normals'] if scale > 0 else -arrays['normals'] # a negative scale turns the mesh inside out
+        self.geometry = Geometry(vertices, arrays.get('edges'), (arrays['faces'],), (normals,), arrays.get('edge_faces'))
+        self.bound_center, self.bound_radius = bounding_sphere(self.geometry.vertices) # for frustum culling
+        self.edge_color = edge_color
+        self.face_color = face_color
+        self.lighting = MESH_LIGHTING if lighting is None else lighting
+
+    def prepare(self, angle_x, angle_y, angle_z, viewer_distance):
+        '''
+        Culls the mesh
+
+        :param angle_x: angle about x axis
+        :param angle_y: angle about y axis
+        :param angle_z: angle about z axis
+        :param viewer_distance: zoom setting
+        :return: vertices to rotate and project, None when the mesh is out of view
+        '''
+        r_matrix = rotation_matrix(angle_x, angle_y, angle_z) # find the rotation matrix for the given angle
+        if len(self.geometry.vertices) == 0 or not sphere_in_frustum(rotate_vertices(self.bound_center, r_matrix), self.bound_radius, 256, viewer_distance):
+            return None # mesh is empty or out of view
+        return self.geometry.vertices
+
+    def submit(self, queue, angle_x, angle_y, angle_z, viewer_distance, transformed=None):
+        '''
+        Submits the mesh to a face queue after rotating and projecting it. Back faces are culled and
+        only the edges of visible faces are kept
+
+        :param queue: FaceQueue to submit to
+        :param angle_x: angle about x axis
+        :param angle_y: angle about y axis
+        :param angle_z: angle about z axis
+        :param viewer_distance: zoom setting
+        :param transformed: (camera_vertices, projected) of the vertices returned by prepare, from a
+                            transform stage (default=None to cull and transform here)
+        '''
+        fov = 256
+        r_matrix = rotation_matrix(angle_x, angle_y, angle_z) # find the rotation matrix for the given angle
+        if transformed is None:
+            if self.prepare(angle_x, angle_y, angle_z, viewer_distance) is None:
+                return # mesh is out of view
+            camera_vertices = rotate_vertices(self.geometry.vertices, r_matrix)
+            projected = project_vertices(camera_vertices, fov, viewer_distance)
+        else:
+            camera_vertices, projected = transformed
+
+        geometry = self.geometry
+        submit_solid(queue, camera_vertices, projected, geometry.faces, geometry.normals, r_matrix, fov, viewer_distance,
+                     self.face_color, geometry.edges, geometry.edge_faces, self.edge_color, lighting=self.lighting)
+
+    def draw_shape(self, angle_x, angle_y, angle_z, viewer_distance, surface=None):
+        '''
+        Draws the mesh, applying the transformations
+
+        :param angle_x: angle about x axis
+        :param angle_y: angle about y axis
+        :param angle_z: angle about z axis
+        :param viewer_distance: zoom setting
+        :param surface: surface to draw on (default=screen)
+        '''
+        surface = get_screen() if surface is None else surface # draw to the window by default
+        queue = FaceQueue()
+        self.submit(queue, angle_x, angle_y, angle_z, viewer_distance)
+        queue.draw(surface)
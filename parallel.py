@@ -0,0 +1,176 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import os
+import weakref
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+# workers are forked so they start from the parent's state instead of re-running the main script,
+# which would open another window. Where fork is missing the transforms stay in this process
+_FORK = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+
+# fewest vertices worth sending to the workers, smaller batches are transformed in this process
+PARALLEL_MIN_VERTICES = 20000
+
+# shared memory blocks a worker has attached to, by name
+_attached = {}
+
+def _buffers(names, capacity):
+    '''
+    Views of the shared vertex buffers, attaching to blocks the first time they are seen
+
+    :param names: names of the input, camera and projected blocks
+    :param capacity: vertices each block holds
+    :return inputs, camera, projected: (capacity, 3) float, (capacity, 3) float and (capacity, 2) int arrays
+    '''
+    for name in list(_attached):
+        if name not in names: # the buffers were replaced by bigger ones
+            _attached.pop(name).close()
+    blocks = []
+    for name in names:
+        if name not in _attached:
+            _attached[name] = shared_memory.SharedMemory(name=name)
+        blocks.append(_attached[name].buf)
+    return (np.ndarray((capacity, 3), dtype=float, buffer=blocks[0]),
+            np.ndarray((capacity, 3), dtype=float, buffer=blocks[1]),
+            np.ndarray((capacity, 2), dtype=int, buffer=blocks[2]))
+
+def _transform_range(inputs, camera, projected, start, stop, r_matrix, fov, viewer_distance, screen_size, near_plane):
+    '''
+    Rotates and projects a range of vertices straight into the output buffers, the same
+    way as rotate_vertices and project_vertices
+
+    :param inputs: (N, 3) array of vertices
+    :param camera: (N, 3) array the rotated vertices are written to
+    :param projected: (N, 2) array the projected vertices are written to
+    :param start: first vertex of the range
+    :param stop: end of the range
+    :param r_matrix: (3, 3) rotation matrix
+    :param fov: field of view
+    :param viewer_distance: zoom setting
+    :param screen_size: (width, height) of the screen
+    :param near_plane: closest depth in front of the viewer
+    '''
+    rotated = camera[start:stop]
+    np.matmul(inputs[start:stop], r_matrix.T, out=rotated)
+    factor = fov / np.maximum(viewer_distance + rotated[:, 2], near_plane)
+    projected[start:stop, 0] = rotated[:, 0] * factor + screen_size[0] / 2 # truncated towards zero like astype(int)
+    projected[start:stop, 1] = -rotated[:, 1] * factor + screen_size[1] / 2
+
+def _transform_chunk(task):
+    '''
+    Worker entry point, transforms one chunk of the shared vertices
+
+    :param task: (names, capacity, start, stop, r_matrix, fov, viewer_distance, screen_size, near_plane)
+    '''
+    names, capacity, start, stop, *camera_state = task
+    _transform_range(*_buffers(names, capacity), start, stop, *camera_state)
+
+def _release(blocks, pool):
+    '''
+    Shuts the workers down and frees the shared memory, run on close or when the stage is garbage collected
+
+    :param blocks: list of SharedMemory blocks, emptied in place
+    :param pool: ProcessPoolExecutor or None
+    '''
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+    for block in blocks:
+        block.close()
+        block.unlink()
+    blocks.clear()
+
+class ParallelTransformer:
+    '''
+    Transform stage that rotates and projects the vertices of many shapes at once across
+    a pool of worker processes. The vertices are copied into one shared memory buffer, each
+    worker writes its chunk of rotated and projected vertices straight into shared output
+    buffers, and the results are handed back as views of those buffers without copying
+
+    Attributes:
+        __init__: Class initialiser
+        transform: Rotate and project several vertex arrays together
+        _reserve: Make room for a number of vertices in the shared buffers
+        close: Stop the workers and free the shared memory
+    '''
+    def __init__(self, screen_size, near_plane, workers=None, min_vertices=PARALLEL_MIN_VERTICES):
+        '''
+        Class initialiser
+
+        :param screen_size: (width, height) of the screen
+        :param near_plane: closest depth in front of the viewer, points behind it are projected onto it
+        :param workers: number of worker processes (default=None for one per core), ignored
+                        where processes cannot be forked
+        :param min_vertices: fewest vertices sent to the workers, smaller batches are done in this process
+        '''
+        self.screen_size = tuple(screen_size)
+        self.near_plane = near_plane
+        self.workers = workers or os.cpu_count() or 1
+        self.min_vertices = min_vertices
+        if _FORK is None:
+            self.workers = 1
+        self.pool = ProcessPoolExecutor(self.workers, mp_context=_FORK) if self.workers > 1 else None # started lazily by the executor
+        self.blocks = [] # input, camera and projected shared memory blocks
+        self.capacity = 0
+        self._finalizer = weakref.finalize(self, _release, self.blocks, self.pool)
+
+    def _reserve(self, count):
+        '''
+        Makes room for count vertices, replacing the shared buffers with ones twice as big when they are full
+
+        :param count: number of vertices needed
+        '''
+        if count <= self.capacity:
+            return
+        capacity = max(count, 2 * self.capacity, 1024)
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks[:] = [shared_memory.SharedMemory(create=True, size=capacity * columns * 8) for columns in (3, 3, 2)]
+        self.capacity = capacity
+        self.inputs = np.ndarray((capacity, 3), dtype=float, buffer=self.blocks[0].buf)
+        self.camera = np.ndarray((capacity, 3), dtype=float, buffer=self.blocks[1].buf)
+        self.projected = np.ndarray((capacity, 2), dtype=int, buffer=self.blocks[2].buf)
+
+    def transform(self, arrays, r_matrix, fov, viewer_distance):
+        '''
+        Rotates and projects several vertex arrays together. The results are views of the
+        shared buffers, so they are only valid until the next call
+
+        :param arrays: sequence of (N, 3) vertex arrays
+        :param r_matrix: rotation matrix
+        :param fov: field of view
+        :param viewer_distance: zoom setting
+        :return: list of (camera_vertices, projected) for each array, as returned by rotate_vertices and project_vertices
+        '''
+        sizes = [len(array) for array in arrays]
+        ends = np.cumsum(sizes).tolist()
+        total = ends[-1] if ends else 0
+        if total == 0:
+            return [(np.zeros((0, 3)), np.zeros((0, 2), dtype=int)) for _ in arrays] # nothing to transform
+        self._reserve(total)
+        for array, end, size in zip(arrays, ends, sizes):
+            self.inputs[end - size:end] = array
+
+        camera_state = (np.asarray(r_matrix, dtype=float), fov, viewer_distance, self.screen_size, self.near_plane)
+        if self.pool is None or total < self.min_vertices:
+            _transform_range(self.inputs, self.camera, self.projected, 0, total, *camera_state)
+        else:
+            # one chunk per worker, each writes its own rows of the output buffers
+            names = tuple(block.name for block in self.blocks)
+            bounds = np.linspace(0, total, self.workers + 1).astype(int).tolist()
+            tasks = [(names, self.capacity, start, stop) + camera_state for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+            list(self.pool.map(_transform_chunk, tasks)) # wait for every chunk, re-raising worker errors
+
+        return [(self.camera[end - size:end], self.projected[end - size:end]) for end, size in zip(ends, sizes)]
+
+    def close(self):
+        '''
+        Stops the worker processes and frees the shared memory
+        '''
+        self._finalizer()
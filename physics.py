@@ -0,0 +1,242 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import numpy as np
+
+# neighbouring cells searched for each cell of the spatial hash. Only half of the 26
+# neighbours are listed so every pair of cells is visited once
+NEIGHBOUR_CELLS = np.array([(0, 0, 0)] + [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)
+                                          if (dx, dy, dz) > (0, 0, 0)])
+
+# cell coordinates are packed into one integer key, each axis gets 21 bits
+_CELL_BITS = 21
+_CELL_OFFSET = 1 << (_CELL_BITS - 1)
+
+def cell_keys(cells):
+    '''
+    Packs integer cell coordinates into hash keys
+
+    :param cells: (N, 3) integer array of cell coordinates from -2**20 to 2**20 - 1, see fit_cells
+    :return: (N,) int64 array of keys, equal for equal cells
+    '''
+    cells = cells.astype(np.int64) + _CELL_OFFSET
+    return (cells[:, 0] << (2 * _CELL_BITS)) | (cells[:, 1] << _CELL_BITS) | cells[:, 2]
+
+def fit_cells(cells):
+    '''
+    Moves cell coordinates into the range cell_keys can pack, with room for the neighbouring
+    cells. An axis that already fits is kept and one that spans few enough cells is shifted.
+    On a wider axis each coordinate is replaced by its rank among the occupied cells and
+    their neighbours on that axis, which keeps neighbouring cells next to each other and
+    works for up to about 700 000 bodies
+
+    :param cells: (N, 3) int64 array of cell coordinates
+    :return: (N, 3) int64 array of coordinates from 1 - 2**20 to 2**20 - 2
+    '''
+    low, high = cells.min(axis=0), cells.max(axis=0)
+    if low.min() > -_CELL_OFFSET and high.max() < _CELL_OFFSET - 1:
+        return cells # the usual case, nothing to do
+    cells = cells.copy()
+    for axis in range(3):
+        if low[axis] > -_CELL_OFFSET and high[axis] < _CELL_OFFSET - 1:
+            continue
+        if high[axis] - low[axis] < 2 * _CELL_OFFSET - 2:
+            cells[:, axis] -= low[axis] + _CELL_OFFSET - 1
+        else:
+            column = cells[:, axis]
+            values = np.unique(np.concatenate([column - 1, column, column + 1]))
+            cells[:, axis] = np.searchsorted(values, column) - _CELL_OFFSET
+    return cells
+
+class PhysicsWorld:
+    '''
+    Holds the physics state of every body in contiguous arrays (struct of arrays) so
+    gravity, collisions and floor bounces are applied to all bodies in a single vectorized step.
+    Sphere objects read and write their row of these arrays
+
+    Attributes:
+        __init__: Class initialiser
+        add_body: Add a body and return its index
+        step: Advance every body by one physics step
+        candidate_pairs: Pairs of bodies sharing or neighbouring a spatial hash cell
+        _collide: Separate overlapping bodies and exchange their momentum
+        interpolate: Positions between the last two steps for drawing
+    '''
+    def __init__(self, capacity=64, collisions=True, cell_size=None):
+        '''
+        Class initialiser
+
+        :param capacity: number of bodies to allocate space for, grows when exceeded
+        :param collisions: let bodies bounce off each other, not only off the floor
+        :param cell_size: edge length of the spatial hash cells (default=None for the largest diameter)
+        '''
+        self.collisions = collisions
+        self.cell_size = cell_size
+        self.order = np.zeros(0, dtype=np.int64) # bodies sorted by hash cell at the last step
+        self.count = 0 # number of bodies in the world
+        self.positions = np.zeros((capacity, 3)) # centers of the bodies
+        self.previous_positions = np.zeros((capacity, 3)) # centers before the last step
+        self.draw_positions = np.zeros((capacity, 3)) # interpolated centers for drawing
+        self.interpolated = np.zeros(capacity, dtype=bool) # True where draw_positions is up to date
+        self.velocities = np.zeros((capacity, 3)) # velocity per step
+        self.radii = np.zeros(capacity)
+        self.gravity = np.zeros(capacity) # downwards acceleration per step
+        self.damping = np.zeros(capacity) # fraction of the speed kept after a bounce
+        self.floors = np.zeros((capacity, 3)) # point on the floor under each body
+
+    def _grow(self, capacity):
+        '''
+        Reallocates every array with room for more bodies
+
+        :param capacity: new number of bodies
+        '''
+        for name in ('positions', 'previous_positions', 'draw_positions', 'interpolated', 'velocities',
+                     'radii', 'gravity', 'damping', 'floors'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def add_body(self, center, radius, velocity=(0, 0, 0), gravity=0.01, damping=0.9, floor=(0, 0, 0)):
+        '''
+        Adds a body to the world
+
+        :param center: initial center ex: [1,2,3]
+        :param radius: radius of the body
+        :param velocity: initial velocity per step
+        :param gravity: downwards acceleration per step
+        :param damping: fraction of the speed kept after a bounce
+        :param floor: point on the floor the body bounces on
+        :return index: row of the body in the arrays
+        '''
+        if self.count == len(self.positions):
+            self._grow(max(1, 2 * self.count))
+        index = self.count
+        self.positions[index] = center
+        self.previous_positions[index] = center
+        self.interpolated[index] = False
+        self.velocities[index] = velocity
+        self.radii[index] = radius
+        self.gravity[index] = gravity
+        self.damping[index] = damping
+        self.floors[index] = floor
+        self.count += 1
+        return index
+
+    def step(self):
+        '''
+        Advances every body by one step: applies gravity, moves the bodies, resolves
+        collisions between them and bounces the ones that went through their floor
+        '''
+        n = self.count
+        positions, velocities = self.positions[:n], self.velocities[:n]
+        self.previous_positions[:n] = positions
+        self.interpolated[:n] = False
+
+        velocities[:, 1] -= self.gravity[:n] # Increase the velocity downwards
+        positions += velocities
+
+        if self.collisions and n > 1:
+            self._collide(*self.candidate_pairs())
+
+        # Handle floor collisions, bounce with damping
+        floor_y = self.floors[:n, 1] + self.radii[:n]
+        hit = positions[:, 1] < floor_y
+        positions[hit, 1] = floor_y[hit]
+        velocities[hit, 1] *= -self.damping[:n][hit]
+
+    def candidate_pairs(self):
+        '''
+        Broad phase. Bodies are binned into a uniform grid of cells at least one diameter
+        wide, so a body can only touch bodies in its own or a neighbouring cell. The bodies
+        are kept sorted by cell key and each step starts from the previous order, which is
+        nearly sorted already, so the stable sort that rebuilds the hash is close to linear
+
+        :return i, j: arrays of body indices, one entry per candidate pair
+        '''
+        n = self.count
+        radii = self.radii[:n]
+        cell_size = self.cell_size or (2 * radii.max() if n else 0)
+        if cell_size <= 0: # no bodies, or only bodies of zero size, which never overlap
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        cells = fit_cells(np.floor(self.positions[:n] / cell_size).astype(np.int64))
+        keys = cell_keys(cells)
+
+        # re-sort starting from the last order, new bodies go on the end
+        if len(self.order) != n:
+            self.order = np.concatenate([self.order[self.order < n], np.arange(len(self.order), n)])
+        self.order = self.order[np.argsort(keys[self.order], kind='stable')]
+        sorted_keys = keys[self.order]
+
+        pairs_i, pairs_j = [], []
+        for offset in NEIGHBOUR_CELLS:
+            # range of sorted bodies in the neighbouring cell of every body
+            neighbour = cell_keys(cells + offset)
+            lo = np.searchsorted(sorted_keys, neighbour, 'left')
+            counts = np.searchsorted(sorted_keys, neighbour, 'right') - lo
+            total = counts.sum()
+            if total == 0:
+                continue
+            i = np.repeat(np.arange(n), counts)
+            starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+            j = self.order[starts + np.arange(total)]
+            if not offset.any():
+                keep = i < j # pairs in the same cell are found from both ends
+                i, j = i[keep], j[keep]
+            pairs_i.append(i)
+            pairs_j.append(j)
+
+        if not pairs_i:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(pairs_i), np.concatenate(pairs_j)
+
+    def _collide(self, i, j):
+        '''
+        Narrow phase and response. Overlapping pairs are pushed apart along the line
+        between their centers and bounce off each other, losing speed by the smaller of
+        their damping factors. Heavier (larger) bodies move less
+
+        :param i: first body of each candidate pair
+        :param j: second body of each candidate pair
+        '''
+        positions, velocities = self.positions, self.velocities
+        delta = positions[j] - positions[i]
+        distance = np.sqrt((delta ** 2).sum(axis=1))
+        overlap = self.radii[i] + self.radii[j] - distance
+        hit = (overlap > 0) & (distance > 0)
+        if not hit.any():
+            return
+        i, j, delta, distance, overlap = i[hit], j[hit], delta[hit], distance[hit], overlap[hit]
+        normal = delta / distance[:, None]
+
+        # mass grows with the volume of the ball
+        inv_i = 1 / self.radii[i] ** 3
+        inv_j = 1 / self.radii[j] ** 3
+        inv_sum = inv_i + inv_j
+
+        # separate the pair so they just touch
+        push = (overlap / inv_sum)[:, None] * normal
+        np.add.at(positions, i, -push * inv_i[:, None])
+        np.add.at(positions, j, push * inv_j[:, None])
+
+        # exchange momentum along the normal for the pairs moving towards each other
+        approach = ((velocities[j] - velocities[i]) * normal).sum(axis=1)
+        restitution = np.minimum(self.damping[i], self.damping[j])
+        impulse = (np.minimum(approach, 0) * (1 + restitution) / inv_sum)[:, None] * normal
+        np.add.at(velocities, i, impulse * inv_i[:, None])
+        np.add.at(velocities, j, -impulse * inv_j[:, None])
+
+    def interpolate(self, alpha):
+        '''
+        Places every body between its last two steps for drawing
+
+        :param alpha: fraction of a step since the last step, between 0 and 1
+        :return: (count, 3) array of positions to draw the bodies at
+        '''
+        n = self.count
+        previous = self.previous_positions[:n]
+        self.draw_positions[:n] = previous + (self.positions[:n] - previous) * alpha
+        self.interpolated[:n] = True
+        return self.draw_positions[:n]
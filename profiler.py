@@ -0,0 +1,196 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import csv
+import time
+from collections import deque, defaultdict
+from contextlib import nullcontext
+
+# file imports
+from text import TextCache
+
+# shared do-nothing context for when profiling is off
+_NO_TIMER = nullcontext()
+
+class _Timer:
+    '''
+    Context manager adding the time spent inside it to a frame record
+    '''
+    __slots__ = ('record', 'name', 'start')
+
+    def __init__(self, record, name):
+        self.record = record
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.record[self.name] += time.perf_counter() - self.start
+
+class FrameProfiler:
+    '''
+    Times each stage of a frame and each object drawn in it. Keeps a rolling window of
+    frames for the on-screen overlay and can stream every frame to a CSV file
+
+    Attributes:
+        __init__: Class initialiser
+        begin_frame: Start timing a frame
+        stage: Context manager timing a stage of the frame
+        measure_object: Context manager timing the work of one object
+        end_frame: Finish the frame and store its record
+        averages: Average stage times over the rolling window
+        draw_overlay: Draw FPS, frame time and the stage breakdown
+        flush: Write the buffered CSV rows to disk
+        close: Close the CSV file
+    '''
+    def __init__(self, enabled=True, csv_path=None, window=120, overlay=True):
+        '''
+        Class initialiser
+
+        :param enabled: time the frames, when False every method does nothing
+        :param csv_path: file to stream per-frame records to (default=None for no file)
+        :param window: number of frames kept for the rolling averages
+        :param overlay: draw the overlay when draw_overlay is called
+        '''
+        self.enabled = enabled
+        self.overlay = overlay
+        self.frames = deque(maxlen=window) # (frame time, stage times) of recent frames
+        self.frame_starts = deque(maxlen=window) # start time of recent frames, for the FPS
+        self.frame_number = 0
+        self.stages = None
+        self.objects = None
+        self.frame_start = None
+
+        # overlay text is only re-rendered a few times a second
+        self.text = TextCache(size=12, max_entries=64)
+        self.overlay_lines = []
+        self.overlay_refresh = 15 # frames between overlay updates
+
+        self.csv_file = None
+        self.csv_writer = None
+        if enabled and csv_path:
+            self.csv_file = open(csv_path, 'w', newline='')
+            self.csv_writer = csv.writer(self.csv_file)
+            self.csv_writer.writerow(['frame', 'kind', 'name', 'ms'])
+
+    def begin_frame(self):
+        '''
+        Starts timing a new frame
+        '''
+        if not self.enabled:
+            return
+        self.stages = defaultdict(float)
+        self.objects = defaultdict(float)
+        self.frame_start = time.perf_counter()
+
+    def stage(self, name):
+        '''
+        :param name: name of the stage, ex: 'floor'
+        :return: context manager adding the time spent inside it to the stage
+        '''
+        if not self.enabled or self.stages is None:
+            return _NO_TIMER
+        return _Timer(self.stages, name)
+
+    def measure_object(self, shape, index):
+        '''
+        :param shape: object being drawn or updated
+        :param index: position of the object in its engine list, to tell objects apart
+        :return: context manager adding the time spent inside it to the object
+        '''
+        if not self.enabled or self.objects is None:
+            return _NO_TIMER
+        return _Timer(self.objects, f'{type(shape).__name__}{index}')
+
+    def end_frame(self):
+        '''
+        Finishes the frame, stores it in the rolling window and writes it to the CSV file
+        '''
+        if not self.enabled or self.stages is None:
+            return
+        frame_time = time.perf_counter() - self.frame_start
+        self.frames.append((frame_time, dict(self.stages)))
+        self.frame_starts.append(self.frame_start)
+
+        if self.csv_writer is not None:
+            rows = [(self.frame_number, 'frame', 'total', frame_time * 1000)]
+            rows += [(self.frame_number, 'stage', name, t * 1000) for name, t in self.stages.items()]
+            rows += [(self.frame_number, 'object', name, t * 1000) for name, t in self.objects.items()]
+            self.csv_writer.writerows(rows)
+
+        if self.frame_number % self.overlay_refresh == 0:
+            self.overlay_lines = self._overlay_lines()
+        self.frame_number += 1
+        self.stages = None
+        self.objects = None
+
+    def averages(self):
+        '''
+        :return fps, frame_ms, stage_ms: frames per second, mean frame time and mean time
+                                         of each stage over the rolling window
+        '''
+        if not self.frames:
+            return 0.0, 0.0, {}
+        count = len(self.frames)
+        frame_ms = sum(frame_time for frame_time, _ in self.frames) / count * 1000
+        stage_ms = defaultdict(float)
+        for _, stages in self.frames:
+            for name, t in stages.items():
+                stage_ms[name] += t / count * 1000
+
+        elapsed = self.frame_starts[-1] - self.frame_starts[0]
+        fps = (count - 1) / elapsed if elapsed > 0 else 0.0
+        return fps, frame_ms, dict(stage_ms)
+
+    def _overlay_lines(self):
+        '''
+        :return: list of strings shown in the overlay
+        '''
+        fps, frame_ms, stage_ms = self.averages()
+        lines = [f'FPS: {fps:.1f}', f'frame: {frame_ms:.2f} ms']
+        lines += [f'{name}: {ms:.2f} ms' for name, ms in sorted(stage_ms.items(), key=lambda item: -item[1])]
+        return lines
+
+    def draw_overlay(self, surface):
+        '''
+        Draws the overlay in the top right corner of the surface
+
+        :param surface: surface to draw on
+        :return: pygame Rect covering the overlay, None when nothing was drawn
+        '''
+        if not self.enabled or not self.overlay:
+            return None
+        right = surface.get_width() - 10
+        covered = None
+        for i, line in enumerate(self.overlay_lines):
+            text = self.text.render(line)
+            textRect = text.get_rect()
+            textRect.topright = (right, 10 + i * 14)
+            surface.blit(text, textRect)
+            covered = textRect if covered is None else covered.union(textRect)
+        return covered
+
+    def flush(self):
+        '''
+        Writes the buffered CSV rows to disk, the file stays open for more frames
+        '''
+        if self.csv_file is not None:
+            self.csv_file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        '''
+        Closes the CSV file
+        '''
+        if self.csv_file is not None:
+            self.csv_file.close()
+            self.csv_file = None
+            self.csv_writer = None
@@ -0,0 +1,302 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import numpy as np
+import pygame
+
+# file imports
+from config import width, height
+
+# most candidate pixels expanded at once, triangles and lines are rasterized in chunks of about this size
+CHUNK_PIXELS = 1 << 20
+
+# lines are pulled this fraction of their depth towards the viewer so an edge wins over its own face
+LINE_DEPTH_BIAS = 2e-3
+
+def _chunks(counts, limit=CHUNK_PIXELS):
+    '''
+    Splits a list of primitives into runs whose pixel counts add up to about limit
+
+    :param counts: (N,) array of candidate pixels of each primitive
+    :param limit: pixels per run
+    :return: generator of (start, end) index ranges
+    '''
+    totals = np.cumsum(counts)
+    start = 0
+    while start < len(counts):
+        base = totals[start - 1] if start else 0
+        end = max(start + 1, int(np.searchsorted(totals, base + limit, side='right')))
+        yield start, end
+        start = end
+
+def _resolve(color, depth, pixels, inv_w, colors):
+    '''
+    Depth test. Keeps the nearest fragment of each pixel and writes it where it is nearer
+    than what the buffers already hold
+
+    :param color: (W*H, 3) flat view of the color buffer
+    :param depth: (W*H,) flat view of the depth buffer holding 1/w, 0 where empty
+    :param pixels: (M,) flat pixel index of each fragment
+    :param inv_w: (M,) 1/w of each fragment, larger is nearer
+    :param colors: (M, 3) color of each fragment
+    '''
+    if len(pixels) == 0:
+        return
+    order = np.lexsort((-inv_w, pixels))
+    pixels = pixels[order]
+    first = np.ones(len(pixels), dtype=bool)
+    first[1:] = pixels[1:] != pixels[:-1] # nearest fragment of every pixel
+    order, pixels = order[first], pixels[first]
+    nearer = inv_w[order] > depth[pixels]
+    pixels, order = pixels[nearer], order[nearer]
+    depth[pixels] = inv_w[order]
+    color[pixels] = colors[order]
+
+def rasterize_triangles(color, depth, points, w, colors):
+    '''
+    Fills triangles into a color and a depth buffer. Every pixel center inside a triangle
+    gets the triangle's color if it is nearer than the pixel's depth. 1/w is interpolated
+    linearly across the screen, which is perspective correct
+
+    :param color: (W, H, 3) uint8 color buffer, indexed [x][y] like pygame.surfarray
+    :param depth: (W, H) float depth buffer holding 1/w, 0 where empty
+    :param points: (T, 3, 2) array of projected corners
+    :param w: (T, 3) array of the distance of each corner from the viewer along the view axis
+    :param colors: (T, 3) array of triangle colors
+    '''
+    buffer_width, buffer_height = depth.shape
+    points = np.asarray(points, dtype=float)
+    inv_w = 1 / np.asarray(w, dtype=float)
+    a, b, c = points[:, 0], points[:, 1], points[:, 2]
+    area = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])
+
+    low = np.maximum(np.ceil(points.min(axis=1)), 0).astype(np.int64)
+    high = np.minimum(np.floor(points.max(axis=1)), (buffer_width - 1, buffer_height - 1)).astype(np.int64)
+    keep = np.flatnonzero((np.abs(area) > 1e-9) & (high >= low).all(axis=1)) # drop degenerate and off-screen triangles
+    if len(keep) == 0:
+        return
+    a, b, c, area, inv_w, colors, low, high = a[keep], b[keep], c[keep], area[keep], inv_w[keep], np.asarray(colors)[keep], low[keep], high[keep]
+    box_width = high[:, 0] - low[:, 0] + 1
+    counts = box_width * (high[:, 1] - low[:, 1] + 1)
+
+    flat_color = color.reshape(-1, 3)
+    flat_depth = depth.reshape(-1)
+    for start, end in _chunks(counts):
+        # every pixel of every bounding box in the chunk
+        n = counts[start:end]
+        tri = np.repeat(np.arange(start, end), n)
+        local = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+        x = low[tri, 0] + local % box_width[tri]
+        y = low[tri, 1] + local // box_width[tri]
+
+        # barycentric weights from the edge functions, all positive inside the triangle
+        ta, tb, tc = a[tri], b[tri], c[tri]
+        l0 = ((tb[:, 0] - x) * (tc[:, 1] - y) - (tb[:, 1] - y) * (tc[:, 0] - x)) / area[tri]
+        l1 = ((tc[:, 0] - x) * (ta[:, 1] - y) - (tc[:, 1] - y) * (ta[:, 0] - x)) / area[tri]
+        l2 = 1 - l0 - l1
+        inside = (l0 >= -1e-9) & (l1 >= -1e-9) & (l2 >= -1e-9)
+
+        tri, x, y = tri[inside], x[inside], y[inside]
+        fragment_inv_w = (l0[inside] * inv_w[tri, 0] + l1[inside] * inv_w[tri, 1] + l2[inside] * inv_w[tri, 2])
+        _resolve(flat_color, flat_depth, x * buffer_height + y, fragment_inv_w, colors[tri])
+
+def rasterize_lines(color, depth, points, w, colors, line_width=1):
+    '''
+    Draws lines into a color and a depth buffer, one sample per pixel along the longer
+    axis, thickened across it like pygame.draw.line
+
+    :param color: (W, H, 3) uint8 color buffer, indexed [x][y] like pygame.surfarray
+    :param depth: (W, H) float depth buffer holding 1/w, 0 where empty
+    :param points: (E, 2, 2) array of projected end points
+    :param w: (E, 2) array of the distance of each end from the viewer along the view axis
+    :param colors: (E, 3) array of line colors
+    :param line_width: width of the lines in pixels
+    '''
+    buffer_width, buffer_height = depth.shape
+    points = np.asarray(points, dtype=float)
+    inv_w = (1 + LINE_DEPTH_BIAS) / np.asarray(w, dtype=float)
+    colors = np.asarray(colors)
+    delta = points[:, 1] - points[:, 0]
+    counts = np.abs(delta).max(axis=1).astype(np.int64) + 1
+    steep = np.abs(delta[:, 1]) > np.abs(delta[:, 0]) # thicken across the longer axis
+
+    flat_color = color.reshape(-1, 3)
+    flat_depth = depth.reshape(-1)
+    for start, end in _chunks(counts * line_width):
+        n = counts[start:end]
+        line = np.repeat(np.arange(start, end), n)
+        t = (np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)) / np.maximum(counts[line] - 1, 1)
+        x = np.rint(points[line, 0, 0] + t * delta[line, 0]).astype(np.int64)
+        y = np.rint(points[line, 0, 1] + t * delta[line, 1]).astype(np.int64)
+        sample_inv_w = inv_w[line, 0] + t * (inv_w[line, 1] - inv_w[line, 0])
+
+        for offset in range(-(line_width // 2), line_width - line_width // 2):
+            sx = x + np.where(steep[line], offset, 0)
+            sy = y + np.where(steep[line], 0, offset)
+            on_screen = (sx >= 0) & (sx < buffer_width) & (sy >= 0) & (sy < buffer_height)
+            _resolve(flat_color, flat_depth, sx[on_screen] * buffer_height + sy[on_screen],
+                     sample_inv_w[on_screen], colors[line[on_screen]])
+
+class ZBufferQueue:
+    '''
+    Collects projected polygons and lines like FaceQueue but draws them with a per-pixel
+    depth buffer instead of sorting whole faces, so intersecting shapes are drawn correctly.
+    All faces are split into triangles and filled with NumPy, then copied to the surface
+    in one blit. Records without per-vertex depths (circles) are drawn on top with pygame
+
+    Attributes:
+        __init__: Class initialiser
+        add_polygons: Submit filled polygons
+        add_lines: Submit lines
+        add_circle: Submit a filled circle, drawn over everything else
+        add_strip: Submit connected lines
+        rasterize: Fill the polygons and lines into color and depth buffers
+        draw_overlay: Draw the records without depth
+        draw: Draw everything onto a surface
+        clear: Remove all records
+    '''
+    def __init__(self, viewport=(width, height)):
+        '''
+        Class initialiser
+
+        :param viewport: (width, height) of the screen
+        '''
+        self.viewport = viewport
+        self.clear()
+
+    def clear(self):
+        '''
+        Removes all records from the queue
+        '''
+        self.triangles = [] # (points (T, 3, 2), w (T, 3), colors (T, 3)) batches
+        self.lines = {} # line width -> list of (points (E, 2, 2), w (E, 2), colors (E, 3)) batches
+        self.overlay = [] # (kind, color, points, width) drawn with pygame after the buffers
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add_polygons(self, depths, points, colors, layer=0, vertex_depths=None):
+        '''
+        Submits filled polygons, split into a fan of triangles
+
+        :param depths: (F,) array of polygon depths, unused as every pixel gets its own depth
+        :param points: (F, K, 2) array of projected polygon points
+        :param colors: one color for all polygons or a sequence with one color per polygon
+        :param layer: unused, kept for the FaceQueue interface
+        :param vertex_depths: (F, K) distance of every point from the viewer along the view axis
+        '''
+        points = np.asarray(points, dtype=float)
+        if len(points) == 0:
+            return
+        if vertex_depths is None:
+            self.overlay.extend(('polygon', color, p, 0) for color, p in zip(self._colors(colors, len(points)).tolist(), points.tolist()))
+            self.count += len(points)
+            return
+        vertex_depths = np.asarray(vertex_depths, dtype=float)
+        corners = points.shape[1]
+        fan = np.array([(0, k, k + 1) for k in range(1, corners - 1)]) # (K-2, 3)
+        self.triangles.append((points[:, fan].reshape(-1, 3, 2),
+                               vertex_depths[:, fan].reshape(-1, 3),
+                               np.repeat(self._colors(colors, len(points)), len(fan), axis=0)))
+        self.count += len(points)
+
+    def add_lines(self, depths, points, color, width=1, layer=1, vertex_depths=None):
+        '''
+        Submits lines
+
+        :param depths: (E,) array of line depths, unused as every pixel gets its own depth
+        :param points: (E, 2, 2) array of projected line end points
+        :param color: color of the lines
+        :param width: width of the lines
+        :param layer: unused, kept for the FaceQueue interface
+        :param vertex_depths: (E, 2) distance of both ends from the viewer along the view axis
+        '''
+        points = np.asarray(points, dtype=float)
+        if len(points) == 0:
+            return
+        if vertex_depths is None:
+            self.overlay.extend(('line', color, p, width) for p in points.tolist())
+        else:
+            self.lines.setdefault(width, []).append((points, np.asarray(vertex_depths, dtype=float), self._colors(color, len(points))))
+        self.count += len(points)
+
+    def add_strip(self, depth, points, color, width=1, layer=1, vertex_depths=None):
+        '''
+        Submits a strip of connected lines, split back into its lines
+
+        :param depth: unused, every pixel gets its own depth
+        :param points: (M, 2) array of projected points along the strip
+        :param color: color of the lines
+        :param width: width of the lines
+        :param layer: unused, kept for the FaceQueue interface
+        :param vertex_depths: (M,) distance of every point from the viewer along the view axis
+        '''
+        points = np.asarray(points, dtype=float)
+        segments = np.stack((points[:-1], points[1:]), axis=1)
+        if vertex_depths is not None:
+            vertex_depths = np.stack((vertex_depths[:-1], vertex_depths[1:]), axis=1)
+        self.add_lines(None, segments, color, width, layer, vertex_depths)
+
+    def add_circle(self, center, radius, color, depth=-np.inf, layer=2):
+        '''
+        Submits a filled circle. It has no depth so it is drawn over everything else
+
+        :param center: (x, y) screen position
+        :param radius: radius in pixels
+        :param color: color of the circle
+        :param depth: unused, kept for the FaceQueue interface
+        :param layer: unused, kept for the FaceQueue interface
+        '''
+        self.overlay.append(('circle', color, center, radius))
+        self.count += 1
+
+    @staticmethod
+    def _colors(colors, count):
+        '''
+        :return: (count, 3) uint8 array from one color or a sequence of colors
+        '''
+        colors = np.asarray(colors, dtype=np.uint8)
+        return np.broadcast_to(colors, (count, 3)) if colors.ndim == 1 else colors
+
+    def rasterize(self, color, depth):
+        '''
+        Fills the polygons and lines into the buffers
+
+        :param color: (W, H, 3) uint8 color buffer, indexed [x][y] like pygame.surfarray
+        :param depth: (W, H) float depth buffer holding 1/w, 0 where empty
+        '''
+        if self.triangles:
+            points, w, colors = (np.concatenate(parts) for parts in zip(*self.triangles))
+            rasterize_triangles(color, depth, points, w, colors)
+        for line_width, batches in self.lines.items():
+            points, w, colors = (np.concatenate(parts) for parts in zip(*batches))
+            rasterize_lines(color, depth, points, w, colors, line_width)
+
+    def draw_overlay(self, surface):
+        '''
+        Draws the records without per-vertex depth with pygame
+
+        :param surface: surface to draw on
+        '''
+        for kind, color, points, size in self.overlay:
+            if kind == 'polygon':
+                pygame.draw.polygon(surface, color, points)
+            elif kind == 'line':
+                pygame.draw.line(surface, color, points[0], points[1], size)
+            else:
+                pygame.draw.circle(surface, color, points, size)
+
+    def draw(self, surface):
+        '''
+        Draws everything onto a surface in one blit, over what the surface already shows
+
+        :param surface: surface to draw on
+        '''
+        color = pygame.surfarray.array3d(surface)
+        depth = np.zeros(color.shape[:2])
+        self.rasterize(color, depth)
+        pygame.surfarray.blit_array(surface, color)
+        self.draw_overlay(surface)
@@ -0,0 +1,288 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import os
+import zlib
+import queue
+import struct
+import weakref
+import multiprocessing
+import numpy as np
+import pygame
+from multiprocessing import shared_memory
+
+# the encoder process only uses numpy, zlib and the shared frames, it never draws with pygame.
+# It is forked where possible, elsewhere it is spawned and the script that records must keep its
+# top-level code under if __name__ == '__main__', or the encoder fails and stats reports it
+_CONTEXT = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+
+# seconds WAIT mode waits for a slot before checking the encoder is still running
+_WAIT_POLL = 0.1
+
+# frames the ring buffer holds while they wait for the encoder
+RECORD_SLOTS = 16
+
+# what capture does when every slot is waiting to be encoded
+DROP, WAIT = 'drop', 'wait'
+
+# 256 color palette of the GIF frames, 3 bits of red, 3 of green and 2 of blue
+_GIF_PALETTE = np.array([[(i >> 5) * 255 // 7, (i >> 2 & 7) * 255 // 7, (i & 3) * 255 // 3] for i in range(256)], dtype=np.uint8)
+
+def _png_bytes(frame, level=1):
+    '''
+    Encodes a frame as a PNG file. Every row uses the 'none' filter and a fast zlib level,
+    which suits the large flat areas of the engine's frames
+
+    :param frame: (H, W, 3) uint8 array
+    :param level: zlib compression level
+    :return: bytes of the file
+    '''
+    height, width = frame.shape[:2]
+    rows = np.zeros((height, width * 3 + 1), dtype=np.uint8) # filter byte in front of each row
+    rows[:, 1:] = frame.reshape(height, -1)
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows.tobytes(), level)) + chunk(b'IEND', b''))
+
+def _lzw(indices):
+    '''
+    Compresses 8 bit palette indices with the variable width LZW coding of GIF images
+
+    :param indices: bytes of palette indices
+    :return: bytes of packed codes
+    '''
+    clear, end = 256, 257
+    table, next_code, size = {}, end + 1, 9
+    out = bytearray()
+    bits, count = clear, size # bit buffer and how many bits it holds, starting with a clear code
+    prefix = indices[0] if indices else None
+    for value in indices[1:]:
+        key = prefix << 8 | value # the string so far followed by one more index
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        bits |= prefix << count
+        count += size
+        if next_code < 4096:
+            table[key] = next_code
+            next_code += 1
+            if next_code > 1 << size: # the decoder widens the codes one code later
+                size += 1
+        else: # table full, start again
+            bits |= clear << count
+            count += size
+            table, next_code, size = {}, end + 1, 9
+        while count >= 8:
+            out.append(bits & 255)
+            bits >>= 8
+            count -= 8
+        prefix = value
+    if prefix is not None:
+        bits |= prefix << count
+        count += size
+    bits |= end << count
+    count += size
+    while count > 0:
+        out.append(bits & 255)
+        bits >>= 8
+        count -= 8
+    return bytes(out)
+
+def _gif_header(width, height):
+    '''
+    :param width: width of the frames
+    :param height: height of the frames
+    :return: bytes of the GIF header, palette and looping extension
+    '''
+    return (b'GIF89a' + struct.pack('<HHBBB', width, height, 0xF7, 0, 0) + _GIF_PALETTE.tobytes()
+            + b'\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00') # loop forever
+
+def _gif_frame(frame, delay):
+    '''
+    Encodes one frame of a GIF against the fixed palette
+
+    :param frame: (H, W, 3) uint8 array
+    :param delay: time the frame is shown for in hundredths of a second
+    :return: bytes of the frame
+    '''
+    height, width = frame.shape[:2]
+    indices = (frame[..., 0] & 0xE0) | (frame[..., 1] >> 5 << 2) | (frame[..., 2] >> 6)
+    data = _lzw(indices.tobytes())
+    blocks = b''.join(bytes((len(data[i:i + 255]),)) + data[i:i + 255] for i in range(0, len(data), 255))
+    return (b'\x21\xf9\x04\x00' + struct.pack('<H', delay) + b'\x00\x00' # graphic control extension
+            + b'\x2c' + struct.pack('<HHHHB', 0, 0, width, height, 0) + b'\x08' + blocks + b'\x00')
+
+def _encode_frames(name, shape, path, fmt, delay, todo, done):
+    '''
+    Encoder process, writes the frames handed over in the shared ring buffer until it gets None
+
+    :param name: name of the shared memory block
+    :param shape: (slots, H, W, 3) shape of the ring buffer
+    :param path: folder for PNG frames or the GIF file
+    :param fmt: 'png' or 'gif'
+    :param delay: GIF frame time in hundredths of a second
+    :param todo: queue of (slot, frame number) to encode
+    :param done: queue the slots are given back on once encoded
+    '''
+    if hasattr(os, 'nice'):
+        os.nice(10) # the render loop comes first when they share a core
+    block = shared_memory.SharedMemory(name=name)
+    frames = np.ndarray(shape, dtype=np.uint8, buffer=block.buf)
+    gif = None
+    if fmt == 'gif':
+        gif = open(path, 'wb')
+        gif.write(_gif_header(shape[2], shape[1]))
+    try:
+        for slot, number in iter(todo.get, None):
+            if gif is None:
+                with open(os.path.join(path, f'frame_{number:05d}.png'), 'wb') as file:
+                    file.write(_png_bytes(frames[slot]))
+            else:
+                gif.write(_gif_frame(frames[slot], delay))
+            done.put(slot)
+    finally:
+        if gif is not None:
+            gif.write(b'\x3b') # trailer
+            gif.close()
+        del frames
+        block.close()
+
+def _release(block, surfaces, process, todo):
+    '''
+    Stops the encoder after the frames it has been given and frees the ring buffer, run on
+    close or when the recorder is garbage collected
+
+    :param block: SharedMemory ring buffer
+    :param surfaces: list of the surfaces over the slots, emptied in place
+    :param process: encoder process
+    :param todo: queue of frames for the encoder
+    '''
+    todo.put(None)
+    process.join()
+    surfaces.clear() # the surfaces hold views of the block, they must go before it is closed
+    block.close()
+    block.unlink()
+
+class FrameRecorder:
+    '''
+    Records finished frames without making the render loop wait for disk or compression.
+    Each frame is blitted into a free slot of a ring buffer in shared memory, and an encoder
+    process writes the slots out as a PNG sequence or a GIF and hands them back. When every
+    slot is still waiting the frame is dropped, or with WAIT the render loop waits for a slot
+
+    Attributes:
+        __init__: Class initialiser
+        capture: Queue a frame for encoding
+        _collect: Take back the slots the encoder has finished with
+        _free_slot: Find a slot to copy a frame into
+        stats: Counts of captured, dropped and written frames and whether the encoder failed
+        close: Finish encoding and free the ring buffer
+    '''
+    def __init__(self, path, size, fmt=None, slots=RECORD_SLOTS, every=1, when_full=DROP, fps=60):
+        '''
+        Class initialiser
+
+        :param path: folder to write frame_00000.png, ... into, or a .gif file
+        :param size: (width, height) of the frames
+        :param fmt: 'png' or 'gif' (default=None to pick from the path)
+        :param slots: frames the ring buffer holds
+        :param every: record every nth frame given to capture
+        :param when_full: DROP to skip frames while the encoder is behind, WAIT to wait for it
+        :param fps: frames per second capture is called at, for the GIF frame times
+        '''
+        self.fmt = fmt or ('gif' if path.lower().endswith('.gif') else 'png')
+        if self.fmt == 'png':
+            os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.size = width, height = tuple(size)
+        self.every = every
+        self.when_full = when_full
+        self.frame = 0 # frames given to capture
+        self.captured = self.dropped = self.written = 0
+
+        # ring buffer of frames, each slot wrapped in a surface so a frame is copied with one blit
+        shape = (slots, height, width, 3)
+        self.block = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+        frame_bytes = width * height * 3
+        self.surfaces = [pygame.image.frombuffer(self.block.buf[i * frame_bytes:(i + 1) * frame_bytes], self.size, 'RGB')
+                         for i in range(slots)]
+        self.free = list(range(slots))
+
+        self.todo = _CONTEXT.Queue()
+        self.done = _CONTEXT.Queue()
+        delay = max(2, round(100 * every / fps)) # GIF frame times are in hundredths of a second, viewers speed up anything shorter
+        self.process = _CONTEXT.Process(target=_encode_frames, daemon=True,
+                                               args=(self.block.name, shape, path, self.fmt, delay, self.todo, self.done))
+        self.process.start()
+        self._finalizer = weakref.finalize(self, _release, self.block, self.surfaces, self.process, self.todo)
+
+    def _collect(self):
+        '''
+        Takes back the slots the encoder has finished with, without waiting
+        '''
+        while True:
+            try:
+                self.free.append(self.done.get_nowait())
+                self.written += 1
+            except queue.Empty:
+                break
+
+    def _free_slot(self):
+        '''
+        Takes a slot to copy a frame into
+
+        :return: slot number, None when every slot is in use and frames are dropped
+        '''
+        self._collect()
+        while not self.free and self.when_full == WAIT and self.process.is_alive():
+            try:
+                self.free.append(self.done.get(timeout=_WAIT_POLL)) # backpressure, wait for the encoder
+                self.written += 1
+            except queue.Empty:
+                pass # still encoding, or it died and the frame is dropped
+        return self.free.pop() if self.free else None
+
+    def capture(self, surface):
+        '''
+        Queues a finished frame for encoding. Frames of another size are dropped
+
+        :param surface: surface holding the frame
+        :return: True when the frame was queued
+        '''
+        self.frame += 1
+        if (self.frame - 1) % self.every:
+            return False
+        slot = self._free_slot() if surface.get_size() == self.size else None
+        if slot is None:
+            self.dropped += 1
+            return False
+        self.surfaces[slot].blit(surface, (0, 0))
+        self.todo.put((slot, self.captured))
+        self.captured += 1
+        return True
+
+    def stats(self):
+        '''
+        :return: dict of captured, dropped, written and pending frame counts, and failed when
+                 the encoder stopped with an error
+        '''
+        self._collect()
+        exitcode = self.process.exitcode
+        return {'captured': self.captured, 'dropped': self.dropped, 'written': self.written,
+                'pending': self.captured - self.written, 'failed': exitcode is not None and exitcode != 0}
+
+    def close(self):
+        '''
+        Waits for the queued frames to be written, stops the encoder and frees the ring buffer.
+        Only frames the encoder handed back count as written
+
+        :return: final stats
+        '''
+        self._finalizer()
+        return self.stats()
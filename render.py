@@ -0,0 +1,569 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import numpy as np
+import pygame
+
+# file imports
+from transforms import rotate_vertices, project_vertices, NEAR_PLANE
+from config import width, height
+
+# kinds of primitives held in the face queue
+POLYGON, LINE, CIRCLE, STRIP = 0, 1, 2, 3
+
+# most edges merged into one strip, longer chains are split so strips stay short enough to depth sort
+STRIP_SEGMENTS = 16
+
+def outward_normals(vertices, faces):
+    '''
+    Calculates unit face normals that point away from the middle of the shape. Uses
+    Newell's method so faces with repeated vertices (like the poles of a sphere) still
+    get a normal, then flips any normal that points inwards. Only valid for convex shapes
+
+    :param vertices: (N, 3) array of object-space vertices
+    :param faces: (F, K) array of vertex indices
+    :return normals: (F, 3) array of outward unit normals
+    '''
+    corners = vertices[faces] # (F, K, 3)
+    normals = np.cross(corners, np.roll(corners, -1, axis=1)).sum(axis=1)
+
+    # point every normal away from the middle of the shape
+    outwards = corners.mean(axis=1) - vertices.mean(axis=0)
+    normals[np.einsum('ij,ij->i', normals, outwards) < 0] *= -1
+
+    lengths = np.linalg.norm(normals, axis=1)
+    nonzero = lengths != 0
+    normals[nonzero] /= lengths[nonzero, None]
+    return normals
+
+def edge_face_adjacency(edges, face_groups):
+    '''
+    Finds the (up to two) faces that share each edge. Faces are numbered in the order
+    of face_groups, one group after the other
+
+    :param edges: (E, 2) array of vertex indices
+    :param face_groups: sequence of (F, K) face arrays
+    :return: (E, 2) int32 array of face numbers, -1 where an edge has no face
+    '''
+    faces_of_edge = {}
+    number = 0
+    for faces in face_groups:
+        for face in np.asarray(faces).tolist():
+            for a, b in zip(face, face[1:] + face[:1]):
+                faces_of_edge.setdefault((min(a, b), max(a, b)), []).append(number)
+            number += 1
+
+    adjacency = np.full((len(edges), 2), -1, dtype=np.int32)
+    for i, (a, b) in enumerate(np.asarray(edges).tolist()):
+        shared = faces_of_edge.get((min(a, b), max(a, b)), [])[:2]
+        adjacency[i, :len(shared)] = shared
+    return adjacency
+
+def cull_back_faces(camera_vertices, faces, camera_normals, viewer_distance):
+    '''
+    Finds the faces that point towards the viewer. The viewer sits at
+    (0, 0, -viewer_distance) in camera space
+
+    :param camera_vertices: (N, 3) array of rotated vertices
+    :param faces: (F, K) array of vertex indices
+    :param camera_normals: (F, 3) array of rotated outward normals
+    :param viewer_distance: zoom setting
+    :return visible, depths: boolean mask of front faces and the depth of every face
+    '''
+    centroids = camera_vertices[faces].mean(axis=1)
+    depths = centroids[:, 2]
+    centroids[:, 2] += viewer_distance # vector from the viewer to each face
+    visible = np.einsum('ij,ij->i', camera_normals, centroids) < 0
+    return visible, depths
+
+def visible_edge_depths(edge_faces, face_depths, visible):
+    '''
+    Gives each edge the depth of its nearest visible face so it is drawn straight after
+    that face. Edges with no visible face get an infinite depth and should be dropped
+
+    :param edge_faces: (E, 2) array from edge_face_adjacency
+    :param face_depths: depth of every face
+    :param visible: boolean mask of visible faces
+    :return: (E,) array of edge depths
+    '''
+    masked = np.append(np.where(visible, face_depths, np.inf), np.inf) # index -1 is never visible
+    return np.minimum(masked[edge_faces[:, 0]], masked[edge_faces[:, 1]])
+
+def clip_polygon_near(polygon, min_z):
+    '''
+    Clips a polygon to the part in front of the near plane (Sutherland-Hodgman)
+
+    :param polygon: (K, 3) array of camera-space points
+    :param min_z: z of the near plane in camera space
+    :return: (M, 3) array of the clipped polygon, empty if it is all behind the plane
+    '''
+    clipped = []
+    previous = polygon[-1]
+    for point in polygon:
+        if (point[2] >= min_z) != (previous[2] >= min_z): # edge crosses the plane
+            t = (min_z - previous[2]) / (point[2] - previous[2])
+            clipped.append(previous + t * (point - previous))
+        if point[2] >= min_z:
+            clipped.append(point)
+        previous = point
+    return np.array(clipped).reshape(-1, 3)
+
+def submit_polygons(queue, camera_vertices, projected, faces, depths, colors, fov, viewer_distance, layer=0):
+    '''
+    Submits polygons after dropping the ones behind the near plane and clipping the
+    ones that cross it
+
+    :param queue: FaceQueue to submit to
+    :param camera_vertices: (N, 3) array of rotated vertices
+    :param projected: (N, 2) array of projected vertices
+    :param faces: (F, K) array of vertex indices
+    :param depths: (F,) array of face depths
+    :param colors: one color or a sequence of F colors
+    :param fov: field of view
+    :param viewer_distance: zoom setting
+    :param layer: tie break for polygons at the same depth
+    '''
+    min_z = NEAR_PLANE - viewer_distance
+    w = camera_vertices[:, 2] + viewer_distance # distance from the viewer along the view axis, for z-buffering
+    corners_in_front = (camera_vertices[:, 2] >= min_z)[faces]
+    whole = corners_in_front.all(axis=1)
+    per_face = np.ndim(colors) == 2
+    if whole.all():
+        queue.add_polygons(depths, projected[faces], colors, layer, vertex_depths=w[faces])
+        return
+
+    keep = np.flatnonzero(whole)
+    queue.add_polygons(depths[keep], projected[faces[keep]], [colors[i] for i in keep.tolist()] if per_face else colors, layer,
+                       vertex_depths=w[faces[keep]])
+    for i in np.flatnonzero(corners_in_front.any(axis=1) & ~whole).tolist():
+        polygon = clip_polygon_near(camera_vertices[faces[i]], min_z)
+        queue.add_polygons(depths[i:i+1], project_vertices(polygon, fov, viewer_distance)[None],
+                           colors[i] if per_face else colors, layer, vertex_depths=polygon[None, :, 2] + viewer_distance)
+
+def submit_lines(queue, camera_vertices, projected, edges, depths, color, width, fov, viewer_distance, layer=1):
+    '''
+    Submits lines after dropping the ones behind the near plane and clipping the
+    ones that cross it
+
+    :param queue: FaceQueue to submit to
+    :param camera_vertices: (N, 3) array of rotated vertices
+    :param projected: (N, 2) array of projected vertices
+    :param edges: (E, 2) array of vertex indices
+    :param depths: (E,) array of line depths
+    :param color: color of the lines
+    :param width: width of the lines
+    :param fov: field of view
+    :param viewer_distance: zoom setting
+    :param layer: tie break for lines at the same depth
+    '''
+    min_z = NEAR_PLANE - viewer_distance
+    w = camera_vertices[:, 2] + viewer_distance # distance from the viewer along the view axis, for z-buffering
+    ends_in_front = (camera_vertices[:, 2] >= min_z)[edges]
+    whole = ends_in_front.all(axis=1)
+    if whole.all():
+        queue.add_lines(depths, projected[edges], color, width, layer, vertex_depths=w[edges])
+        return
+
+    queue.add_lines(depths[whole], projected[edges[whole]], color, width, layer, vertex_depths=w[edges[whole]])
+    partial = ends_in_front.any(axis=1) & ~whole
+    if partial.any():
+        # move the end behind the near plane onto it
+        ends = camera_vertices[edges[partial]] # (M, 2, 3)
+        behind = ~ends_in_front[partial]
+        front_end = ends[~behind].reshape(-1, 3)
+        back_end = ends[behind].reshape(-1, 3)
+        t = (min_z - front_end[:, 2]) / (back_end[:, 2] - front_end[:, 2])
+        clipped = front_end + t[:, None] * (back_end - front_end)
+        lines = np.stack((front_end, clipped), axis=1).reshape(-1, 3)
+        queue.add_lines(depths[partial], project_vertices(lines, fov, viewer_distance).reshape(-1, 2, 2), color, width, layer,
+                        vertex_depths=lines[:, 2].reshape(-1, 2) + viewer_distance)
+
+class EdgeStrips:
+    '''
+    The edges of a mesh ordered into connected strips so each strip can be drawn with one
+    pygame.draw.lines call. Every edge is in exactly one strip. At each vertex a strip
+    carries on along the straightest unused edge, so the rings of a torus or a cylinder
+    come out as whole strips
+
+    Attributes:
+        __init__: Class initialiser, builds the strips
+        tile: Strips of many copies of the mesh
+    '''
+    def __init__(self, vertices, edges, max_segments=STRIP_SEGMENTS):
+        '''
+        Class initialiser
+
+        :param vertices: (N, 3) array of vertices, only used to find the straightest way on
+        :param edges: (E, 2) array of vertex indices
+        :param max_segments: most edges in one strip
+        '''
+        vertices = np.asarray(vertices, dtype=float)
+        edges = np.asarray(edges).tolist()
+        edges_at = {} # vertex -> edges using it
+        for i, (a, b) in enumerate(edges):
+            edges_at.setdefault(a, []).append(i)
+            edges_at.setdefault(b, []).append(i)
+
+        used = [False] * len(edges)
+        strip_edges, strip_vertices = [], [] # edge and vertex sequence of every strip
+        for first in range(len(edges)):
+            if used[first]:
+                continue
+            used[first] = True
+            chain, path = [first], list(edges[first])
+            while len(chain) < max_segments:
+                end, previous = path[-1], path[-2]
+                direction = vertices[end] - vertices[previous]
+                best, best_cos = None, -np.inf
+                for i in edges_at[end]:
+                    if used[i]:
+                        continue
+                    other = edges[i][1] if edges[i][0] == end else edges[i][0]
+                    step = vertices[other] - vertices[end]
+                    cos = direction @ step / (np.linalg.norm(direction) * np.linalg.norm(step) or 1)
+                    if cos > best_cos:
+                        best, best_cos, best_other = i, cos, other
+                if best is None:
+                    break
+                used[best] = True
+                chain.append(best)
+                path.append(best_other)
+            strip_edges.append(chain)
+            strip_vertices.append(path)
+
+        lengths = np.array([len(chain) for chain in strip_edges])
+        self.count = len(strip_edges)
+        self.edges = np.array([i for chain in strip_edges for i in chain], dtype=np.int32) # edge indices, strip by strip
+        self.vertices = np.array([v for path in strip_vertices for v in path], dtype=np.int32) # vertex indices, strip by strip
+        self.edge_starts = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int32) # first entry of each strip in edges
+        self.vertex_starts = (self.edge_starts + np.arange(self.count)).astype(np.int32) # first entry of each strip in vertices
+        # position in vertices of the first end of every entry of edges
+        self.edge_vertex = (np.arange(len(self.edges)) + np.repeat(np.arange(self.count), lengths)).astype(np.int32)
+        for array in (self.edges, self.vertices, self.edge_starts, self.vertex_starts, self.edge_vertex):
+            array.setflags(write=False)
+
+    def tile(self, copies, edge_count, vertex_count):
+        '''
+        Strips of several copies of the mesh laid out one after the other, as used by instancing
+
+        :param copies: number of copies
+        :param edge_count: edges in one copy
+        :param vertex_count: vertices in one copy
+        :return: EdgeStrips of all copies
+        '''
+        tiled = EdgeStrips.__new__(EdgeStrips)
+        copy = np.arange(copies)[:, None]
+        tiled.count = self.count * copies
+        tiled.edges = (self.edges[None] + copy * edge_count).reshape(-1)
+        tiled.vertices = (self.vertices[None] + copy * vertex_count).reshape(-1)
+        tiled.edge_starts = (self.edge_starts[None] + copy * len(self.edges)).reshape(-1)
+        tiled.vertex_starts = (self.vertex_starts[None] + copy * len(self.vertices)).reshape(-1)
+        tiled.edge_vertex = (self.edge_vertex[None] + copy * len(self.vertices)).reshape(-1)
+        return tiled
+
+def submit_strips(queue, camera_vertices, projected, edges, strips, depths, color, width, fov, viewer_distance, layer=1):
+    '''
+    Submits edges merged into strips. A strip is broken wherever one of its edges is hidden
+    or crosses the near plane, the crossing edges are clipped and submitted as single lines.
+    Each piece is sorted by its nearest edge
+
+    :param queue: FaceQueue to submit to
+    :param camera_vertices: (N, 3) array of rotated vertices
+    :param projected: (N, 2) array of projected vertices
+    :param edges: (E, 2) array of vertex indices
+    :param strips: EdgeStrips of the edges
+    :param depths: (E,) array of edge depths, infinite for hidden edges
+    :param color: color of the edges
+    :param width: width of the edges
+    :param fov: field of view
+    :param viewer_distance: zoom setting
+    :param layer: tie break for edges at the same depth
+    '''
+    w = camera_vertices[:, 2] + viewer_distance # distance from the viewer along the view axis, for z-buffering
+    shown = np.isfinite(depths)
+    in_front = (w >= NEAR_PLANE)[edges].all(axis=1)
+    crossing = np.flatnonzero(shown & ~in_front)
+    if len(crossing):
+        submit_lines(queue, camera_vertices, projected, edges[crossing], depths[crossing], color, width, fov, viewer_distance, layer)
+
+    # runs of drawable edges along the strips, runs never carry on from one strip into the next
+    drawable = (shown & in_front)[strips.edges]
+    strip_start = np.zeros(len(drawable), dtype=bool)
+    strip_start[strips.edge_starts] = True
+    previous_drawable = np.concatenate(([False], drawable[:-1]))
+    next_drawable = np.concatenate((drawable[1:], [False]))
+    next_strip_start = np.concatenate((strip_start[1:], [True]))
+    run_starts = np.flatnonzero(drawable & (strip_start | ~previous_drawable))
+    run_ends = np.flatnonzero(drawable & (next_strip_start | ~next_drawable)) + 1
+
+    edge_depths = np.where(drawable, depths[strips.edges], np.inf)
+    run_depths = np.minimum.reduceat(edge_depths, run_starts) if len(run_starts) else []
+    first_vertex = strips.edge_vertex[run_starts]
+    last_vertex = strips.edge_vertex[run_ends - 1] + 2
+    vertices = strips.vertices
+    for depth, first, last in zip(np.asarray(run_depths).tolist(), first_vertex.tolist(), last_vertex.tolist()):
+        path = vertices[first:last]
+        queue.add_strip(depth, projected[path], color, width, layer, vertex_depths=w[path])
+
+class FaceQueue:
+    '''
+    Collects the projected polygons and lines of any number of objects so they can be
+    drawn back to front (painter's algorithm) instead of in the order they were submitted
+
+    Attributes:
+        __init__: Class initialiser
+        add_polygons: Submit filled polygons
+        add_lines: Submit lines
+        add_circle: Submit a filled circle
+        add_strip: Submit connected lines drawn in one call
+        extend: Copy records from another queue
+        bounds: Screen rect covering all records
+        overlapping: Records whose screen rect touches a rect
+        draw: Draw records back to front
+        clear: Remove all records
+    '''
+    def __init__(self, viewport=(width, height)):
+        '''
+        Class initialiser
+
+        :param viewport: (width, height) of the screen, records outside it are dropped
+        '''
+        self.viewport = viewport
+        self.clear()
+
+    def clear(self):
+        '''
+        Removes all records from the queue
+        '''
+        self.depths = [] # depth of each record, larger is further away
+        self.layers = [] # tie break for equal depths, lower layers are drawn first
+        self.items = [] # (kind, color, points, width) of each record
+        self.rects = [] # (left, top, right, bottom) screen rect of each record
+        self._arrays = None
+
+    def __len__(self):
+        return len(self.items)
+
+    def add_polygons(self, depths, points, colors, layer=0, vertex_depths=None):
+        '''
+        Submits filled polygons
+
+        :param depths: (F,) array of polygon depths
+        :param points: (F, K, 2) array of projected polygon points
+        :param colors: one color for all polygons or a sequence with one color per polygon
+        :param layer: tie break for polygons at the same depth
+        :param vertex_depths: depth of every point, only used by the z-buffer backend
+        '''
+        if len(points) == 0:
+            return
+        self._add(depths, points, colors, POLYGON, 0, layer)
+
+    def add_lines(self, depths, points, color, width=1, layer=1, vertex_depths=None):
+        '''
+        Submits lines. Lines default to a higher layer than polygons so an edge is drawn
+        over the face it belongs to
+
+        :param depths: (E,) array of line depths
+        :param points: (E, 2, 2) array of projected line end points
+        :param color: color of the lines
+        :param width: width of the lines
+        :param layer: tie break for lines at the same depth
+        :param vertex_depths: depth of both ends, only used by the z-buffer backend
+        '''
+        if len(points) == 0:
+            return
+        self._add(depths, points, color, LINE, width, layer)
+
+    def add_circle(self, center, radius, color, depth=-np.inf, layer=2):
+        '''
+        Submits a filled circle. By default it is drawn after everything else
+
+        :param center: (x, y) screen position
+        :param radius: radius in pixels
+        :param color: color of the circle
+        :param depth: depth of the circle
+        :param layer: tie break for records at the same depth
+        '''
+        x, y = center
+        self.depths.append(depth)
+        self.layers.append(layer)
+        self.items.append((CIRCLE, color, (x, y), radius))
+        self.rects.append((x - radius, y - radius, x + radius, y + radius))
+        self._arrays = None
+
+    def add_strip(self, depth, points, color, width=1, layer=1, vertex_depths=None):
+        '''
+        Submits a strip of connected lines, drawn with one pygame.draw.lines call
+
+        :param depth: depth of the strip
+        :param points: (M, 2) array of projected points along the strip
+        :param color: color of the lines
+        :param width: width of the lines
+        :param layer: tie break for records at the same depth
+        :param vertex_depths: depth of every point, only used by the z-buffer backend
+        '''
+        pad = (width + 1) // 2 # lines are drawn wider than their end points
+        (left, top), (right, bottom) = points.min(axis=0) - pad, points.max(axis=0) + pad
+        if right < 0 or left >= self.viewport[0] or bottom < 0 or top >= self.viewport[1]:
+            return # entirely outside the viewport
+        self.depths.append(depth)
+        self.layers.append(layer)
+        self.items.append((STRIP, color, points.tolist(), width))
+        self.rects.append((left, top, right, bottom))
+        self._arrays = None
+
+    def _add(self, depths, points, colors, kind, width, layer):
+        '''
+        Appends a batch of records of the same kind
+
+        :param depths: (M,) array of depths
+        :param points: (M, K, 2) array of projected points
+        :param colors: one color or a sequence of M colors
+        :param kind: POLYGON or LINE
+        :param width: line width, 0 for filled polygons
+        :param layer: tie break for records at the same depth
+        '''
+        points = np.asarray(points)
+        pad = (width + 1) // 2 # lines are drawn wider than their end points
+        lows, highs = points.min(axis=1) - pad, points.max(axis=1) + pad
+
+        # records entirely outside the viewport are never drawn
+        on_screen = (highs[:, 0] >= 0) & (lows[:, 0] < self.viewport[0]) & (highs[:, 1] >= 0) & (lows[:, 1] < self.viewport[1])
+        if not on_screen.all():
+            keep = np.flatnonzero(on_screen)
+            points, lows, highs, depths = points[keep], lows[keep], highs[keep], np.asarray(depths)[keep]
+            if np.ndim(colors) == 2:
+                colors = [colors[i] for i in keep.tolist()]
+
+        self.rects.extend(np.hstack((lows, highs)).tolist())
+        self.depths.extend(np.asarray(depths, dtype=float).tolist())
+        self.layers.extend([layer] * len(points))
+        if np.ndim(colors) == 2: # one color per record
+            self.items.extend((kind, color, p, width) for color, p in zip(colors, points.tolist()))
+        else:
+            self.items.extend((kind, colors, p, width) for p in points.tolist())
+        self._arrays = None
+
+    def extend(self, other, indices=None):
+        '''
+        Copies records from another queue
+
+        :param other: FaceQueue to copy from
+        :param indices: indices of the records to copy (default=all)
+        '''
+        if indices is None:
+            indices = range(len(other))
+        for i in indices:
+            self.depths.append(other.depths[i])
+            self.layers.append(other.layers[i])
+            self.items.append(other.items[i])
+            self.rects.append(other.rects[i])
+        self._arrays = None
+
+    def _as_arrays(self):
+        '''
+        :return depths, layers, rects: the records as numpy arrays, cached until the queue changes
+        '''
+        if self._arrays is None:
+            self._arrays = (np.array(self.depths, dtype=float),
+                            np.array(self.layers, dtype=int),
+                            np.array(self.rects, dtype=float).reshape(-1, 4))
+        return self._arrays
+
+    def bounds(self, indices=None):
+        '''
+        :param indices: indices of the records to cover (default=all)
+        :return: pygame Rect covering the records, None if there are none
+        '''
+        rects = self._as_arrays()[2]
+        if indices is not None:
+            rects = rects[indices]
+        if len(rects) == 0:
+            return None
+        left, top = rects[:, :2].min(axis=0)
+        right, bottom = rects[:, 2:].max(axis=0)
+        return pygame.Rect(int(left), int(top), int(right - left) + 1, int(bottom - top) + 1)
+
+    def overlapping(self, rect):
+        '''
+        :param rect: pygame Rect on the screen
+        :return: indices of the records whose screen rect intersects rect
+        '''
+        rects = self._as_arrays()[2]
+        hits = ((rects[:, 0] < rect.right) & (rects[:, 2] >= rect.left) &
+                (rects[:, 1] < rect.bottom) & (rects[:, 3] >= rect.top))
+        return np.flatnonzero(hits)
+
+    def draw(self, surface, indices=None):
+        '''
+        Draws records back to front
+
+        :param surface: surface to draw on
+        :param indices: indices of the records to draw (default=all)
+        '''
+        depths, layers, _ = self._as_arrays()
+        if indices is None:
+            order = np.lexsort((layers, -depths))
+        else:
+            indices = np.asarray(indices, dtype=int)
+            order = indices[np.lexsort((layers[indices], -depths[indices]))]
+
+        items = self.items
+        for i in order.tolist():
+            kind, color, points, width = items[i]
+            if kind == POLYGON:
+                pygame.draw.polygon(surface, color, points)
+            elif kind == LINE:
+                pygame.draw.line(surface, color, points[0], points[1], width)
+            elif kind == STRIP:
+                pygame.draw.lines(surface, color, False, points, width)
+            else:
+                pygame.draw.circle(surface, color, points, width)
+
+def submit_solid(queue, camera_vertices, projected, face_groups, normal_groups, r_matrix, fov, viewer_distance,
+                 face_color, edges=None, edge_faces=None, edge_color=None, edge_width=2, face_colors=None, strips=None,
+                 lighting=None, light_matrix=None):
+    '''
+    Submits the front faces of a convex shape and the edges that belong to them,
+    clipped to the near plane
+
+    :param queue: FaceQueue to submit to
+    :param camera_vertices: (N, 3) array of rotated vertices
+    :param projected: (N, 2) array of projected vertices
+    :param face_groups: sequence of (F, K) face arrays
+    :param normal_groups: sequence of (F, 3) object-space outward normals, one per face group
+    :param r_matrix: rotation matrix of the camera
+    :param fov: field of view
+    :param viewer_distance: zoom setting
+    :param face_color: color of the faces
+    :param edges: (E, 2) array of vertex indices, None to skip the edges
+    :param edge_faces: (E, 2) array from edge_face_adjacency
+    :param edge_color: color of the edges
+    :param edge_width: width of the edges
+    :param face_colors: sequence of (F, 3) color arrays, one per face group, used instead of face_color
+    :param strips: EdgeStrips of the edges to draw them as strips, None to draw every edge on its own
+    :param lighting: Lighting to shade the faces with, None for flat colors
+    :param light_matrix: camera rotation used for world-space lights (default=None for r_matrix)
+    '''
+    all_depths, all_visible = [], []
+    for g, (faces, normals) in enumerate(zip(face_groups, normal_groups)):
+        camera_normals = rotate_vertices(normals, r_matrix)
+        visible, depths = cull_back_faces(camera_vertices, faces, camera_normals, viewer_distance)
+        colors = face_color if face_colors is None else face_colors[g][visible]
+        if lighting is not None:
+            colors = lighting.shade(camera_normals[visible], colors, r_matrix if light_matrix is None else light_matrix)
+        if np.ndim(colors) == 2:
+            colors = colors.tolist()
+        submit_polygons(queue, camera_vertices, projected, faces[visible], depths[visible], colors, fov, viewer_distance)
+        all_depths.append(depths)
+        all_visible.append(visible)
+
+    if edges is not None:
+        edge_depths = visible_edge_depths(edge_faces, np.concatenate(all_depths), np.concatenate(all_visible))
+        if strips is not None:
+            submit_strips(queue, camera_vertices, projected, edges, strips, edge_depths, edge_color, edge_width, fov, viewer_distance)
+            return
+        shown = np.isfinite(edge_depths)
+        submit_lines(queue, camera_vertices, projected, edges[shown], edge_depths[shown], edge_color, edge_width, fov, viewer_distance)
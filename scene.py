@@ -0,0 +1,344 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import numpy as np
+
+# file imports
+from transforms import rotation_matrix
+from instancing import InstancedMesh
+
+# frames a moved node has to stay still before it is drawn through the static layer again
+SETTLE_FRAMES = 30
+
+class SceneNode:
+    '''
+    Node of a scene graph. Holds a transform relative to its parent (position, rotation and
+    a uniform scale) and caches the resulting world transform. Changing a node marks it and
+    everything below it as dirty, and only dirty nodes have their world transform recomputed
+
+    Attributes:
+        __init__: Class initialiser
+        add_child: Parent another node to this one
+        set_transform: Change the local transform
+        _mark_dirty: Flag the node and its subtree for recomputing
+        _update: Recompute the world transform of the node and its subtree
+    '''
+    def __init__(self, shape=None, position=(0, 0, 0), rotation=(0, 0, 0), scale=1, color=None):
+        '''
+        Class initialiser
+
+        :param shape: Cube, Cylinder or Torus drawn at the node, None for a node that only groups others.
+                      Its vertices are used as object-space coordinates and never changed, so the
+                      shape turns and scales about its own origin
+        :param position: position relative to the parent
+        :param rotation: angles about the x, y & z axes relative to the parent
+        :param scale: uniform scale relative to the parent
+        :param color: face color of the shape (default=None for the shape's own face color)
+        '''
+        self.shape = shape
+        self.color = color
+        self.parent = None
+        self.children = []
+        self.graph = None # SceneGraph the node belongs to
+        self.depth = 0 # number of ancestors
+
+        # local transform
+        self.position = np.array(position, dtype=float)
+        self.rotation = np.array(rotation, dtype=float)
+        self.scale = float(scale)
+
+        # cached world transform
+        self.world_rotation = np.eye(3)
+        self.world_position = np.zeros(3)
+        self.world_scale = 1.0
+        self.dirty = True
+
+        self.batch = None # InstancedMesh the shape is drawn through
+        self.row = None # row of the node in the batch
+
+    def add_child(self, node):
+        '''
+        Parents a node to this one. A node that already has a parent is moved here with its
+        subtree, and leaves its old graph if this node belongs to another one
+
+        :param node: SceneNode to parent
+        :return: the child node
+        '''
+        ancestor = self
+        while ancestor is not None:
+            if ancestor is node:
+                raise ValueError('a node cannot be parented to itself or to a node below it')
+            ancestor = ancestor.parent
+        if node.parent is not None:
+            node.parent.children.remove(node)
+        if node.graph is not None and node.graph is not self.graph:
+            node.graph._detach(node)
+        node.parent = self
+        self.children.append(node)
+        if self.graph is not None:
+            self.graph._attach(node)
+        node._mark_dirty()
+        return node
+
+    def set_transform(self, position=None, rotation=None, scale=None):
+        '''
+        Changes the transform relative to the parent. Left out parts are kept
+
+        :param position: new position relative to the parent
+        :param rotation: new angles about the x, y & z axes relative to the parent
+        :param scale: new uniform scale relative to the parent
+        '''
+        if position is not None:
+            self.position = np.array(position, dtype=float)
+        if rotation is not None:
+            self.rotation = np.array(rotation, dtype=float)
+        if scale is not None:
+            self.scale = float(scale)
+        self._mark_dirty()
+
+    def _mark_dirty(self):
+        '''
+        Flags the node and its subtree. A dirty node always has a dirty subtree, so the
+        walk stops at nodes that are already dirty
+        '''
+        if self.graph is not None:
+            self.graph.dirty.append(self)
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            node.dirty = True
+            stack.extend(child for child in node.children if not child.dirty)
+
+    def _update(self):
+        '''
+        Recomputes the world transform from the parent's, then does the same for the subtree
+
+        :return: number of nodes recomputed
+        '''
+        count = 0
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            parent = node.parent
+            local_rotation = np.asarray(rotation_matrix(*node.rotation))
+            if parent is None:
+                node.world_rotation = local_rotation
+                node.world_position = node.position.copy()
+                node.world_scale = node.scale
+            else:
+                node.world_rotation = parent.world_rotation @ local_rotation
+                node.world_position = parent.world_position + parent.world_scale * (parent.world_rotation @ node.position)
+                node.world_scale = parent.world_scale * node.scale
+            node.dirty = False
+            if node.batch is not None:
+                node.graph._write_instance(node)
+                node.graph.moved.add(node)
+            count += 1
+            stack.extend(node.children)
+        return count
+
+class SceneGraph:
+    '''
+    Tree of SceneNodes drawn as static shapes. Nodes drawing the same shape share one
+    InstancedMesh, so the shape's mesh stays in object space and is stored once, and a
+    moved node only rewrites its own row of the instance arrays. A node that moves is
+    taken out of the static shapes and drawn every frame until it has been still for
+    SETTLE_FRAMES frames, so animating a few nodes does not redraw all the others
+
+    Attributes:
+        __init__: Class initialiser
+        add: Create a node under the root or another node
+        _attach: Register a subtree and give its shapes rows in the batches
+        _detach: Remove a subtree and free its rows
+        update: Recompute the world transforms of the dirty nodes
+        tick: Advance one frame and sort the nodes into moving and still ones
+        submit: Submit the shapes of the still nodes to a face queue
+        submit_moving: Submit the shapes of the moving nodes to a face queue
+    '''
+    def __init__(self):
+        '''
+        Class initialiser
+        '''
+        self.root = SceneNode()
+        self.root.graph = self
+        self.root.dirty = False
+        self.dirty = [] # nodes changed since the last update
+        self.batches = {} # id of the shape -> (InstancedMesh, nodes drawn through it)
+        self.moved = set() # nodes with shapes recomputed since the last tick
+        self.added = set() # nodes with shapes attached since the last tick
+        self.moving = {} # node drawn every frame -> still frames left before it settles
+        self.removed = False # shapes were detached since the last tick
+
+    def add(self, shape=None, parent=None, position=(0, 0, 0), rotation=(0, 0, 0), scale=1, color=None):
+        '''
+        Creates a node
+
+        :param shape: Cube, Cylinder or Torus drawn at the node, None for a grouping node
+        :param parent: node to add it under (default=None for the root)
+        :param position: position relative to the parent
+        :param rotation: angles about the x, y & z axes relative to the parent
+        :param scale: uniform scale relative to the parent
+        :param color: face color of the shape (default=None for the shape's own face color)
+        :return: the new SceneNode
+        '''
+        parent = self.root if parent is None else parent
+        return parent.add_child(SceneNode(shape, position, rotation, scale, color))
+
+    def _attach(self, node):
+        '''
+        Registers a node and its subtree with the graph and gives their shapes a row in a batch
+
+        :param node: SceneNode just added to a node of this graph
+        '''
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            node.depth = node.parent.depth + 1
+            if node.graph is self: # moved within the graph, it keeps its rows
+                stack.extend(node.children)
+                continue
+            node.graph = self
+            if node.shape is not None:
+                key = id(node.shape)
+                if key not in self.batches:
+                    self.batches[key] = (InstancedMesh(node.shape, np.zeros((0, 3)), pivot=(0, 0, 0)), [])
+                batch, nodes = self.batches[key]
+                node.batch, node.row = batch, len(nodes)
+                nodes.append(node)
+                self._grow(batch, len(nodes))
+                self.added.add(node)
+            stack.extend(node.children)
+
+    def _detach(self, node):
+        '''
+        Removes a node and its subtree from the graph. The last row of each batch is moved
+        into the row a removed shape leaves, so the rows stay packed
+
+        :param node: SceneNode of this graph leaving it
+        '''
+        self.removed = True
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.batch is not None:
+                batch, nodes = self.batches[id(node.shape)]
+                last = nodes.pop()
+                if last is not node:
+                    nodes[node.row] = last
+                    for array in (batch.positions, batch.scales, batch.orientations, batch.colors):
+                        if array is not None:
+                            array[node.row] = array[last.row]
+                    last.row = node.row
+                batch.count = len(nodes)
+                node.batch = node.row = None
+            node.graph = None
+            self.moving.pop(node, None)
+            self.moved.discard(node)
+            self.added.discard(node)
+            stack.extend(node.children)
+
+    @staticmethod
+    def _grow(batch, count):
+        '''
+        Makes room for count instances in a batch, doubling the arrays when they are full
+
+        :param batch: InstancedMesh to grow
+        :param count: number of instances needed
+        '''
+        batch.count = count
+        if count <= len(batch.positions):
+            return
+        capacity = max(count, 2 * len(batch.positions))
+        extra = capacity - len(batch.positions)
+        batch.positions = np.concatenate([batch.positions, np.zeros((extra, 3))])
+        batch.scales = np.concatenate([batch.scales, np.ones(extra)])
+        batch.orientations = np.concatenate([batch.orientations, np.tile(np.eye(3), (extra, 1, 1))])
+        if batch.face_color is not None:
+            colors = np.tile(np.asarray(batch.face_color, dtype=np.int32), (extra, 1))
+            batch.colors = colors if batch.colors is None else np.concatenate([batch.colors, colors])
+
+    def _write_instance(self, node):
+        '''
+        Copies the world transform of a node into its row of the batch
+
+        :param node: SceneNode with a shape
+        '''
+        batch, row = node.batch, node.row
+        batch.orientations[row] = node.world_rotation
+        batch.scales[row] = node.world_scale
+        batch.positions[row] = node.world_position
+        if batch.colors is not None:
+            batch.colors[row] = batch.face_color if node.color is None else node.color
+
+    def update(self):
+        '''
+        Recomputes the world transforms of the nodes changed since the last update and of
+        the nodes below them. Nothing else is touched
+
+        :return: number of nodes recomputed, 0 when the graph has not changed
+        '''
+        if not self.dirty:
+            return 0
+        count = 0
+        for node in sorted(self.dirty, key=lambda node: node.depth): # parents before children
+            if node.dirty and node.graph is self:
+                count += node._update()
+        self.dirty = []
+        return count
+
+    def tick(self):
+        '''
+        Advances the graph by one frame. The nodes recomputed in this frame start moving,
+        nodes that have been still for SETTLE_FRAMES frames stop, and newly added nodes
+        go straight to the still ones
+
+        :return: True when the still nodes changed and have to be submitted again
+        '''
+        self.update()
+        changed = self.removed or bool(self.added)
+        for node in self.moved - self.added: # freshly attached nodes are still
+            changed |= node not in self.moving
+            self.moving[node] = SETTLE_FRAMES
+        self.moved, self.added, self.removed = set(), set(), False
+        for node, frames in list(self.moving.items()):
+            if frames == 0:
+                del self.moving[node] # back into the still nodes
+                changed = True
+            else:
+                self.moving[node] = frames - 1
+        return changed
+
+    def submit(self, queue, angle_x, angle_y, angle_z, viewer_distance):
+        '''
+        Submits the shapes of every node that is not moving to a face queue
+
+        :param queue: FaceQueue to submit to
+        :param angle_x: angle about x axis
+        :param angle_y: angle about y axis
+        :param angle_z: angle about z axis
+        :param viewer_distance: zoom setting
+        '''
+        self.update()
+        for batch, nodes in self.batches.values():
+            rows = None if not self.moving else [node.row for node in nodes if node not in self.moving]
+            batch.submit(queue, angle_x, angle_y, angle_z, viewer_distance, rows)
+
+    def submit_moving(self, queue, angle_x, angle_y, angle_z, viewer_distance):
+        '''
+        Submits the shapes of the moving nodes to a face queue, one node after the other
+
+        :param queue: FaceQueue to submit to
+        :param angle_x: angle about x axis
+        :param angle_y: angle about y axis
+        :param angle_z: angle about z axis
+        :param viewer_distance: zoom setting
+        :return: (start, end) records of each moving node in the queue
+        '''
+        ranges = []
+        for node in self.moving:
+            start = len(queue)
+            node.batch.submit(queue, angle_x, angle_y, angle_z, viewer_distance, [node.row])
+            ranges.append((start, len(queue)))
+        return ranges
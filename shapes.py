@@ -4,11 +4,45 @@ EMAIL: imsara256@gmail.com
 '''
 # import packages
 import math
-import pygame
+import numpy as np
 
 # import files
-from transforms import project_3d_to_2d, rotation_matrix, apply_rotation
-from config import COLORS, screen
+from transforms import rotation_matrix, rotate_vertices, project_vertices, bounding_sphere, sphere_in_frustum, projected_radius
+from lod import LevelOfDetail, lod_segments
+from physics import PhysicsWorld
+from render import FaceQueue, EdgeStrips, outward_normals, edge_face_adjacency, cull_back_faces, submit_solid, submit_polygons, submit_strips
+from geometry import Geometry
+from lighting import Light, Lighting, default_lighting
+from config import COLORS, get_screen
+
+# cache of cylinder index buffers keyed on the number of segments
+_cylinder_buffers = {}
+
+def get_cylinder_buffers(segments):
+    '''
+    Returns the shared edge and face index buffers for a cylinder with the given
+    number of segments, building them on first use
+
+    :param segments: number of segments the cylinder is made up of
+    :return edges, faces, edge_faces, strips: (E, 2) edge array, a tuple of face arrays grouped by
+                                              vertex count, (2, segments) for the caps and (segments, 4)
+                                              for the sides, the (E, 2) faces next to each edge and the
+                                              EdgeStrips of the edges
+    '''
+    buffers = _cylinder_buffers.get(segments)
+    if buffers is None:
+        faces = Cylinder._generate_cylinder_faces(segments)
+        edges = np.array(Cylinder._generate_cylinder_edges(segments), dtype=np.int32)
+        caps = np.array(faces[:2], dtype=np.int32)
+        sides = np.array(faces[2:], dtype=np.int32).reshape(-1, 4)
+        edge_faces = edge_face_adjacency(edges, (caps, sides))
+        strips = EdgeStrips(Cylinder._generate_cylinder_vertices([0,0,0], 1, 1, segments), edges) # the rings become strips
+
+        # the buffers are shared between cylinders so they must never be modified in place
+        for array in (edges, caps, sides, edge_faces):
+            array.setflags(write=False)
+        buffers = _cylinder_buffers[segments] = (edges, (caps, sides), edge_faces, strips)
+    return buffers
 
 class Cylinder:
     '''
@@ -19,9 +53,11 @@ class Cylinder:
         _generate_cylinder_vertices: Generate the vertices of the cylinder
         _generate_cylinder_edges: Generates the edges using the vertices
         _generate_cylinder_faces: Generates the faces using the vertices
+        prepare: culls the cylinder and picks its level of detail
+        submit: submits the visible faces and edges of the cylinder to a face queue
         draw_shape: draws the cylinder using the information about the defined cylinder
     '''
-    def __init__(self, center=[0,0,0], radius=2, height=5, segments=20, edge_color = COLORS['BLACK'], face_color = COLORS['GREY']):
+    def __init__(self, center=[0,0,0], radius=2, height=5, segments=20, edge_color = COLORS['BLACK'], face_color = COLORS['GREY'], lod=True, lighting=None):
         '''
         Initialise the class
 
@@ -31,12 +67,28 @@ class Cylinder:
         :param segments: defines the numnerb of segments the cylinder is made up of
         :param edge_color: defines the color of the edges
         :param face_color: defines the colors on the faces 
-        '''
-        self.vertices = self._generate_cylinder_vertices(center, radius, height, segments)
+        :param lod: use fewer segments when the cylinder is small on screen
+        :param lighting: Lighting the faces are shaded with (default=None for flat faces)
+        '''
+        # geometry of each level of detail, finest first
+        level_segments = lod_segments(segments, 6) if lod else [segments]
+        self.levels = []
+        for level in level_segments:
+            vertices = np.array(self._generate_cylinder_vertices(center, radius, height, level), dtype=float)
+            edges, faces, edge_faces, strips = get_cylinder_buffers(level) # shared index buffers
+            normals = [outward_normals(vertices, group) for group in faces] # for back-face culling
+            self.levels.append(Geometry(vertices, edges, faces, normals, edge_faces, strips))
+        self.lod = LevelOfDetail(level_segments)
+        self.geometry = self.levels[0] # level drawn last
+
+        self.radius = radius
+        self.bound_center, self.bound_radius = bounding_sphere(self.geometry.vertices) # for frustum culling
         self.edge_color = edge_color
         self.face_color = face_color
+        self.lighting = lighting
 
-    def _generate_cylinder_vertices(self, center, radius, height, segments):
+    @staticmethod
+    def _generate_cylinder_vertices(center, radius, height, segments):
         '''
         Creates the vertices of the cylinder
 
@@ -62,7 +114,8 @@ class Cylinder:
         
         return vertices
     
-    def _generate_cylinder_edges(self, segments):
+    @staticmethod
+    def _generate_cylinder_edges(segments):
         '''
         Creates the edges of the cylinder
 
@@ -82,7 +135,8 @@ class Cylinder:
 
         return edges
     
-    def _generate_cylinder_faces(self, segments):
+    @staticmethod
+    def _generate_cylinder_faces(segments):
         '''
         Creates the faces of the cylinder defined through vertices
 
@@ -106,38 +160,68 @@ class Cylinder:
             
         return faces
 
-    def draw_shape(self, angle_x, angle_y, angle_z, viewer_distance):
+    def prepare(self, angle_x, angle_y, angle_z, viewer_distance):
         '''
-        Draws the cylinder using the defines vertices, edges and faces. Also applies transformations
+        Culls the cylinder and picks its level of detail
 
         :param angle_x: angle about x axis
         :param angle_y: angle about y axis
         :param angle_z: angle about z axis
         :param viewer_distance: zoom setting
+        :return: vertices to rotate and project, None when the cylinder is out of view
         '''
         fov = 256
-        final_vertices = []
         r_matrix = rotation_matrix(angle_x, angle_y, angle_z)  # Find the rotation matrix for the given angle
-        
-        # Apply rotation and projection to each vertex
-        for vertex in self.vertices:
-            aug_vertex = apply_rotation(vertex, r_matrix)
-            proj_vertex = project_3d_to_2d(aug_vertex, fov, viewer_distance)
-            final_vertices.append(proj_vertex)
-        
-        edges = self._generate_cylinder_edges(len(self.vertices) // 2)  # Calculate edges based on vertices count
-        faces = self._generate_cylinder_faces(len(self.vertices) // 2)
+        bound_center = rotate_vertices(self.bound_center, r_matrix)
+        if not sphere_in_frustum(bound_center, self.bound_radius, fov, viewer_distance):
+            return None # cylinder is out of view
 
-        # Draw the faces of the cylinder
-        for face in faces:
-            polygon_points = [final_vertices[i] for i in face]
-            pygame.draw.polygon(screen, self.face_color, polygon_points)  # Draw filled face
-            
-            #pygame.draw.polygon(screen, COLORS['BLACK'], polygon_points, 1)  # Draw outline
+        # fewer segments when the cylinder is small on screen
+        self.geometry = self.levels[self.lod.select(projected_radius(bound_center, self.radius, fov, viewer_distance))]
+        return self.geometry.vertices
+
+    def submit(self, queue, angle_x, angle_y, angle_z, viewer_distance, transformed=None):
+        '''
+        Submits the cylinder to a face queue after rotating and projecting it. Back faces are culled and
+        only the edges of visible faces are kept
+
+        :param queue: FaceQueue to submit to
+        :param angle_x: angle about x axis
+        :param angle_y: angle about y axis
+        :param angle_z: angle about z axis
+        :param viewer_distance: zoom setting
+        :param transformed: (camera_vertices, projected) of the vertices returned by prepare, from a
+                            transform stage (default=None to cull and transform here)
+        '''
+        fov = 256
+        r_matrix = rotation_matrix(angle_x, angle_y, angle_z)  # Find the rotation matrix for the given angle
+        if transformed is None:
+            if self.prepare(angle_x, angle_y, angle_z, viewer_distance) is None:
+                return # cylinder is out of view
+            # Apply rotation and projection to all vertices at once
+            camera_vertices = rotate_vertices(self.geometry.vertices, r_matrix)
+            projected = project_vertices(camera_vertices, fov, viewer_distance)
+        else:
+            camera_vertices, projected = transformed
+
+        geometry = self.geometry
+        submit_solid(queue, camera_vertices, projected, geometry.faces, geometry.normals, r_matrix, fov, viewer_distance,
+                     self.face_color, geometry.edges, geometry.edge_faces, self.edge_color, strips=geometry.strips, lighting=self.lighting)
 
-        # Draw the edges of the cylinder
-        for edge in edges:
-            pygame.draw.line(screen, self.edge_color, final_vertices[edge[0]], final_vertices[edge[1]], 2)
+    def draw_shape(self, angle_x, angle_y, angle_z, viewer_distance, surface=None):
+        '''
+        Draws the cylinder using the defines vertices, edges and faces. Also applies transformations
+
+        :param angle_x: angle about x axis
+        :param angle_y: angle about y axis
+        :param angle_z: angle about z axis
+        :param viewer_distance: zoom setting
+        :param surface: surface to draw on (default=screen)
+        '''
+        surface = get_screen() if surface is None else surface # draw to the window by default
+        queue = FaceQueue()
+        self.submit(queue, angle_x, angle_y, angle_z, viewer_distance)
+        queue.draw(surface)
 
 class Cube:
     '''
@@ -148,9 +232,11 @@ class Cube:
         _generate_cube_vertices 
         _generate_cube_edges
         _generate_cube_faces
+        prepare
+        submit
         draw_shape
     '''
-    def __init__(self, center=[0,0,0], side_length=4, edge_color=COLORS['BLACK'], face_color=COLORS['GREY']):
+    def __init__(self, center=[0,0,0], side_length=4, edge_color=COLORS['BLACK'], face_color=COLORS['GREY'], lighting=None):
         '''
         Initialise the class
 
@@ -158,12 +244,19 @@ class Cube:
         :param side_length: defines the length if a side of the cube
         :param edge_color: defines the color of the edges
         :param face_color: defines the colors on the faces 
-        '''
-        self.vertices = self._generate_cube_vertices(center, side_length)
-        self.edges = self._generate_cube_edges()
-        self.faces = self._generate_cube_faces()
+        :param lighting: Lighting the faces are shaded with (default=None for flat faces)
+        '''
+        vertices = np.array(self._generate_cube_vertices(center, side_length), dtype=float)
+        edges = np.array(self._generate_cube_edges(), dtype=np.int32)
+        faces = np.array(self._generate_cube_faces(), dtype=np.int32)
+        self.geometry = Geometry(vertices, edges, (faces,),
+                                 (outward_normals(vertices, faces),), # for back-face culling
+                                 edge_face_adjacency(edges, (faces,)),
+                                 EdgeStrips(vertices, edges)) # connected edges drawn together
+        self.bound_center, self.bound_radius = bounding_sphere(vertices) # for frustum culling
         self.edge_color = edge_color
         self.face_color = face_color
+        self.lighting = lighting
 
     def _generate_cube_vertices(self, center, side_length):
         '''
@@ -220,34 +313,67 @@ class Cube:
             (1, 2, 6, 5),  # Right face
         ]
 
-    def draw_shape(self, angle_x, angle_y, angle_z, viewer_distance):
+    def prepare(self, angle_x, angle_y, angle_z, viewer_distance):
         '''
-        Draws the cube using the defines vertices, edges and faces. Also applies transformations
+        Culls the cube
 
         :param angle_x: angle about x axis
         :param angle_y: angle about y axis
         :param angle_z: angle about z axis
         :param viewer_distance: zoom setting
+        :return: vertices to rotate and project, None when the cube is out of view
+        '''
+        r_matrix = rotation_matrix(angle_x, angle_y, angle_z) # find the rotation matrix for the given angle
+        if not sphere_in_frustum(rotate_vertices(self.bound_center, r_matrix), self.bound_radius, 256, viewer_distance):
+            return None # cube is out of view
+        return self.geometry.vertices
+
+    def submit(self, queue, angle_x, angle_y, angle_z, viewer_distance, transformed=None):
+        '''
+        Submits the cube to a face queue after rotating and projecting it. Back faces are culled and
+        only the edges of visible faces are kept
+
+        :param queue: FaceQueue to submit to
+        :param angle_x: angle about x axis
+        :param angle_y: angle about y axis
+        :param angle_z: angle about z axis
+        :param viewer_distance: zoom setting
+        :param transformed: (camera_vertices, projected) of the vertices returned by prepare, from a
+                            transform stage (default=None to cull and transform here)
         '''
         fov = 256
-        final_vertices = []
         r_matrix = rotation_matrix(angle_x, angle_y, angle_z) # find the rotation matrix for the given angle
-        for vertex in self.vertices:
-            aug_vertex = apply_rotation(vertex, r_matrix)
-            proj_vertex = project_3d_to_2d(aug_vertex, fov, viewer_distance)
-            final_vertices.append(proj_vertex)
-        
+        if transformed is None:
+            if self.prepare(angle_x, angle_y, angle_z, viewer_distance) is None:
+                return # cube is out of view
+            camera_vertices = rotate_vertices(self.geometry.vertices, r_matrix)
+            projected = project_vertices(camera_vertices, fov, viewer_distance)
+        else:
+            camera_vertices, projected = transformed
 
-        for face in self.faces:
-            polygon_points = [final_vertices[i] for i in face]
-            pygame.draw.polygon(screen, self.face_color, polygon_points)  # Draw filled face
-        
-        for edge in self.edges:
-            pygame.draw.line(screen, self.edge_color, final_vertices[edge[0]], final_vertices[edge[1]], 2)
+        geometry = self.geometry
+        submit_solid(queue, camera_vertices, projected, geometry.faces, geometry.normals, r_matrix, fov, viewer_distance,
+                     self.face_color, geometry.edges, geometry.edge_faces, self.edge_color, strips=geometry.strips, lighting=self.lighting)
+
+    def draw_shape(self, angle_x, angle_y, angle_z, viewer_distance, surface=None):
+        '''
+        Draws the cube using the defines vertices, edges and faces. Also applies transformations
+
+        :param angle_x: angle about x axis
+        :param angle_y: angle about y axis
+        :param angle_z: angle about z axis
+        :param viewer_distance: zoom setting
+        :param surface: surface to draw on (default=screen)
+        '''
+        surface = get_screen() if surface is None else surface # draw to the window by default
+        queue = FaceQueue()
+        self.submit(queue, angle_x, angle_y, angle_z, viewer_distance)
+        queue.draw(surface)
 
 class Torus:
 
-    def __init__(self, center=[0,0,0], R=5, r=2, segments_u=30, segments_v=15, edge_color=COLORS['BLACK']):
+    def __init__(self, center=[0,0,0], R=5, r=2, segments_u=30, segments_v=15, edge_color=COLORS['BLACK'], lod=True,
+                 filled=False, face_color=COLORS['GREY'], lighting=None):
         '''
         Initialise the class
 
@@ -257,10 +383,34 @@ class Torus:
         :param segments_u: Inner segments
         :param segments_v: Outer segments
         :param edge_color: defines the color of the edges (default=BLACK)
-        '''
-        self.vertices = self._generate_torus_vertices(center, R, r, segments_u, segments_v)
-        self.edges = self._generate_torus_edges(segments_u, segments_v)
+        :param lod: use fewer segments when the torus is small on screen (default=True)
+        :param filled: draw solid faces instead of a wireframe (default=False)
+        :param face_color: color of the faces of a filled torus (default=GREY)
+        :param lighting: Lighting a filled torus is shaded with (default=None for default_lighting)
+        '''
+        # geometry of each level of detail, finest first. Both directions are reduced together
+        level_segments = lod_segments(segments_u, 6) if lod else [segments_u]
+        self.levels = []
+        for u in level_segments:
+            v = max(3, round(segments_v * u / segments_u))
+            vertices = np.array(self._generate_torus_vertices(center, R, r, u, v), dtype=float)
+            edges = np.array(self._generate_torus_edges(u, v), dtype=np.int32)
+            strips = EdgeStrips(vertices, edges) # the rings become strips
+            if filled:
+                faces = np.array(self._generate_torus_faces(u, v), dtype=np.int32)
+                self.levels.append(Geometry(vertices, edges, (faces,), (self._generate_torus_normals(faces, u, v),),
+                                            edge_face_adjacency(edges, (faces,)), strips))
+            else:
+                self.levels.append(Geometry(vertices, edges, strips=strips))
+        self.lod = LevelOfDetail(level_segments)
+        self.geometry = self.levels[0] # level drawn last
+
+        self.outer_radius = R + r
+        self.bound_center, self.bound_radius = bounding_sphere(self.geometry.vertices) # for frustum culling
         self.edge_color = edge_color
+        self.filled = filled
+        self.face_color = face_color
+        self.lighting = default_lighting if lighting is None else lighting
 
     def _generate_torus_vertices(self, center, R, r, segments_u, segments_v):
         """
@@ -316,28 +466,152 @@ class Torus:
         
         return edges
 
-    def draw_shape(self, angle_x, angle_y, angle_z, viewer_distance):
+    def _generate_torus_faces(self, segments_u, segments_v):
         '''
-        Draws the torus using the defines vertices and edges. Also applies transformations
+        Generates the quads between neighbouring rings of a filled torus
+
+        :param segments_u: Number of segments around the tube
+        :param segments_v: Number of segments along the torus
+        :return: List of faces defined by vertex indices
+        '''
+        faces = []
+        for i in range(segments_u):
+            for j in range(segments_v):
+                next_i = (i + 1) % segments_u # wrap around u
+                next_j = (j + 1) % segments_v # wrap around v
+                faces.append([i * segments_v + j, next_i * segments_v + j, next_i * segments_v + next_j, i * segments_v + next_j])
+        return faces
+
+    @staticmethod
+    def _generate_torus_normals(faces, segments_u, segments_v):
+        '''
+        Unit normals of the faces pointing out of the tube. Faces on the inside of the ring
+        face the hole, so the normals come from the tube rather than the center of the torus
+
+        :param faces: (F, 4) array of vertex indices
+        :param segments_u: Number of segments around the tube
+        :param segments_v: Number of segments along the torus
+        :return: (F, 3) array of normals
+        '''
+        u = np.repeat(np.arange(segments_u) / segments_u * 2 * np.pi, segments_v)
+        v = np.tile(np.arange(segments_v) / segments_v * 2 * np.pi, segments_u)
+        # normal of the tube at every vertex, in the order of _generate_torus_vertices
+        vertex_normals = np.column_stack((np.cos(v) * np.cos(u), np.cos(v) * np.sin(u), np.sin(v)))
+        normals = vertex_normals[faces].mean(axis=1)
+        return normals / np.linalg.norm(normals, axis=1)[:, None]
+
+    def prepare(self, angle_x, angle_y, angle_z, viewer_distance):
+        '''
+        Culls the torus and picks its level of detail
 
         :param angle_x: angle about x axis
         :param angle_y: angle about y axis
         :param angle_z: angle about z axis
         :param viewer_distance: zoom setting
+        :return: vertices to rotate and project, None when the torus is out of view
         '''
         fov = 256
-        final_vertices = []
         r_matrix = rotation_matrix(angle_x, angle_y, angle_z)  # Find the rotation matrix for the given angle
-        
-        # Apply rotation and projection to each vertex
-        for vertex in self.vertices:
-            aug_vertex = apply_rotation(vertex, r_matrix)
-            proj_vertex = project_3d_to_2d(aug_vertex, fov, viewer_distance)
-            final_vertices.append(proj_vertex)
+        bound_center = rotate_vertices(self.bound_center, r_matrix)
+        if not sphere_in_frustum(bound_center, self.bound_radius, fov, viewer_distance):
+            return None # torus is out of view
+
+        # fewer segments when the torus is small on screen
+        self.geometry = self.levels[self.lod.select(projected_radius(bound_center, self.outer_radius, fov, viewer_distance))]
+        return self.geometry.vertices
+
+    def submit(self, queue, angle_x, angle_y, angle_z, viewer_distance, transformed=None):
+        '''
+        Submits the torus to a face queue after rotating and projecting it. A filled torus
+        has its back faces culled and its front faces shaded
+
+        :param queue: FaceQueue to submit to
+        :param angle_x: angle about x axis
+        :param angle_y: angle about y axis
+        :param angle_z: angle about z axis
+        :param viewer_distance: zoom setting
+        :param transformed: (camera_vertices, projected) of the vertices returned by prepare, from a
+                            transform stage (default=None to cull and transform here)
+        '''
+        fov = 256
+        r_matrix = rotation_matrix(angle_x, angle_y, angle_z)  # Find the rotation matrix for the given angle
+        if transformed is None:
+            if self.prepare(angle_x, angle_y, angle_z, viewer_distance) is None:
+                return # torus is out of view
+            # Apply rotation and projection to all vertices at once
+            camera_vertices = rotate_vertices(self.geometry.vertices, r_matrix)
+            projected = project_vertices(camera_vertices, fov, viewer_distance)
+        else:
+            camera_vertices, projected = transformed
+
+        geometry = self.geometry
+        if geometry.faces:
+            submit_solid(queue, camera_vertices, projected, geometry.faces, geometry.normals, r_matrix, fov, viewer_distance,
+                         self.face_color, geometry.edges, geometry.edge_faces, self.edge_color, strips=geometry.strips, lighting=self.lighting)
+            return
+
+        # each edge is sorted by the depth of its middle and each strip by its nearest edge
+        edges = self.geometry.edges
+        depths = camera_vertices[edges, 2].mean(axis=1)
+        submit_strips(queue, camera_vertices, projected, edges, self.geometry.strips, depths, self.edge_color, 2, fov, viewer_distance)
+
+    def draw_shape(self, angle_x, angle_y, angle_z, viewer_distance, surface=None):
+        '''
+        Draws the torus using the defines vertices and edges. Also applies transformations
+
+        :param angle_x: angle about x axis
+        :param angle_y: angle about y axis
+        :param angle_z: angle about z axis
+        :param viewer_distance: zoom setting
+        :param surface: surface to draw on (default=screen)
+        '''
+        surface = get_screen() if surface is None else surface # draw to the window by default
+        queue = FaceQueue()
+        self.submit(queue, angle_x, angle_y, angle_z, viewer_distance)
+        queue.draw(surface)
+
+class SphereMesh(Geometry):
+    '''
+    Object-space geometry of a sphere centered on the origin. Built once per
+    (radius, segments_lat, segments_lon) and shared by every Sphere with that size,
+    so a bouncing ball only has to offset the vertices by its center each frame
+
+    Attributes:
+        vertices: (N, 3) array of vertices around the origin
+        faces: one (F, 4) array of vertex indices for each quad
+        normals: one (F, 3) array of unit normals pointing out of the sphere, used for culling and lighting
+    '''
+    __slots__ = () # no instance dict, the buffers live in Geometry's slots
 
-        # Draw the edges of the cylinder
-        for edge in self.edges:
-            pygame.draw.line(screen, self.edge_color, final_vertices[edge[0]], final_vertices[edge[1]], 2)
+    def __init__(self, radius, segments_lat, segments_lon):
+        '''
+        Initialise the class and precompute the mesh
+
+        :param radius: radius of the sphere
+        :param segments_lat: number of segments for latitude
+        :param segments_lon: number of segments for longitude
+        '''
+        vertices = np.array(Sphere._generate_sphere_vertices([0,0,0], radius, segments_lat, segments_lon), dtype=float)
+        faces = np.array(Sphere._generate_sphere_faces(segments_lat, segments_lon), dtype=np.int32)
+        super().__init__(vertices, faces=(faces,), normals=(outward_normals(vertices, faces),))
+
+# cache of sphere meshes keyed on (radius, segments_lat, segments_lon)
+_sphere_meshes = {}
+
+def get_sphere_mesh(radius, segments_lat, segments_lon):
+    '''
+    Returns the shared mesh for a sphere of the given size, building it on first use
+
+    :param radius: radius of the sphere
+    :param segments_lat: number of segments for latitude
+    :param segments_lon: number of segments for longitude
+    :return: SphereMesh object
+    '''
+    key = (radius, segments_lat, segments_lon)
+    mesh = _sphere_meshes.get(key)
+    if mesh is None:
+        mesh = _sphere_meshes[key] = SphereMesh(radius, segments_lat, segments_lon)
+    return mesh
 
 class Sphere:
     '''
@@ -345,12 +619,18 @@ class Sphere:
 
     Attributes:
         __init__: Class initialiser
+        _build_levels: Fetch the meshes of every level of detail
+        attach: Move the physics state of the sphere into another world
         _generate_sphere_vertices: Function to calculate the vertices for displaying the sphere
         _generate_sphere_faces: Function to calculate the faces for displaying the sphere
-        _calculate_face_normal: Calculate the normals from faces
-        _calculate_lighting: Calculate the shading from the normals and the direction of the light source
+        prepare: Cull the sphere and pick the mesh to draw
+        submit: Submit the visible, shaded faces to a face queue
+        draw_shape: Draw the sphere
+        move_ball: Advance the bouncing physics by one step
+        interpolate: Draw the ball between its last two physics steps
+        update_ball_position: Move the ball and draw it
     '''
-    def __init__(self, center=[0,0,0], radius=5, segments_lat=30, segments_lon=30, gravity = 0.01, damping = 0.9, floor = [0,0,0], face_color=COLORS['GREY'], light_pos=[-50,50,50]):
+    def __init__(self, center=[0,0,0], radius=5, segments_lat=30, segments_lon=30, gravity = 0.01, damping = 0.9, floor = [0,0,0], face_color=COLORS['GREY'], light_pos=None, world=None, lod=True, lighting=None):
         '''
         Initialise the class
 
@@ -359,27 +639,118 @@ class Sphere:
         :param segments_lat: number of segments for latitude (default=20)
         :param segments_lon: number of segments for longitude (default=20)
         :param face_color: base color of the faces (default=GREY)
-        :param light_pos: position of the light source in 3D space (default=[1, 1, 1])
+        :param light_pos: direction of a light of its own in camera space (default=None for the shared lighting)
+        :param world: PhysicsWorld holding the state of the sphere (default=None for a world of its own)
+        :param lod: use fewer segments when the sphere is small on screen (default=True)
+        :param lighting: Lighting the faces are shaded with (default=None for default_lighting)
         '''
-        # sphere definition
-        self.center = center
-        self.radius = radius
-        self.velocity = [0,0,0] # velocities in the x, y & z directions
-
-        self.gravity = gravity # gravity in the environment
-        self.damping = damping # damping factor
-        self.floor = floor # floor for the ball
-
         # define the lat and long
         self.segments_lat = segments_lat
         self.segments_lon = segments_lon
 
+        # physics state lives in a row of the world arrays, see attach
+        self.world = PhysicsWorld(capacity=1) if world is None else world
+        self.index = self.world.add_body(center, radius, gravity=gravity, damping=damping, floor=floor)
+
+        # (lat, lon) segments of each level of detail, finest first. Both directions are reduced together
+        lon_levels = lod_segments(segments_lon, 4) if lod else [segments_lon]
+        self.level_segments = [(max(3, round(segments_lat * lon / segments_lon)), lon) for lon in lon_levels]
+        self.lod = LevelOfDetail(lon_levels)
+        self._build_levels()
+
         self.vertices = None
-        self.faces = None
         self.face_color = face_color
         self.light_pos = light_pos
+        if lighting is None:
+            lighting = default_lighting if light_pos is None else Lighting([Light(light_pos)])
+        self.lighting = lighting
+
+    def _build_levels(self):
+        '''
+        Fetches the shared meshes of every level of detail for the current radius
+        '''
+        self.meshes = [get_sphere_mesh(self.radius, lat, lon) for lat, lon in self.level_segments] # shared object-space geometry
+        self.mesh = self.meshes[self.lod.level]
+        self.faces = self.mesh.faces[0]
+
+    def attach(self, world):
+        '''
+        Moves the physics state of the sphere into another world
+
+        :param world: PhysicsWorld to move to
+        '''
+        if world is self.world:
+            return
+        old, i = self.world, self.index
+        self.index = world.add_body(old.positions[i], old.radii[i], old.velocities[i], old.gravity[i], old.damping[i], old.floors[i])
+        world.previous_positions[self.index] = old.previous_positions[i]
+        self.world = world
+
+    # views into the world arrays, writing to them changes the world
+    @property
+    def center(self):
+        return self.world.positions[self.index]
+
+    @center.setter
+    def center(self, value):
+        self.world.positions[self.index] = value
+
+    @property
+    def previous_center(self):
+        return self.world.previous_positions[self.index]
+
+    @previous_center.setter
+    def previous_center(self, value):
+        self.world.previous_positions[self.index] = value
+
+    @property
+    def draw_center(self):
+        # interpolated center to draw at, None to draw at the center
+        return self.world.draw_positions[self.index] if self.world.interpolated[self.index] else None
+
+    @property
+    def velocity(self):
+        return self.world.velocities[self.index]
+
+    @velocity.setter
+    def velocity(self, value):
+        self.world.velocities[self.index] = value
+
+    @property
+    def radius(self):
+        return float(self.world.radii[self.index])
+
+    @radius.setter
+    def radius(self, value):
+        self.world.radii[self.index] = value
+        self._build_levels()
+
+    @property
+    def gravity(self):
+        return float(self.world.gravity[self.index])
+
+    @gravity.setter
+    def gravity(self, value):
+        self.world.gravity[self.index] = value
+
+    @property
+    def damping(self):
+        return float(self.world.damping[self.index])
+
+    @damping.setter
+    def damping(self, value):
+        self.world.damping[self.index] = value
+
+    @property
+    def floor(self):
+        return self.world.floors[self.index]
+
+    @floor.setter
+    def floor(self, value):
+        self.world.floors[self.index] = value
     
-    def _generate_sphere_vertices(self, center, radius, segments_lat, segments_lon):
+    @staticmethod
+    def _generate_sphere_vertices(center, radius, segments_lat, segments_lon):
         '''
         Creates the vertices of the sphere
 
@@ -406,7 +777,8 @@ class Sphere:
         
         return vertices
 
-    def _generate_sphere_faces(self, segments_lat, segments_lon):
+    @staticmethod
+    def _generate_sphere_faces(segments_lat, segments_lon):
         '''
         Creates the faces of the sphere as quads
 
@@ -433,50 +805,64 @@ class Sphere:
         
         return faces
     
-    def _calculate_face_normal(self, face):
+    def prepare(self, angle_x, angle_y, angle_z, viewer_distance):
         '''
-        Calculates the normal vector of a face (quad) defined by 4 vertices
+        Culls the sphere, picks its level of detail and moves the mesh to the sphere's center
 
-        :param face: list of 4 vertex indices that define the face
-        :return normal: normal vector of the face
+        :param angle_x: angle about x axis
+        :param angle_y: angle about y axis
+        :param angle_z: angle about z axis
+        :param viewer_distance: zoom setting
+        :return: vertices to rotate and project, None when the sphere is out of view
         '''
-        v0 = self.vertices[face[0]]
-        v1 = self.vertices[face[1]]
-        v2 = self.vertices[face[2]]
+        fov = 256 # field of view
+        r_matrix = rotation_matrix(angle_x, angle_y, angle_z)  # Find the rotation matrix for the given angle
+        center = self.center if self.draw_center is None else self.draw_center
+        camera_center = rotate_vertices(center, r_matrix)
+        if not sphere_in_frustum(camera_center, self.radius, fov, viewer_distance):
+            return None # sphere is out of view
 
-        # Calculate vectors for two edges of the quad
-        edge1 = [v1[i] - v0[i] for i in range(3)]
-        edge2 = [v2[i] - v0[i] for i in range(3)]
-        
-        # Cross product of edge1 and edge2 gives the face normal
-        normal = [edge1[1] * edge2[2] - edge1[2] * edge2[1],
-                  edge1[2] * edge2[0] - edge1[0] * edge2[2],
-                  edge1[0] * edge2[1] - edge1[1] * edge2[0]]
-        
-        # Normalize the normal
-        length = math.sqrt(normal[0]**2 + normal[1]**2 + normal[2]**2)
-        if length != 0:
-            normal = [n / length for n in normal]
-        
-        return normal
+        # fewer segments when the sphere is small on screen
+        self.mesh = self.meshes[self.lod.select(projected_radius(camera_center, self.radius, fov, viewer_distance))]
+        self.faces = self.mesh.faces[0]
+
+        self.vertices = self.mesh.vertices + center # move the cached mesh to the center
+        return self.vertices
 
-    def _calculate_lighting(self, normal):
+    def submit(self, queue, angle_x, angle_y, angle_z, viewer_distance, transformed=None):
         '''
-        Calculates the shading value based on the normal and the light source
+        Submits the sphere to a face queue after rotating and projecting it. Back faces are culled and the
+        front faces are shaded based on the light source
 
-        :param normal: normal vector of the face
-        :return brightness: brightness factor for shading (between 0 and 1)
+        :param queue: FaceQueue to submit to
+        :param angle_x: angle about x axis
+        :param angle_y: angle about y axis
+        :param angle_z: angle about z axis
+        :param viewer_distance: zoom setting
+        :param transformed: (camera_vertices, projected) of the vertices returned by prepare, from a
+                            transform stage (default=None to cull and transform here)
         '''
-        # Light direction (can be normalized)
-        light_dir = self.light_pos
-        light_length = math.sqrt(light_dir[0]**2 + light_dir[1]**2 + light_dir[2]**2)
-        light_dir = [l / light_length for l in light_dir]
+        fov = 256 # field of view
+        r_matrix = rotation_matrix(angle_x, angle_y, angle_z)  # Find the rotation matrix for the given angle
+        if transformed is None:
+            if self.prepare(angle_x, angle_y, angle_z, viewer_distance) is None:
+                return # sphere is out of view
+            # Apply rotation and projection to all vertices at once
+            camera_vertices = rotate_vertices(self.vertices, r_matrix)
+            projected = project_vertices(camera_vertices, fov, viewer_distance)
+        else:
+            camera_vertices, projected = transformed
+
+        # Drop the faces pointing away from the viewer
+        camera_normals = rotate_vertices(self.mesh.normals[0], r_matrix)
+        visible, depths = cull_back_faces(camera_vertices, self.faces, camera_normals, viewer_distance)
+
+        # Shade the front faces together, reusing the normals rotated for culling
+        shaded_colors = self.lighting.shade(camera_normals[visible], self.face_color, r_matrix).tolist()
 
-        # Dot product between the normal and light direction
-        dot_product = max(0, normal[0] * light_dir[0] + normal[1] * light_dir[1] + normal[2] * light_dir[2])
-        return dot_product
+        submit_polygons(queue, camera_vertices, projected, self.faces[visible], depths[visible], shaded_colors, fov, viewer_distance)
 
-    def draw_shape(self, angle_x, angle_y, angle_z, viewer_distance):
+    def draw_shape(self, angle_x, angle_y, angle_z, viewer_distance, surface=None):
         '''
         Draws the sphere using the defined vertices, faces and applies lighting and shading
 
@@ -484,53 +870,44 @@ class Sphere:
         :param angle_y: angle about y axis
         :param angle_z: angle about z axis
         :param viewer_distance: zoom setting
+        :param surface: surface to draw on (default=screen)
         '''
-        fov = 256 # field of view
-        final_vertices = [] # store the projected vertices
-        self.vertices = self._generate_sphere_vertices(self.center,
-                                                       self.radius,
-                                                       self.segments_lat,
-                                                       self.segments_lon) # generate vertices for sphere 
-        
-        r_matrix = rotation_matrix(angle_x, angle_y, angle_z)  # Find the rotation matrix for the given angle
-        
-        # Apply rotation and projection to each vertex
-        for vertex in self.vertices:
-            aug_vertex = apply_rotation(vertex, r_matrix)
-            proj_vertex = project_3d_to_2d(aug_vertex, fov, viewer_distance)
-            final_vertices.append(proj_vertex)
-
-        self.faces = self._generate_sphere_faces(self.segments_lat,self.segments_lon) # generate faces
+        surface = get_screen() if surface is None else surface # draw to the window by default
+        queue = FaceQueue()
+        self.submit(queue, angle_x, angle_y, angle_z, viewer_distance)
+        queue.draw(surface)
 
-        # Draw the faces of the sphere
-        for face in self.faces:
-            polygon_points = [final_vertices[i] for i in face]
-            
-            # Calculate the normal of the face
-            normal = self._calculate_face_normal(face)
-            normal_rotated = apply_rotation(normal, r_matrix)
-            
-            # Determine lighting for the face
-            brightness = self._calculate_lighting(normal_rotated)
-            
-            # Shade the face based on lighting (darker color with less brightness)
-            shaded_color = [min(255, max(0, int(c * brightness))) for c in self.face_color]  # Assuming GREY is a tuple like (r, g, b)
-            
-            # Draw the shaded face
-            pygame.draw.polygon(screen, shaded_color, polygon_points)
-    
     def _apply_gravity(self):
         self.velocity[1] += -self.gravity # Increase the velocity downwards
     
     def _floor_collisions(self):
         # Handle floor collision
         if self.center[1] - self.radius < self.floor[1]:
-            self.center[1] = self.radius
+            self.center[1] = self.floor[1] + self.radius
             self.velocity[1] = -self.velocity[1] * self.damping  # Bounce with damping
 
-    def update_ball_position(self, angle_x, angle_y, angle_z, viewer_distance):
+    def move_ball(self):
+        '''
+        Advances this ball alone by one physics step. Engines step all their balls at once
+        with PhysicsWorld.step instead
+        '''
+        self.previous_center = self.center # kept for interpolating between steps
+        self.world.interpolated[self.index] = False
         self._apply_gravity() # add acceleration downwards
         # Update ball position in 3D
-        self.center[1] += self.velocity[1]  # Update y (vertical movement)
+        self.center += self.velocity
         self._floor_collisions() # check for floor collisions
-        self.draw_shape(angle_x, angle_y, angle_z, viewer_distance) # draw the sphere at the new sphere
+
+    def interpolate(self, alpha):
+        '''
+        Sets the center the ball is drawn at to a point between its last two physics steps
+
+        :param alpha: fraction of a physics step since the last step, between 0 and 1
+        '''
+        previous = self.previous_center
+        self.world.draw_positions[self.index] = previous + (self.center - previous) * alpha
+        self.world.interpolated[self.index] = True
+
+    def update_ball_position(self, angle_x, angle_y, angle_z, viewer_distance, surface=None):
+        self.move_ball()
+        self.draw_shape(angle_x, angle_y, angle_z, viewer_distance, surface) # draw the sphere at the new sphere
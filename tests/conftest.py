@@ -0,0 +1,12 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import os
+import sys
+
+# the engine modules open a window on import unless they run headless
+os.environ['ENGINE_HEADLESS'] = '1'
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
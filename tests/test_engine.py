@@ -0,0 +1,102 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import os
+import sys
+import subprocess
+import numpy as np
+import pygame
+import pytest
+
+# file imports
+from SimulationEngine import Engine
+from shapes import Cube, Sphere
+
+def test_magenta_static_faces_are_drawn():
+    sim = Engine(headless=True)
+    sim._add_shapes(Cube(center=[0, 0, 0], side_length=10, face_color=(255, 0, 255)))
+    sim.render_frame()
+    pixels = pygame.surfarray.array3d(sim.surface)
+    assert (pixels == (255, 0, 255)).all(axis=2).sum() > 1000
+
+def test_headless_engine_opens_no_window():
+    # a fresh interpreter without ENGINE_HEADLESS, the dummy driver would let a window open if one was asked for
+    env = {k: v for k, v in os.environ.items() if k != 'ENGINE_HEADLESS'}
+    env['SDL_VIDEODRIVER'] = 'dummy'
+    code = ('import pygame\n'
+            'from SimulationEngine import Engine\n'
+            'from shapes import Cube\n'
+            'sim = Engine(headless=True)\n'
+            'sim._add_shapes(Cube())\n'
+            'sim.render_frame()\n'
+            'assert pygame.display.get_surface() is None\n')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-c', code], cwd=root, env=env, check=True, capture_output=True)
+
+def _falling_ball():
+    sim = Engine(headless=True)
+    sim._add_balls(Sphere(center=[0, 50, 0], radius=1))
+    steps = []
+    step = sim.world.step
+    sim.world.step = lambda: (steps.append(1), step())
+    return sim, steps
+
+def test_accumulator_carries_the_remainder_and_interpolates():
+    sim, steps = _falling_ball()
+    sim._step_physics(2.5 * sim.physics_dt)
+    assert len(steps) == 2
+    assert sim.accumulator == pytest.approx(0.5 * sim.physics_dt)
+    world = sim.world
+    halfway = (world.previous_positions[0] + world.positions[0]) / 2 # alpha is the leftover fraction of a step
+    assert np.allclose(world.draw_positions[0], halfway) and world.interpolated[0]
+    sim._step_physics(0.75 * sim.physics_dt) # the remainder adds up to one more step
+    assert len(steps) == 3
+    assert sim.accumulator == pytest.approx(0.25 * sim.physics_dt)
+    quarter = world.previous_positions[0] + (world.positions[0] - world.previous_positions[0]) / 4
+    assert np.allclose(world.draw_positions[0], quarter)
+
+def test_substeps_are_capped_after_a_long_frame():
+    sim, steps = _falling_ball()
+    sim._step_physics(20 * sim.physics_dt)
+    assert len(steps) == sim.max_substeps
+    assert sim.accumulator <= sim.physics_dt # the rest of the frame is dropped
+
+def test_simulation_speed_does_not_depend_on_the_frame_rate():
+    fast, _ = _falling_ball()
+    slow, _ = _falling_ball()
+    for _ in range(60):
+        fast._step_physics(fast.physics_dt / 2)
+    for _ in range(15):
+        slow._step_physics(slow.physics_dt * 2)
+    assert np.array_equal(fast.world.positions[0], slow.world.positions[0])
+
+def _bouncing_frames(full_redraw):
+    sim = Engine(angle_x=0.4, angle_y=0.6, viewer_distance=50, headless=True)
+    for i in range(4):
+        sim._add_balls(Sphere(center=[i * 5 - 8, 8 + i, 0], radius=2))
+    sim._add_shapes(Cube(center=[0, 2, 0]))
+    for frame in range(40):
+        if frame == 20:
+            sim.angle_y += 0.1 # the camera moves, the whole frame is drawn again
+        if full_redraw:
+            sim.background_key = None
+        sim.render_frame()
+        yield pygame.surfarray.array3d(sim.surface), sim.dirty_rects
+
+def test_dirty_rects_match_a_full_redraw():
+    previous = None
+    partial_frames = 0
+    for (image, rects), (expected, _) in zip(_bouncing_frames(False), _bouncing_frames(True)):
+        assert np.array_equal(image, expected)
+        if rects is not None:
+            partial_frames += 1
+            # everything that changed since the last frame is inside the rects presented
+            outside = np.ones(image.shape[:2], dtype=bool)
+            for rect in rects:
+                rect = rect.clip(pygame.Rect((0, 0), image.shape[:2]))
+                outside[rect.left:rect.right, rect.top:rect.bottom] = False
+            assert np.array_equal(image[outside], previous[outside])
+        previous = image
+    assert partial_frames >= 30
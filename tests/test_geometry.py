@@ -0,0 +1,25 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import numpy as np
+import pytest
+
+# file imports
+from geometry import Geometry
+from shapes import Cube, get_sphere_mesh
+
+def test_sphere_mesh_has_no_instance_dict():
+    mesh = get_sphere_mesh(2, 10, 10)
+    assert isinstance(mesh, Geometry)
+    assert not hasattr(mesh, '__dict__')
+    with pytest.raises(AttributeError):
+        mesh.shading_normals = None
+
+def test_buffers_are_compact_and_read_only():
+    geometry = Cube(side_length=2).geometry
+    assert not hasattr(geometry, '__dict__')
+    assert geometry.vertices.dtype == np.float32 and geometry.edges.dtype == np.int32
+    with pytest.raises(ValueError):
+        geometry.vertices[0, 0] = 1
@@ -0,0 +1,56 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import math
+import numpy as np
+import pygame
+import pytest
+
+# file imports
+from SimulationEngine import Engine
+from shapes import Cube, Cylinder, Torus
+
+POSITIONS = [[-10, 0, 0], [0, 3, 5], [8, -2, 0]]
+
+def _engine():
+    return Engine(angle_x=math.radians(-20), angle_y=math.radians(30), viewer_distance=60, headless=True)
+
+def _image(engine):
+    engine.render_frame()
+    return pygame.surfarray.array3d(engine.surface)
+
+@pytest.mark.parametrize('make', [lambda **kw: Cube(side_length=3, **kw),
+                                  lambda **kw: Cylinder(radius=1.5, height=3, lod=False, **kw),
+                                  lambda **kw: Torus(R=2, r=1, lod=False, **kw)])
+def test_instances_sit_where_the_shape_would(make):
+    shapes, instances, scene = _engine(), _engine(), _engine()
+    for position in POSITIONS:
+        shapes._add_shapes(make(center=position))
+        scene.scene.add(make(), position=position)
+    instances.add_instances(make(), POSITIONS)
+    expected = _image(shapes)
+    assert np.array_equal(_image(instances), expected)
+    assert np.array_equal(_image(scene), expected)
+
+def _drawn(engine):
+    return np.any(_image(engine) != _image(_engine()), axis=2) # pixels differing from the empty scene
+
+def test_instances_scale_and_turn_about_the_prototype_center():
+    expected, scaled, turned = _engine(), _engine(), _engine()
+    expected._add_shapes(Cube(center=[10, 0, 0], side_length=4))
+    scaled.add_instances(Cube(center=[10, 0, 0], side_length=2), [[0, 0, 0]], scales=2)
+    turned.add_instances(Cube(center=[10, 0, 0], side_length=2), [[0, 0, 0]], scales=2, orientations=[[0, math.pi / 2, 0]])
+    expected = _drawn(expected)
+    for engine in (scaled, turned):
+        # the same cube up to rounding at its outline, a pivot at the world origin would move it off by 10
+        assert (_drawn(engine) != expected).sum() < 0.02 * expected.sum()
+
+def test_scene_nodes_scale_and_turn_about_the_shape_origin():
+    expected, scene = _engine(), _engine()
+    expected._add_shapes(Cube(center=[10, 0, 0], side_length=4))
+    parent = scene.scene.add(position=[10, 0, 0], rotation=[0, math.pi / 2, 0])
+    scene.scene.add(Cube(side_length=2), parent=parent, scale=2)
+    expected = _drawn(expected)
+    assert (_drawn(scene) != expected).sum() < 0.02 * expected.sum()
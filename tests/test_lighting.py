@@ -0,0 +1,34 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import numpy as np
+
+# file imports
+from lighting import Light, Lighting
+from transforms import rotation_matrix
+
+NORMALS = np.array([[0, 0, -1], [-1, 0, 0], [0, 0, 1]], dtype=float) # towards the viewer, left and away
+
+def test_lights_add_up_per_channel():
+    lighting = Lighting([Light(direction=(0, 0, 1)), # straight into the screen
+                         Light(direction=(1, 0, 0), intensity=0.5, color=(255, 0, 0))], ambient=0.1)
+    shaded = lighting.shade(NORMALS, (200, 200, 200), np.eye(3))
+    assert shaded.tolist() == [[220, 220, 220], # ambient and the full white light
+                               [120, 20, 20], # ambient and half of the red light
+                               [20, 20, 20]] # ambient only, facing away from both
+
+def test_brightness_is_clipped_and_follows_the_light():
+    lighting = Lighting([Light(direction=(0, 0, 1)), Light(direction=(0, 0, 1))])
+    assert lighting.shade(NORMALS[:1], (200, 100, 0), np.eye(3)).tolist() == [[255, 200, 0]]
+    lighting.lights[1].intensity = 0 # the cached directions and tints are rebuilt
+    assert lighting.shade(NORMALS[:1], (200, 100, 0), np.eye(3)).tolist() == [[200, 100, 0]]
+
+def test_world_lights_turn_with_the_camera():
+    r_matrix = np.asarray(rotation_matrix(0, np.pi / 2, 0))
+    normal = (r_matrix @ [0, 0, -1])[None] # the face the world light hits, seen by the turned camera
+    world = Lighting([Light(direction=(0, 0, 1), camera_space=False)])
+    camera = Lighting([Light(direction=(0, 0, 1))])
+    assert world.shade(normal, 100, r_matrix).tolist() == [[100, 100, 100]]
+    assert camera.shade(normal, 100, r_matrix).tolist() == [[0, 0, 0]] # a camera light stays put
@@ -0,0 +1,32 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import math
+
+# file imports
+from lod import LevelOfDetail, lod_segments, PIXELS_PER_SEGMENT, LOD_HYSTERESIS
+
+def test_segments_halve_down_to_the_minimum():
+    assert lod_segments(30, 6) == [30, 15, 7]
+    assert lod_segments(64, 3) == [64, 32, 16, 8] # at most four levels
+    assert lod_segments(8, 6) == [8]
+
+def test_finer_levels_are_used_straight_away():
+    lod = LevelOfDetail([32, 16, 8])
+    assert lod.select(1) == 2
+    assert lod.select(100) == 0 # no hysteresis on the way up
+
+def test_radius_around_a_limit_does_not_flap():
+    lod = LevelOfDetail([32, 16, 8])
+    limit = 16 * PIXELS_PER_SEGMENT / (2 * math.pi) # largest radius level 1 is good for
+    assert lod.select(limit * 2) == 0
+    # just under the limit is not far enough to drop a level
+    levels = [lod.select(limit * (0.99 if k % 2 else 1.01)) for k in range(20)]
+    assert levels == [0] * 20
+    # well under it drops once, then wobbling back up to the limit keeps the coarser level
+    assert lod.select(limit * (1 - LOD_HYSTERESIS) * 0.99) == 1
+    levels = [lod.select(limit * (0.99 if k % 2 else 0.85)) for k in range(20)]
+    assert levels == [1] * 20
+    assert lod.select(limit * 1.01) == 0 # over it needs the finer mesh again
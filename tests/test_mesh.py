@@ -0,0 +1,65 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import numpy as np
+import pytest
+
+# file imports
+from mesh import load_obj, load_stl, load_mesh, triangle_edges, STL_TRIANGLE
+
+QUAD_OBJ = b'''# unit square and a triangle over it
+v 0 0 0
+v 1 0 0
+v 1 1 0
+v 0 1 0
+vt 0 0
+vn 0 0 1
+f 1/1/1 2/1/1 3/1/1 4/1/1
+v 0 0 1
+f -5//1 -4//1 -1//1
+'''
+
+def test_obj_quads_negative_indices_and_texture_refs(tmp_path):
+    path = tmp_path / 'square.obj'
+    path.write_bytes(QUAD_OBJ)
+    vertices, faces = load_obj(str(path))
+    assert vertices.shape == (5, 3)
+    assert faces.tolist() == [[0, 1, 2], [0, 2, 3], [0, 1, 4]] # quad split into a fan, -1 is the last vertex read
+
+def test_obj_rejects_missing_vertices(tmp_path):
+    path = tmp_path / 'broken.obj'
+    path.write_bytes(b'v 0 0 0\nv 1 0 0\nf 1 2 3\n')
+    with pytest.raises(ValueError):
+        load_obj(str(path))
+
+def _write_stl(path, triangles):
+    data = np.zeros(len(triangles), dtype=STL_TRIANGLE)
+    data['vertices'] = triangles
+    path.write_bytes(b'\0' * 80 + np.uint32(len(triangles)).tobytes() + data.tobytes())
+
+def test_binary_stl_merges_shared_corners(tmp_path):
+    path = tmp_path / 'square.stl'
+    _write_stl(path, [[[0, 0, 0], [1, 0, 0], [1, 1, 0]], [[0, 0, 0], [1, 1, 0], [-0.0, 1, 0]]])
+    vertices, faces = load_stl(str(path))
+    assert len(vertices) == 4 # -0.0 and 0.0 are the same corner
+    assert np.array_equal(vertices[faces], [[[0, 0, 0], [1, 0, 0], [1, 1, 0]], [[0, 0, 0], [1, 1, 0], [0, 1, 0]]])
+    edges, edge_faces = triangle_edges(faces)
+    assert len(edges) == 5 and (edge_faces[:, 1] >= 0).sum() == 1 # only the diagonal is shared
+
+def test_ascii_stl_is_rejected(tmp_path):
+    path = tmp_path / 'ascii.stl'
+    path.write_bytes(b'solid square\nfacet normal 0 0 1\nouter loop\nvertex 0 0 0\nvertex 1 0 0\nvertex 1 1 0\n'
+                     b'endloop\nendfacet\nendsolid square\n')
+    with pytest.raises(ValueError):
+        load_stl(str(path))
+
+def test_cached_load_matches_parse(tmp_path):
+    path = tmp_path / 'square.obj'
+    path.write_bytes(QUAD_OBJ)
+    first = load_mesh(str(path), cache_dir=str(tmp_path / 'cache'))
+    again = load_mesh(str(path), cache_dir=str(tmp_path / 'cache'))
+    assert isinstance(again['vertices'], np.memmap)
+    for name in first:
+        assert np.array_equal(first[name], again[name])
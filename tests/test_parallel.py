@@ -0,0 +1,50 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import numpy as np
+import pytest
+
+# file imports
+from SimulationEngine import Engine
+from shapes import Sphere, Cube
+from parallel import ParallelTransformer
+from transforms import rotation_matrix, rotate_vertices, project_vertices, NEAR_PLANE
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_empty_scene(workers):
+    sim = Engine(headless=True, transform_workers=workers)
+    try:
+        sim.render_headless(2)
+    finally:
+        sim.transformer.close()
+
+def test_scene_with_only_balls():
+    sim = Engine(headless=True, transform_workers=1)
+    sim._add_balls(Sphere(center=[0, 30, 0]))
+    try:
+        sim.render_headless(2)
+    finally:
+        sim.transformer.close()
+
+def test_no_vertices():
+    transformer = ParallelTransformer((800, 600), NEAR_PLANE, workers=1)
+    try:
+        assert transformer.transform([], np.eye(3), 256, 60) == []
+        (camera, projected), = transformer.transform([np.zeros((0, 3))], np.eye(3), 256, 60)
+        assert camera.shape == (0, 3) and projected.shape == (0, 2)
+    finally:
+        transformer.close()
+
+def test_matches_serial_transform():
+    vertices = Cube(center=[1, 2, 3]).geometry.vertices
+    r_matrix = rotation_matrix(0.3, 0.5, 0.1)
+    transformer = ParallelTransformer((800, 600), NEAR_PLANE, workers=2, min_vertices=0)
+    try:
+        (camera, projected), = transformer.transform([vertices], r_matrix, 256, 60)
+        expected = rotate_vertices(vertices, r_matrix)
+        assert np.allclose(camera, expected)
+        assert np.array_equal(projected, project_vertices(expected, 256, 60))
+    finally:
+        transformer.close()
@@ -0,0 +1,126 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import numpy as np
+import pytest
+
+# file imports
+from physics import PhysicsWorld
+
+def _world(centers, radii, cell_size=None):
+    world = PhysicsWorld(capacity=4, cell_size=cell_size) # small capacity so the arrays grow
+    for center, radius in zip(centers, radii):
+        world.add_body(center, radius)
+    return world
+
+def _touching(centers, radii):
+    '''
+    Brute-force narrow phase, every pair of bodies that overlap
+    '''
+    distances = np.linalg.norm(centers[:, None] - centers[None], axis=2)
+    i, j = np.nonzero((distances < radii[:, None] + radii[None]) & np.triu(np.ones((len(radii),) * 2, dtype=bool), 1))
+    return set(zip(i.tolist(), j.tolist()))
+
+@pytest.mark.parametrize('seed, count, spread', [(0, 200, 20), (1, 500, 60), (2, 64, 3), (3, 300, 1000)])
+def test_candidate_pairs_match_brute_force(seed, count, spread):
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(-spread, spread, (count, 3))
+    radii = rng.uniform(0.2, 2, count)
+    world = _world(centers, radii)
+    for _ in range(2): # the second call starts from the sorted order of the first
+        i, j = world.candidate_pairs()
+        pairs = [(min(a, b), max(a, b)) for a, b in zip(i.tolist(), j.tolist())]
+        assert all(a != b for a, b in pairs) # no body paired with itself
+        assert len(pairs) == len(set(pairs)) # every pair once
+        assert _touching(centers, radii) <= set(pairs) # no touching pair missed
+        world.positions[:count] += rng.uniform(-1, 1, (count, 3)) # bodies move between steps
+        centers = world.positions[:count].copy()
+
+def test_bodies_added_after_a_step_are_found():
+    world = _world([[0, 0, 0], [10, 0, 0]], [1, 1])
+    world.candidate_pairs()
+    world.add_body([0.5, 0, 0], 1)
+    world.add_body([10.5, 0, 0], 1)
+    i, j = world.candidate_pairs()
+    pairs = {(min(a, b), max(a, b)) for a, b in zip(i.tolist(), j.tolist())}
+    assert {(0, 2), (1, 3)} <= pairs
+
+def test_no_pairs_for_one_body():
+    i, j = _world([[0, 0, 0]], [1]).candidate_pairs()
+    assert len(i) == len(j) == 0
+
+@pytest.mark.parametrize('offset, spread', [(3e6, 20), (-3e6, 20), (0, 3e6)])
+def test_candidate_pairs_far_from_the_origin(offset, spread):
+    # cells beyond +-2**20 are shifted, or ranked when they span more than the keys can hold
+    rng = np.random.default_rng(4)
+    centers = rng.uniform(-spread, spread, (300, 3)) + offset
+    centers[150:] = centers[:150] + rng.uniform(-1, 1, (150, 3)) # every body has a close neighbour
+    radii = np.full(300, 1.0)
+    i, j = _world(centers, radii).candidate_pairs()
+    pairs = {(min(a, b), max(a, b)) for a, b in zip(i.tolist(), j.tolist())}
+    assert _touching(centers, radii) <= pairs
+    far = np.linalg.norm(centers[i] - centers[j], axis=1) > 2 * np.sqrt(3) * 2 # further apart than neighbouring cells allow
+    assert not far.any()
+
+def test_zero_radius_bodies_have_no_pairs():
+    world = _world([[0, 0, 0], [0, 0, 0], [1, 0, 0]], [0, 0, 0])
+    i, j = world.candidate_pairs()
+    assert len(i) == len(j) == 0
+    world.step() # and stepping them does not divide by a zero cell size
+    assert np.isfinite(world.positions[:3]).all()
+
+def _move_ball(center, velocity, radius, gravity, damping):
+    '''
+    The per-ball step balls took before PhysicsWorld, on the default floor at y = 0
+    '''
+    velocity[1] += -gravity
+    center[1] += velocity[1]
+    if center[1] - radius < 0:
+        center[1] = radius
+        velocity[1] = -velocity[1] * damping
+
+def test_gravity_is_integrated_per_step():
+    world = PhysicsWorld(collisions=False)
+    world.add_body([0, 1000, 0], 1, velocity=[0.5, 2, -0.25], gravity=0.1)
+    for _ in range(10):
+        world.step()
+    # v(k) = v0 - k g and the position sums the velocities after each update
+    assert np.allclose(world.velocities[0], [0.5, 2 - 10 * 0.1, -0.25])
+    assert np.allclose(world.positions[0], [5, 1000 + sum(2 - k * 0.1 for k in range(1, 11)), -2.5])
+    assert np.allclose(world.previous_positions[0, 1], world.positions[0, 1] - world.velocities[0, 1])
+
+def test_floor_bounce_keeps_the_damped_speed():
+    world = PhysicsWorld(collisions=False)
+    world.add_body([0, 3, 0], 2, velocity=[0, -4, 0], gravity=0, damping=0.5, floor=[0, 1, 0])
+    world.step()
+    assert world.positions[0, 1] == 3 # clamped onto the floor, radius above it
+    assert world.velocities[0, 1] == 2 # reversed and damped
+
+@pytest.mark.parametrize('damping', [1.0, 0.5, 0.0])
+def test_head_on_collision_restitution(damping):
+    world = PhysicsWorld()
+    world.add_body([0, 100, 0], 1, velocity=[1, 0, 0], gravity=0, damping=damping)
+    world.add_body([2.5, 100, 0], 1, velocity=[-1, 0, 0], gravity=0, damping=damping)
+    world.step()
+    velocities = world.velocities[:2, 0]
+    assert np.isclose(velocities.sum(), 0) # equal masses, momentum is kept
+    assert np.isclose(velocities[1] - velocities[0], 2 * damping) # separating at the restitution times the closing speed
+    assert np.isclose(world.positions[1, 0] - world.positions[0, 0], 2) # pushed apart until they just touch
+
+def test_step_matches_the_per_ball_trajectory():
+    rng = np.random.default_rng(5)
+    count = 20
+    centers = np.column_stack([np.arange(count) * 10.0, rng.uniform(5, 50, count), np.zeros(count)])
+    velocities = np.column_stack([np.zeros(count), rng.uniform(-1, 1, count), np.zeros(count)])
+    radii, gravity, damping = rng.uniform(1, 4, count), rng.uniform(0.005, 0.05, count), rng.uniform(0.5, 1, count)
+    world = PhysicsWorld(collisions=False)
+    for k in range(count):
+        world.add_body(centers[k], radii[k], velocities[k], gravity[k], damping[k])
+    for _ in range(500):
+        world.step()
+        for k in range(count):
+            _move_ball(centers[k], velocities[k], radii[k], gravity[k], damping[k])
+    assert np.array_equal(world.positions[:count], centers)
+    assert np.array_equal(world.velocities[:count], velocities)
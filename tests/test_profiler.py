@@ -0,0 +1,41 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import csv
+
+# file imports
+from SimulationEngine import Engine
+from shapes import Sphere
+from profiler import FrameProfiler
+
+def _frames_in(path):
+    with open(path, newline='') as file:
+        return {int(row['frame']) for row in csv.DictReader(file)}
+
+def test_render_headless_writes_every_row(tmp_path):
+    path = tmp_path / 'frames.csv'
+    sim = Engine(headless=True, profile=True, profile_csv=str(path))
+    sim._add_balls(Sphere(center=[0, 10, 0]))
+    sim.render_headless(5)
+    assert len(_frames_in(path)) == 5 # readable while the engine is still open
+
+def test_iter_frames_flushes_when_stopped_early(tmp_path):
+    path = tmp_path / 'frames.csv'
+    sim = Engine(headless=True, profile=True, profile_csv=str(path))
+    frames = sim.iter_frames()
+    for _ in range(3):
+        next(frames)
+    frames.close()
+    assert len(_frames_in(path)) == 3
+
+def test_profiler_closes_as_context_manager(tmp_path):
+    path = tmp_path / 'frames.csv'
+    with FrameProfiler(csv_path=str(path)) as profiler:
+        profiler.begin_frame()
+        with profiler.stage('work'):
+            pass
+        profiler.end_frame()
+    assert profiler.csv_file is None
+    assert _frames_in(path)
@@ -0,0 +1,40 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import numpy as np
+import pygame
+
+# file imports
+from SimulationEngine import Engine, PAINTER, ZBUFFER
+from shapes import Cube
+
+COLORS = [(200, 40, 40), (40, 200, 40), (40, 40, 200)]
+
+def _image(backend):
+    engine = Engine(angle_x=-0.4, angle_y=0.6, viewer_distance=60, headless=True, backend=backend)
+    for x, color in zip((-14, 0, 14), COLORS): # apart on screen, so no face hides another
+        engine._add_shapes(Cube(center=[x, 2, 0], side_length=5, face_color=color))
+    engine.render_frame()
+    return pygame.surfarray.array3d(engine.surface)
+
+def _near(mask, distance):
+    near = mask.copy()
+    for dx in range(-distance, distance + 1):
+        for dy in range(-distance, distance + 1):
+            near |= np.roll(mask, (dx, dy), axis=(0, 1))
+    return near
+
+def test_zbuffer_matches_painter_where_nothing_overlaps():
+    painter, zbuffer = _image(PAINTER), _image(ZBUFFER)
+    # the 2 pixel wide edges are thickened a little differently, the faces between them must match
+    edges = _near((painter == 0).all(axis=2) | (zbuffer == 0).all(axis=2), 2)
+    faces = np.zeros(edges.shape, dtype=bool)
+    for color in COLORS:
+        drawn = (painter == color).all(axis=2)
+        assert drawn.sum() > 200
+        a, b = drawn & ~edges, (zbuffer == color).all(axis=2) & ~edges
+        assert (a & b).sum() / (a | b).sum() > 0.9
+        faces |= drawn
+    assert ((painter != zbuffer).any(axis=2) & ~edges).sum() < 0.02 * faces.sum()
@@ -0,0 +1,81 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import os
+import numpy as np
+import pygame
+import pytest
+
+# file imports
+from recorder import FrameRecorder, WAIT, _lzw, _gif_header, _gif_frame, _png_bytes, _GIF_PALETTE
+
+def _unlzw(data):
+    '''
+    Decodes GIF LZW codes with 8 bit palette indices
+
+    :param data: bytes of packed codes
+    :return: bytes of palette indices
+    '''
+    clear, end = 256, 257
+    bits = int.from_bytes(data, 'little')
+    position, size = 0, 9
+    table, out, previous = None, bytearray(), None
+    while True:
+        code = bits >> position & ((1 << size) - 1)
+        position += size
+        if code == clear:
+            table, size, previous = [bytes((i,)) for i in range(256)] + [b'', b''], 9, None
+            continue
+        if code == end:
+            return bytes(out)
+        if previous is None:
+            entry = table[code]
+        else:
+            entry = table[code] if code < len(table) else previous + previous[:1]
+            table.append(previous + entry[:1])
+            if len(table) == 1 << size and size < 12:
+                size += 1
+        out += entry
+        previous = entry
+
+@pytest.mark.parametrize('data', [b'', b'\x07', b'\x01' * 100000, bytes(range(256)) * 40,
+                                  np.random.default_rng(0).integers(0, 256, 50000, dtype=np.uint8).tobytes(),
+                                  np.random.default_rng(1).integers(0, 4, 50000, dtype=np.uint8).tobytes()])
+def test_lzw_round_trip(data):
+    assert _unlzw(_lzw(data)) == data
+
+def _quantized(frame):
+    indices = (frame[..., 0] & 0xE0) | (frame[..., 1] >> 5 << 2) | (frame[..., 2] >> 6)
+    return _GIF_PALETTE[indices]
+
+def test_gif_and_png_load(tmp_path):
+    frame = np.random.default_rng(2).integers(0, 256, (30, 40, 3), dtype=np.uint8)
+    frame[:10] = 128 # flat area like the engine's background
+    gif = tmp_path / 'frame.gif'
+    gif.write_bytes(_gif_header(40, 30) + _gif_frame(frame, 3) + b'\x3b')
+    png = tmp_path / 'frame.png'
+    png.write_bytes(_png_bytes(frame))
+    assert np.array_equal(pygame.surfarray.array3d(pygame.image.load(str(gif))).transpose(1, 0, 2), _quantized(frame))
+    assert np.array_equal(pygame.surfarray.array3d(pygame.image.load(str(png))).transpose(1, 0, 2), frame)
+
+def test_recorder_writes_every_frame(tmp_path):
+    surface = pygame.Surface((40, 30))
+    recorder = FrameRecorder(str(tmp_path / 'frames'), (40, 30), slots=2, when_full=WAIT)
+    for i in range(5):
+        surface.fill((i * 40, 0, 0))
+        assert recorder.capture(surface)
+    stats = recorder.close()
+    assert stats == {'captured': 5, 'dropped': 0, 'written': 5, 'pending': 0, 'failed': False}
+    assert sorted(os.listdir(tmp_path / 'frames')) == [f'frame_{i:05d}.png' for i in range(5)]
+
+def test_recorder_reports_dead_encoder(tmp_path):
+    surface = pygame.Surface((40, 30))
+    recorder = FrameRecorder(str(tmp_path / 'frames'), (40, 30), slots=1, when_full=WAIT)
+    recorder.process.kill()
+    recorder.process.join()
+    assert recorder.capture(surface) # the free slot is used
+    assert not recorder.capture(surface) # no encoder to give it back, dropped instead of waiting forever
+    stats = recorder.close()
+    assert stats['failed'] and stats['written'] == 0 and stats['dropped'] == 1
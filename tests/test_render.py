@@ -0,0 +1,57 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import numpy as np
+
+# file imports
+from render import clip_polygon_near, STRIP_SEGMENTS
+from shapes import Cube, Cylinder, Torus
+
+SQUARE = np.array([[0, 0, -1], [1, 0, -1], [1, 0, 1], [0, 0, 1]], dtype=float)
+
+def test_polygon_in_front_is_unchanged():
+    assert np.array_equal(clip_polygon_near(SQUARE, -2), SQUARE)
+
+def test_polygon_behind_is_dropped():
+    assert clip_polygon_near(SQUARE, 2).shape == (0, 3)
+
+def test_polygon_crossing_is_cut_at_the_plane():
+    clipped = clip_polygon_near(SQUARE, 0)
+    assert (clipped[:, 2] >= 0).all()
+    assert sorted(map(tuple, clipped.tolist())) == [(0, 0, 0), (0, 0, 1), (1, 0, 0), (1, 0, 1)]
+
+def test_triangle_with_one_corner_in_front():
+    triangle = np.array([[0, 0, -1], [2, 0, -1], [1, 0, 1]], dtype=float)
+    clipped = clip_polygon_near(triangle, 0)
+    assert len(clipped) == 3 and np.allclose(sorted(clipped[:, 0]), [0.5, 1, 1.5])
+
+def _check_strips(geometry):
+    strips, edges = geometry.strips, geometry.edges
+    assert sorted(strips.edges.tolist()) == list(range(len(edges))) # every edge in exactly one strip
+    lengths = np.diff(np.append(strips.edge_starts, len(strips.edges)))
+    assert lengths.max() <= STRIP_SEGMENTS
+    assert len(strips.vertices) == len(strips.edges) + strips.count # one more vertex than edges per strip
+    # consecutive vertices of a strip are the ends of its edges
+    first = strips.vertices[strips.edge_vertex]
+    second = strips.vertices[strips.edge_vertex + 1]
+    assert np.array_equal(np.sort(np.column_stack([first, second]), axis=1), np.sort(edges[strips.edges], axis=1))
+    return strips
+
+def test_torus_rings_become_whole_strips():
+    strips = _check_strips(Torus(segments_u=30, segments_v=15, lod=False).geometry)
+    assert strips.count == 30 + 15 * 2 # 30 rings of 15 edges, 15 rings of 30 edges split in two
+
+def test_cube_and_cylinder_strips():
+    assert _check_strips(Cube().geometry).count <= 6 # 12 edges
+    cylinder = _check_strips(Cylinder(segments=20, lod=False).geometry)
+    assert cylinder.count <= 2 * 2 + 20 # two rings split in two and the sides, fewer where sides join a ring
+
+def test_tiled_strips_follow_each_copy():
+    geometry = Cube().geometry
+    strips = geometry.strips
+    tiled = strips.tile(3, len(geometry.edges), len(geometry.vertices))
+    assert tiled.count == 3 * strips.count
+    assert np.array_equal(tiled.edges[len(strips.edges):2 * len(strips.edges)], strips.edges + len(geometry.edges))
+    assert np.array_equal(tiled.vertices[-len(strips.vertices):], strips.vertices + 2 * len(geometry.vertices))
@@ -0,0 +1,83 @@
+'''
+AUTHOR: Imsara Samarasinghe
+EMAIL: imsara256@gmail.com
+'''
+# module imports
+import math
+import numpy as np
+import pygame
+import pytest
+
+# file imports
+from SimulationEngine import Engine
+from scene import SceneGraph, SETTLE_FRAMES
+from shapes import Cube
+
+def test_dirty_flags_reach_the_subtree_only():
+    graph = SceneGraph()
+    parent = graph.add(position=[1, 0, 0])
+    child = graph.add(Cube(), parent=parent, position=[0, 2, 0])
+    grandchild = graph.add(parent=child, position=[0, 0, 3])
+    sibling = graph.add(Cube(), position=[5, 0, 0])
+    assert graph.update() == 4
+    assert graph.update() == 0 # nothing changed
+
+    parent.set_transform(position=[2, 0, 0], scale=2)
+    assert parent.dirty and child.dirty and grandchild.dirty and not sibling.dirty
+    assert graph.update() == 3 # the parent and its two descendants
+    assert not (parent.dirty or child.dirty or grandchild.dirty)
+    assert np.allclose(grandchild.world_position, [2, 4, 6]) and grandchild.world_scale == 2
+    assert np.allclose(child.batch.positions[child.row], [2, 4, 0]) # its instance row follows
+
+def test_add_child_moves_a_node_away_from_its_old_parent():
+    graph = SceneGraph()
+    cube = Cube()
+    first, second = graph.add(position=[10, 0, 0]), graph.add(position=[-10, 0, 0])
+    node = graph.add(cube, parent=first)
+    other = graph.add(cube, parent=first, position=[0, 1, 0])
+    second.add_child(node)
+    assert node not in first.children and node.parent is second
+    graph.update()
+    assert np.allclose(node.world_position, [-10, 0, 0])
+    assert len(node.batch) == 2 # still one row each
+
+    # to another graph, the row it leaves is filled by the last one
+    moved = SceneGraph()
+    moved.root.add_child(first)
+    graph.update()
+    moved.update()
+    assert other.graph is moved and len(node.batch) == 1 and len(other.batch) == 1
+    assert np.allclose(node.batch.positions[node.row], [-10, 0, 0])
+    assert np.allclose(other.batch.positions[other.row], [10, 1, 0])
+
+    with pytest.raises(ValueError):
+        node.add_child(second) # its own parent
+
+def _scene_engine():
+    engine = Engine(angle_x=-0.4, angle_y=0.5, viewer_distance=60, headless=True)
+    cube = Cube(side_length=1.5)
+    nodes = [engine.scene.add(cube, position=[(i % 20) * 2 - 20, 0, (i // 20) * 2 - 10]) for i in range(200)]
+    return engine, nodes
+
+def _move(node, frame):
+    node.set_transform(position=[-6, 2 + 3 * math.sin(frame * 0.2), -10], rotation=[0, frame * 0.1, 0])
+
+def test_moving_one_node_does_not_redraw_the_static_layer():
+    engine, nodes = _scene_engine()
+    engine.render_frame()
+    version = engine.static_version
+    for frame in range(20):
+        _move(nodes[7], frame)
+        engine.render_frame()
+    assert engine.static_version == version + 1 # once, to take the node out of the layer
+    assert list(engine.scene.moving) == [nodes[7]]
+
+    # drawn where a scene built with the node already there draws it
+    expected, expected_nodes = _scene_engine()
+    _move(expected_nodes[7], 19)
+    expected.render_frame()
+    assert np.array_equal(pygame.surfarray.array3d(engine.surface), pygame.surfarray.array3d(expected.surface))
+
+    for _ in range(SETTLE_FRAMES + 1): # still again, it goes back into the layer
+        engine.render_frame()
+    assert engine.static_version == version + 2 and not engine.scene.moving
@@ -4,20 +4,84 @@ EMAIL: imsara256@gmail.com
 '''
 import pygame
 import math
-from config import COLORS, screen
+from collections import OrderedDict
+from config import COLORS, get_screen
+
+# fonts loaded so far keyed on (name, size)
+_fonts = {}
+
+def get_font(name='freesansbold.ttf', size=16):
+    '''
+    Loads a font the first time it is requested and reuses it afterwards
+
+    :param name: font file name
+    :param size: font size
+    :return: pygame Font object
+    '''
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        font = _fonts[key] = pygame.font.Font(name, size)
+    return font
+
+class TextCache:
+    '''
+    Least recently used cache of rendered text surfaces. The HUD text only changes
+    when the camera moves, so most frames just blit a surface rendered earlier
+
+    Attributes:
+        __init__: Class initialiser
+        render: Returns the rendered surface for a string, rendering it on a cache miss
+    '''
+    def __init__(self, font_name='freesansbold.ttf', size=16, max_entries=64):
+        '''
+        Class initialiser
+
+        :param font_name: font file name
+        :param size: font size
+        :param max_entries: number of rendered surfaces kept before the oldest is evicted
+        '''
+        self.font_name = font_name
+        self.size = size
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+
+    def render(self, text, color=COLORS['BLACK'], background=COLORS['GREY']):
+        '''
+        Returns the rendered surface for the text
+
+        :param text: string to render
+        :param color: text color
+        :param background: background color of the text box
+        :return: pygame Surface with the rendered text
+        '''
+        key = (text, color, background)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key) # mark as most recently used
+            return surface
+
+        surface = get_font(self.font_name, self.size).render(text, True, color, background)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False) # evict the least recently used surface
+        return surface
+
+# shared cache for all HUD text
+hud_text = TextCache()
 
 # zoom level text
-def print_zoom(viewer_distance):
-    font = pygame.font.Font('freesansbold.ttf', 16)
-    text = font.render(f'Zoom: {100-viewer_distance}', True, COLORS['BLACK'], COLORS['GREY'])
+def print_zoom(viewer_distance, surface=None):
+    surface = get_screen() if surface is None else surface
+    text = hud_text.render(f'Zoom: {100-viewer_distance}')
     textRect = text.get_rect()
     textRect.center = (50,10)
-    screen.blit(text, textRect)
+    surface.blit(text, textRect)
 
 # angles text
-def print_angles(angle_x, angle_y, angle_z):
-    font = pygame.font.Font('freesansbold.ttf', 16)
-    text = font.render(f'angle_x : {math.degrees(angle_x):.2f}° | angle_y : {math.degrees(angle_y):.2f}° | angle_z : {math.degrees(angle_z):.2f}°', True, COLORS['BLACK'], COLORS['GREY'])
+def print_angles(angle_x, angle_y, angle_z, surface=None):
+    surface = get_screen() if surface is None else surface
+    text = hud_text.render(f'angle_x : {math.degrees(angle_x):.2f}° | angle_y : {math.degrees(angle_y):.2f}° | angle_z : {math.degrees(angle_z):.2f}°')
     textRect = text.get_rect()
     textRect.center = (200,50)
-    screen.blit(text, textRect)
\ No newline at end of file
+    surface.blit(text, textRect)
\ No newline at end of file
@@ -4,10 +4,14 @@ EMAIL: imsara256@gmail.com
 '''
 # module Imports
 import math
+import numpy as np
 
 # file imports
 from config import width, height
 
+# closest depth in front of the viewer that geometry is drawn at
+NEAR_PLANE = 0.5
+
 # function for defining the rotation matrix
 def rotation_matrix(angle_x,angle_y,angle_z):
     '''
@@ -30,6 +34,24 @@ def rotation_matrix(angle_x,angle_y,angle_z):
         ]
     return matrix
 
+# function for building many rotation matrices at once
+def rotation_matrices(angles):
+    '''
+    Batched version of rotation_matrix
+
+    :param angles: array of shape (N, 3) of angles about the x, y & z axes
+    :return: numpy array of shape (N, 3, 3) of rotation matrices
+    '''
+    angles = np.asarray(angles, dtype=float).reshape(-1, 3)
+    cos_x, cos_y, cos_z = np.cos(angles).T
+    sin_x, sin_y, sin_z = np.sin(angles).T
+
+    matrices = np.empty((len(angles), 3, 3))
+    matrices[:, 0] = np.stack([cos_y*cos_z, -cos_y*sin_z, sin_y], axis=1)
+    matrices[:, 1] = np.stack([sin_x * sin_y * cos_z + cos_x * sin_z, -sin_x * sin_y * sin_z + cos_x * cos_z, -sin_x * cos_y], axis=1)
+    matrices[:, 2] = np.stack([-cos_x * sin_y * cos_z + sin_x * sin_z, cos_x * sin_y * sin_z + sin_x * cos_z, cos_x * cos_y], axis=1)
+    return matrices
+
 # function for applying the rotation matrix to a vertex
 def apply_rotation(vertex, rotation_matrix):
     '''
@@ -56,7 +78,102 @@ def project_3d_to_2d(point3d, fov, viewer_distance):
     :param viewer_distance: Zoom setting for the user
     :return:(x, y) tuple of integer 2D coordinates to be used with PyGame interface
     '''
-    factor = fov / (viewer_distance + point3d[2])
+    factor = fov / max(viewer_distance + point3d[2], NEAR_PLANE) # points behind the near plane are pushed onto it
     x = point3d[0] * factor + width / 2
     y = -point3d[1] * factor + height / 2
-    return (int(x), int(y))
\ No newline at end of file
+    return (int(x), int(y))
+
+# function for applying the rotation matrix to an array of vertices
+def rotate_vertices(vertices, rotation_matrix):
+    '''
+    Batched version of apply_rotation. Rotates every vertex of a shape with a
+    single matrix multiplication instead of one Python loop per vertex
+
+    :param vertices: array-like of shape (N, 3) ex: [[1,2,3],[4,5,6]]
+    :param rotation_matrix: The matrix with all angles applied
+    :return: rotated vertices as a numpy array of shape (N, 3)
+    '''
+    vertices = np.asarray(vertices, dtype=float)
+    return vertices @ np.asarray(rotation_matrix, dtype=float).T
+
+# function to project an array of points in 3D to 2D
+def project_vertices(points3d, fov, viewer_distance):
+    '''
+    Batched version of project_3d_to_2d. Projects every point of a shape in one call
+
+    :param points3d: array of shape (N, 3) of points in 3D coordinates
+    :param fov: Field of view of the user
+    :param viewer_distance: Zoom setting for the user
+    :return: integer numpy array of shape (N, 2) of 2D coordinates to be used with PyGame interface
+    '''
+    points3d = np.asarray(points3d, dtype=float).reshape(-1, 3)
+    # points behind the near plane are pushed onto it, faces using them have to be clipped first
+    factor = fov / np.maximum(viewer_distance + points3d[:, 2], NEAR_PLANE)
+    projected = np.empty((len(points3d), 2))
+    projected[:, 0] = points3d[:, 0] * factor + width / 2
+    projected[:, 1] = -points3d[:, 1] * factor + height / 2
+    return projected.astype(int)
+
+
+# function for finding a sphere that contains a set of vertices
+def bounding_sphere(vertices):
+    '''
+    function to find a sphere around the vertices of a shape, used to skip shapes
+    that are outside the view
+
+    :param vertices: array-like of shape (N, 3)
+    :return center, radius: center as a numpy array and the radius of the sphere
+    '''
+    vertices = np.asarray(vertices, dtype=float)
+    center = vertices.mean(axis=0)
+    return center, float(np.linalg.norm(vertices - center, axis=1).max())
+
+# function to test spheres against the view frustum
+def spheres_in_frustum(centers, radii, fov, viewer_distance):
+    '''
+    function to find which spheres are at least partly inside the view frustum. The frustum
+    is bounded by the near plane and the four planes through the viewer and the screen edges
+
+    :param centers: array of shape (N, 3) of sphere centers after rotation
+    :param radii: array of shape (N,) of sphere radii
+    :param fov: Field of view of the user
+    :param viewer_distance: Zoom setting for the user
+    :return: boolean numpy array of shape (N,), True for spheres that may be visible
+    '''
+    centers = np.asarray(centers, dtype=float).reshape(-1, 3)
+    radii = np.asarray(radii, dtype=float)
+    depth = viewer_distance + centers[:, 2]
+    inside = depth + radii > NEAR_PLANE
+
+    # the screen edges are where |x| * fov / depth == width / 2, same for y
+    for coord, half_size in ((centers[:, 0], width / 2), (centers[:, 1], height / 2)):
+        slope = half_size / fov
+        scale = math.sqrt(1 + slope * slope) # distance to a plane through the viewer
+        inside &= (np.abs(coord) - slope * depth) / scale < radii
+    return inside
+
+# function to test one sphere against the view frustum
+def sphere_in_frustum(center, radius, fov, viewer_distance):
+    '''
+    single sphere version of spheres_in_frustum
+
+    :param center: sphere center after rotation ex: [1,2,3]
+    :param radius: sphere radius
+    :param fov: Field of view of the user
+    :param viewer_distance: Zoom setting for the user
+    :return: True if the sphere may be visible
+    '''
+    return bool(spheres_in_frustum(center, [radius], fov, viewer_distance)[0])
+
+# function for finding the size of a sphere on screen
+def projected_radius(center, radius, fov, viewer_distance):
+    '''
+    Radius in pixels a sphere covers on screen, used to pick a level of detail
+
+    :param center: sphere center after rotation ex: [1,2,3]
+    :param radius: sphere radius
+    :param fov: Field of view of the user
+    :param viewer_distance: Zoom setting for the user
+    :return: screen radius in pixels
+    '''
+    return fov * radius / max(viewer_distance + center[2], NEAR_PLANE)